@@ -10,13 +10,128 @@ class Settings:
     # DeepSeek API
     DEEPSEEK_API_KEY: str = os.getenv("DEEPSEEK_API_KEY", "")
     DEEPSEEK_BASE_URL: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+    # 上游连接池（进程内共享的 DeepSeek 客户端）
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+    UPSTREAM_CONNECT_TIMEOUT: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
+    UPSTREAM_READ_TIMEOUT: float = float(os.getenv("UPSTREAM_READ_TIMEOUT", "120"))
+    UPSTREAM_HTTP2: bool = os.getenv("UPSTREAM_HTTP2", "false").lower() in ("1", "true", "yes")
+    # 流式请求附带 stream_options.include_usage，回复完成时记录用量（上游不支持时关闭）
+    UPSTREAM_INCLUDE_USAGE: bool = os.getenv("UPSTREAM_INCLUDE_USAGE", "true").lower() in ("1", "true", "yes")
     
+    # 上下文：发送给上游的历史消息 token 预算（0 表示不限制）
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+    # 上下文组装模式：sliding（每轮从最新消息向前按预算保留）/ prefix_stable（前缀逐字节稳定，
+    # 超出预算时一次性丢弃较多旧消息，只保留预算的 CONTEXT_COMPACT_RATIO，以提高上游前缀缓存命中率）
+    CONTEXT_MODE: str = os.getenv("CONTEXT_MODE", "sliding")
+    CONTEXT_COMPACT_RATIO: float = float(os.getenv("CONTEXT_COMPACT_RATIO", "0.5"))
+    # 固定的系统提示（为空则不发送）；不要包含日期等每轮变化的内容，否则前缀缓存失效
+    CONTEXT_SYSTEM_PROMPT: str = os.getenv("CONTEXT_SYSTEM_PROMPT", "")
+    # 会话上下文 LRU 缓存上限（条目数 / 字节数，条目数为 0 表示关闭）
+    CONTEXT_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "1000"))
+    CONTEXT_CACHE_MAX_BYTES: int = int(os.getenv("CONTEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
     # 数据库
     DATABASE_URL: str = os.getenv(
         "DATABASE_URL",
         "sqlite:///./minichatgpt.db"
     )
+    # 连接池（异步引擎；SQLite 文件库同样按连接池管理 aiosqlite 连接）。
+    # SQLite 同一时刻只有一个写者，连接过多只会在 busy 等待中互相争抢、超时报 database is locked，
+    # 默认保持小连接池、不溢出，让等待在连接池中按先后排队；PostgreSQL 等可按需调大
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "0"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+    # SQLite 连接 PRAGMA：WAL、同步级别、锁等待毫秒数、mmap 字节数（0 关闭）、外键约束（删除会话时由数据库级联删除消息）
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_FOREIGN_KEYS: bool = os.getenv("SQLITE_FOREIGN_KEYS", "true").lower() in ("1", "true", "yes")
+    # 批量删除会话：每批的会话数，以及删除消息时每个事务的最大行数（限制单次写锁的持有时间）
+    DELETE_BATCH_SESSIONS: int = int(os.getenv("DELETE_BATCH_SESSIONS", "100"))
+    DELETE_BATCH_ROWS: int = int(os.getenv("DELETE_BATCH_ROWS", "5000"))
     
+    # 组提交：把并发流的 assistant 消息写入与检查点合并到同一事务（默认关闭）
+    GROUP_COMMIT_ENABLED: bool = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+    GROUP_COMMIT_INTERVAL_MS: float = float(os.getenv("GROUP_COMMIT_INTERVAL_MS", "5"))
+    GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+
+    # 流式回复检查点：每 N 个 token 或每隔 N 秒把已生成内容写回数据库
+    CHECKPOINT_EVERY_TOKENS: int = int(os.getenv("CHECKPOINT_EVERY_TOKENS", "200"))
+    CHECKPOINT_INTERVAL_SECONDS: float = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "2"))
+
+    # SSE 帧合并：相邻同类型增量在时间窗口或字节阈值内合并为一帧
+    SSE_COALESCE_ENABLED: bool = os.getenv("SSE_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SSE_COALESCE_WINDOW_MS: float = float(os.getenv("SSE_COALESCE_WINDOW_MS", "30"))
+    SSE_COALESCE_MAX_BYTES: int = int(os.getenv("SSE_COALESCE_MAX_BYTES", "4096"))
+
+    # 可续传的流：每次生成的重放缓冲帧数，生成结束后保留的秒数
+    STREAM_REPLAY_BUFFER: int = int(os.getenv("STREAM_REPLAY_BUFFER", "1024"))
+    STREAM_RETENTION_SECONDS: float = float(os.getenv("STREAM_RETENTION_SECONDS", "120"))
+
+    # 精确匹配回复缓存（默认关闭）：TTL 秒、条目数与字节上限，可选落盘到 response_cache 表
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RESPONSE_CACHE_PERSIST: bool = os.getenv("RESPONSE_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+    # 命中时的重放节奏：每帧字符数与帧间隔（0 表示不等待）
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS: int = int(os.getenv("RESPONSE_CACHE_REPLAY_CHUNK_CHARS", "16"))
+    RESPONSE_CACHE_REPLAY_INTERVAL_MS: float = float(os.getenv("RESPONSE_CACHE_REPLAY_INTERVAL_MS", "0"))
+
+    # 上游准入控制：最大并发上游调用数（0 不限制）与排队最长等待秒数；
+    # 首字节前 429/5xx/连接错误的重试次数、指数退避基数与上限，Retry-After 超过上限时直接失败
+    UPSTREAM_MAX_IN_FLIGHT: int = int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "64"))
+    UPSTREAM_QUEUE_TIMEOUT: float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "60"))
+    UPSTREAM_MAX_RETRIES: int = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+    UPSTREAM_BACKOFF_BASE: float = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+    UPSTREAM_BACKOFF_MAX: float = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+    UPSTREAM_RETRY_AFTER_MAX: float = float(os.getenv("UPSTREAM_RETRY_AFTER_MAX", "30"))
+
+    # 单飞：上下文相同的并发请求共享一个上游调用
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # 指标：SQL 计时钩子与按请求的 DB 时间统计（/api/metrics 始终可用）
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # 全文搜索：SQLite FTS5（trigram）索引，首次启用时从 messages 回填；只考虑前 SEARCH_MAX_HITS 条命中
+    SEARCH_FTS_ENABLED: bool = os.getenv("SEARCH_FTS_ENABLED", "true").lower() in ("1", "true", "yes")
+    SEARCH_MAX_HITS: int = int(os.getenv("SEARCH_MAX_HITS", "1000"))
+
+    # 导出/导入：服务端游标每批读取行数；导入时每个事务插入的行数
+    EXPORT_YIELD_PER: int = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+    # 批量任务：工作协程数（即批量任务的上游并发上限，0 表示不执行），单个任务的提示数上限，
+    # 每条提示的最多尝试次数；结果每 BATCH_FLUSH_SIZE 条或每隔 BATCH_FLUSH_INTERVAL_SECONDS 秒批量写入一次
+    BATCH_WORKERS: int = int(os.getenv("BATCH_WORKERS", "4"))
+    BATCH_MAX_PROMPTS: int = int(os.getenv("BATCH_MAX_PROMPTS", "10000"))
+    BATCH_MAX_ATTEMPTS: int = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+    BATCH_FLUSH_SIZE: int = int(os.getenv("BATCH_FLUSH_SIZE", "100"))
+    BATCH_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("BATCH_FLUSH_INTERVAL_SECONDS", "2"))
+
+    # 冷存储（默认关闭）：后台任务每隔 ARCHIVE_INTERVAL_SECONDS 秒把超过 ARCHIVE_AFTER_DAYS 天无活动的会话
+    # 压缩归档到 session_archives（每次查询 ARCHIVE_BATCH_SESSIONS 个候选会话），访问时自动恢复。
+    # 压缩算法 zlib 或 zstd（需安装 zstandard，未安装时使用 zlib）；归档会话不参与全文搜索
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+    ARCHIVE_AFTER_DAYS: float = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "600"))
+    ARCHIVE_BATCH_SESSIONS: int = int(os.getenv("ARCHIVE_BATCH_SESSIONS", "100"))
+    ARCHIVE_COMPRESSION: str = os.getenv("ARCHIVE_COMPRESSION", "zlib")
+    ARCHIVE_COMPRESSION_LEVEL: int = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "6"))
+
+    # 启动预热：服务开始监听后在后台打开数据库连接池中的连接、预先建立 STARTUP_UPSTREAM_CONNECTIONS 条上游连接
+    # （0 表示不预热上游），每步最多等待 STARTUP_WARMUP_TIMEOUT 秒，完成后 /api/ready 返回 200；
+    # READY_REQUIRE_UPSTREAM 开启时上游预热成功前保持未就绪
+    STARTUP_UPSTREAM_CONNECTIONS: int = int(os.getenv("STARTUP_UPSTREAM_CONNECTIONS", "2"))
+    STARTUP_WARMUP_TIMEOUT: float = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10"))
+    READY_REQUIRE_UPSTREAM: bool = os.getenv("READY_REQUIRE_UPSTREAM", "false").lower() in ("1", "true", "yes")
+
     # 应用
     APP_TITLE: str = "MiniChatGPT API"
     APP_VERSION: str = "0.1.0"
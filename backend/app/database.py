@@ -1,32 +1,91 @@
-"""SQLAlchemy 数据库配置"""
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""SQLAlchemy 数据库配置（异步引擎）"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from app.config import settings
 
-# SQLite 需要开启 check_same_thread=False 以兼容 FastAPI 异步
-connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+# 同步 URL 对应的异步驱动；URL 已显式指定驱动（如 sqlite+aiosqlite://）时原样使用
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args=connect_args,
-    echo=False,
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_url(url: str) -> str:
+    u = make_url(url)
+    if "+" in u.drivername:
+        return url
+    return u.set(drivername=ASYNC_DRIVERS.get(u.drivername, u.drivername)).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str) -> dict:
+    """连接池参数来自配置；SQLite 内存库只有一个连接，不设连接池大小"""
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    每个新连接执行：WAL 让读不被写阻塞；synchronous=NORMAL 在 WAL 下只在检查点 fsync；
+    busy_timeout 让并发写入排队等待而不是立即报 database is locked；mmap 减少读路径的系统调用；
+    foreign_keys 让模型上的 ON DELETE CASCADE / SET NULL 生效（SQLite 默认不执行外键约束）。
+    """
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.close()
+
+
+def create_engine_for(url: str):
+    """按 URL 创建异步引擎；SQLite 在连接建立时应用 PRAGMA"""
+    engine = create_async_engine(async_url(url), echo=False, **_engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def foreign_keys_enforced(dialect_name: str) -> bool:
+    """数据库是否执行外键级联：SQLite 取决于 foreign_keys PRAGMA，其他数据库总是执行"""
+    return dialect_name != "sqlite" or settings.SQLITE_FOREIGN_KEYS
+
+
+engine = create_engine_for(settings.DATABASE_URL)
+
+# 提交后不过期对象属性：写入后无需 refresh() 即可读取已知字段，省去一次 SELECT
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
-    """依赖注入：获取数据库会话"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """依赖注入：获取异步数据库会话"""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
-    """初始化数据库，创建所有表"""
-    from app.models import Session, Message  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+async def init_db() -> dict:
+    """
+    初始化数据库：执行尚未应用的迁移（库已是最新版本时只读取版本号，不再逐表反射），检查全文索引。
+    返回迁移结果 {"from", "to", "applied"}。
+    """
+    from app import models  # noqa: F401  注册全部模型
+    from app.migrations import migrate
+    from app.services.search_service import ensure_search_index
+    async with engine.begin() as conn:
+        result = await conn.run_sync(migrate)
+        await conn.run_sync(ensure_search_index)
+    return result
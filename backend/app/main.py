@@ -3,18 +3,44 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 
 from app.config import settings
-from app.database import init_db
-from app.routers import chat, sessions
+from app.database import engine, init_db, SessionLocal
+from app.routers import batch, chat, export, metrics, search, sessions, stats, usage
+from app.services.archive_service import archiver
+from app.services.batch_runner import batch_runner
+from app.services.batch_service import recover_batch_items
+from app.services.group_commit import group_commit_writer
+from app.services.llm_service import close_client
+from app.services.metrics import RequestMetricsMiddleware, instrument_engine
+from app.services.readiness import readiness
+from app.services.session_service import abort_interrupted_replies
+from app.services.stream_registry import stream_registry
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """应用生命周期：启动时初始化数据库"""
-    init_db()
+    """应用生命周期：启动时迁移、回收并启动后台任务，关闭时停止后台任务并释放连接池"""
+    readiness.begin()
+    migration = await init_db()
+    async with SessionLocal() as db:
+        await abort_interrupted_replies(db)
+        await recover_batch_items(db)
+    if settings.GROUP_COMMIT_ENABLED:
+        group_commit_writer.start()
+    batch_runner.start()
+    archiver.start()
+    readiness.start(migration)
     yield
-    # 关闭时可选清理逻辑
+    await readiness.stop()
+    await archiver.stop()
+    await batch_runner.stop()
+    await stream_registry.shutdown()
+    await group_commit_writer.stop()
+    await close_client()
+    await engine.dispose()
 
 
 app = FastAPI(
@@ -26,6 +52,16 @@ app = FastAPI(
 # CORS 配置，允许前端跨域访问
 app.include_router(chat.router)
 app.include_router(sessions.router)
+app.include_router(stats.router)
+app.include_router(usage.router)
+app.include_router(search.router)
+app.include_router(export.router)
+app.include_router(batch.router)
+app.include_router(metrics.router)
+
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(RequestMetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +69,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Has-More", "X-Next-Cursor", "X-Generation-Id"],
 )
 
 
@@ -44,3 +81,10 @@ def root():
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/api/ready")
+def ready():
+    """就绪探针：数据库（及按配置要求的上游）预热完成前返回 503；同时给出启动与预热耗时"""
+    status = readiness.status()
+    return JSONResponse(jsonable_encoder(status), status_code=200 if readiness.ready else 503)
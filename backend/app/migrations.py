@@ -0,0 +1,140 @@
+"""
+版本化的数据库迁移：schema_version 表记录库的版本，启动时只执行尚未应用的迁移。
+库已是最新版本时只读取一行，不再逐表反射、不执行 create_all。
+
+- 新库：create_all 按当前模型建表，直接记为最新版本；
+- 引入版本号之前的旧库（有 sessions 表、没有 schema_version）：补建缺少的表、可空列与索引，记为版本 1，再执行之后的迁移；
+- 已版本化的库：按版本号顺序执行 MIGRATIONS 中更新的迁移，每个迁移后更新版本号。
+
+修改模型时在 MIGRATIONS 末尾追加迁移（版本号递增），在其中用显式的 DDL 把上一版本的库升级到新模型。
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import Base
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def reconcile_schema(conn: Connection) -> None:
+    """
+    补齐旧库中缺少的表、模型中新增的可空列与索引（create_all 不会修改已有表）。
+    需要逐表反射，只用于未版本化的旧库。
+    """
+    Base.metadata.create_all(conn)
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def messages_autoincrement(conn: Connection) -> None:
+    """
+    SQLite 下把 messages 重建为 AUTOINCREMENT（id 不变）：普通 INTEGER PRIMARY KEY 会把已删除的最大 rowid
+    分配给新消息，与归档中保留的原 id 冲突。自增序列从现有消息与归档中的最大 id 开始。
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    create_sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages'"))
+    if "AUTOINCREMENT" in create_sql.upper():
+        return
+    from app.models import Message, SessionArchive
+    from app.services.archive_service import decode_messages
+
+    # 没有其他表以外键引用 messages；触发器（全文索引）与索引先删除，重建后恢复触发器
+    triggers = conn.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'messages'"
+    )).all()
+    for name, _ in triggers:
+        conn.execute(text(f'DROP TRIGGER "{name}"'))
+    conn.execute(text("ALTER TABLE messages RENAME TO _messages_rowid"))
+    indexes = conn.scalars(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = '_messages_rowid' AND sql IS NOT NULL"
+    )).all()
+    for name in indexes:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    Message.__table__.create(conn)
+    columns = ", ".join(c.name for c in Message.__table__.columns)
+    conn.execute(text(f"INSERT INTO messages ({columns}) SELECT {columns} FROM _messages_rowid"))
+    conn.execute(text("DROP TABLE _messages_rowid"))
+    for _, sql in triggers:
+        conn.execute(text(sql))
+
+    last_id = conn.scalar(text("SELECT coalesce(max(id), 0) FROM messages"))
+    for data, codec in conn.execute(select(SessionArchive.data, SessionArchive.codec)):
+        last_id = max([last_id] + [m["id"] for m in decode_messages(data, codec)])
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'messages'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('messages', :seq)"), {"seq": last_id})
+
+
+# 版本 1 为引入版本号时的模型（含 session_archives 及 sessions.archived_at/restored_at）
+MIGRATIONS: List[Migration] = [
+    Migration(1, "引入版本号时的模型", reconcile_schema),
+    Migration(2, "messages 使用 AUTOINCREMENT", messages_autoincrement),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+_version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """库的版本号；没有 schema_version 表（新库或旧库）时为 None"""
+    if not inspect(conn).has_table(_version_table.name):
+        return None
+    return conn.scalar(select(_version_table.c.version))
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    conn.execute(_version_table.delete())
+    conn.execute(_version_table.insert().values(version=version, updated_at=datetime.utcnow()))
+
+
+def migrate(conn: Connection) -> dict:
+    """
+    init_db 中以 run_sync 调用（与调用方同一事务）：把库升级到 LATEST_VERSION。
+    返回 {"from": 原版本号或 None, "to": 新版本号, "applied": 执行的步骤}。库的版本高于程序时报错，避免旧程序写坏新库。
+    """
+    version = current = current_version(conn)
+    if version == LATEST_VERSION:
+        return {"from": version, "to": version, "applied": []}
+    if version is not None and version > LATEST_VERSION:
+        raise RuntimeError(f"数据库版本 {version} 高于程序支持的 {LATEST_VERSION}，请升级程序")
+
+    applied = []
+    if version is None:
+        legacy = inspect(conn).has_table("sessions")
+        _version_table.create(conn, checkfirst=True)
+        if not legacy:
+            Base.metadata.create_all(conn)
+            _set_version(conn, LATEST_VERSION)
+            return {"from": None, "to": LATEST_VERSION, "applied": ["create_all"]}
+        # 补齐列与索引后即为版本 1，表级的变更（如 AUTOINCREMENT）仍由之后的迁移完成
+        reconcile_schema(conn)
+        applied.append("reconcile unversioned schema")
+        version = 1
+        _set_version(conn, version)
+
+    for migration in MIGRATIONS:
+        if migration.version > version:
+            migration.upgrade(conn)
+            _set_version(conn, migration.version)
+            applied.append(f"{migration.version}: {migration.description}")
+    return {"from": current, "to": LATEST_VERSION, "applied": applied}
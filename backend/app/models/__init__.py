@@ -1,4 +1,10 @@
 from app.models.session import Session
 from app.models.message import Message
+from app.models.response_cache import ResponseCacheEntry
+from app.models.usage import SessionUsage, DailyUsage
+from app.models.batch import BatchJob, BatchItem
+from app.models.archive import SessionArchive
 
-__all__ = ["Session", "Message"]
+__all__ = [
+    "Session", "Message", "ResponseCacheEntry", "SessionUsage", "DailyUsage", "BatchJob", "BatchItem", "SessionArchive",
+]
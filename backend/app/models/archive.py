@@ -0,0 +1,17 @@
+"""冷存储：长期无活动会话的全部消息压缩为一个二进制块，热表 messages 中不再保留"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String
+
+from app.database import Base
+
+
+class SessionArchive(Base):
+    __tablename__ = "session_archives"
+
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String(10), nullable=False)  # zlib | zstd
+    message_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)  # 压缩前（NDJSON）的字节数
+    stored_bytes = Column(Integer, nullable=False)  # 压缩后的字节数
+    data = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
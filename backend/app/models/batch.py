@@ -0,0 +1,63 @@
+"""批量对话任务模型：一个任务含若干条提示，逐条非流式执行，结果批量写回 messages"""
+from datetime import datetime
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
+
+from app.database import Base
+
+# 任务状态：排队 / 执行中 / 全部完成（含失败的条目）/ 已取消
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+
+# 条目状态：待执行 / 已领取（执行中）/ 成功 / 失败（重试用尽）/ 随任务取消
+ITEM_PENDING = "pending"
+ITEM_RUNNING = "running"
+ITEM_DONE = "done"
+ITEM_FAILED = "failed"
+ITEM_CANCELLED = "cancelled"
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), default="")
+    status = Column(String(20), nullable=False, default=JOB_QUEUED)
+    priority = Column(Integer, nullable=False, default=0)  # 越大越先执行
+    thinking_mode = Column(Boolean, nullable=False, default=False)
+    # 结果写入的会话；会话被删除后结果只保留在条目上
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="SET NULL"), nullable=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=None)
+    finished_at = Column(DateTime, default=None)
+
+    __table_args__ = (
+        # 调度：未结束的任务按优先级、先后顺序领取
+        Index("ix_batch_jobs_status_priority", "status", "priority", "id"),
+        # 删除会话时外键 SET NULL 按 session_id 查找任务
+        Index("ix_batch_jobs_session", "session_id"),
+    )
+
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # 在提交的 prompts 中的下标
+    prompt = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default=ITEM_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    content = Column(Text, default=None)
+    reasoning_content = Column(Text, default=None)
+    error = Column(Text, default=None)
+    message_id = Column(Integer, default=None)  # 写入 messages 的 assistant 消息
+    finished_at = Column(DateTime, default=None)
+
+    __table_args__ = (
+        Index("ix_batch_items_job_status", "job_id", "status", "position"),
+    )
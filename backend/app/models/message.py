@@ -1,10 +1,15 @@
 """消息表模型"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
 
+# assistant 消息状态：流式生成中 / 已完成 / 中断（保留已生成的部分内容）
+MESSAGE_STREAMING = "streaming"
+MESSAGE_COMPLETE = "complete"
+MESSAGE_ABORTED = "aborted"
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -14,6 +19,25 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # user | assistant | system
     content = Column(Text, default="")
     reasoning_content = Column(Text, default=None)  # 仅思考模式下 assistant 消息可能有
+    token_count = Column(Integer, default=None)  # 写入时计算的 content token 数，用于上下文预算
+    status = Column(String(20), default=MESSAGE_COMPLETE)  # 旧数据为 NULL，视同 complete
+    # 上游返回的用量（仅 assistant 消息；缓存重放、单飞跟随者与旧数据为 NULL）
+    model = Column(String(50), default=None)
+    prompt_tokens = Column(Integer, default=None)
+    completion_tokens = Column(Integer, default=None)  # 含 reasoning_tokens
+    reasoning_tokens = Column(Integer, default=None)
+    prompt_cache_hit_tokens = Column(Integer, default=None)
+    prompt_cache_miss_tokens = Column(Integer, default=None)
+    # 本轮的上下文组装模式与首 token 延迟（毫秒），用于对比各模式的缓存命中率与延迟
+    context_mode = Column(String(20), default=None)
+    first_token_ms = Column(Integer, default=None)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     session = relationship("Session", back_populates="messages")
+
+    __table_args__ = (
+        # 同时服务 session_id 过滤与 (created_at, id) 排序/游标分页
+        Index("ix_messages_session_created", "session_id", "created_at", "id"),
+        # 归档会话的消息恢复时沿用原 id：SQLite 不得把已删除（归档）消息的 rowid 分配给新消息
+        {"sqlite_autoincrement": True},
+    )
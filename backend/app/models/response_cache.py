@@ -0,0 +1,15 @@
+"""回复缓存表模型：精确匹配的回复缓存落盘，进程重启后仍可命中"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime
+
+from app.database import Base
+
+
+class ResponseCacheEntry(Base):
+    __tablename__ = "response_cache"
+
+    key = Column(String(64), primary_key=True)  # 规范化上下文 + 思考模式 + 模型的 sha256
+    reasoning = Column(Text, default="")
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,6 +1,6 @@
 """会话表模型"""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -13,5 +13,17 @@ class Session(Base):
     title = Column(String(255), default="新对话")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 已归档到 session_archives 的时间（消息不在 messages 表中，访问时恢复）；NULL 表示未归档
+    archived_at = Column(DateTime, default=None)
+    # 最近一次从归档恢复的时间：恢复后 ARCHIVE_AFTER_DAYS 内不再归档，避免反复查看的旧会话来回压缩
+    restored_at = Column(DateTime, default=None)
 
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    # passive_deletes：删除会话时不加载消息，交给数据库的 ON DELETE CASCADE
+    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # 侧边栏按 updated_at 倒序的游标分页
+        Index("ix_sessions_updated", "updated_at", "id"),
+        # 归档任务查找未归档且长期无活动的会话
+        Index("ix_sessions_archived_updated", "archived_at", "updated_at"),
+    )
@@ -0,0 +1,44 @@
+"""用量汇总表模型：随回复完成增量累加，聚合查询无需扫描 messages 表"""
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, String
+
+from app.database import Base
+
+# 与 Message 上的用量列同名
+USAGE_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "reasoning_tokens",
+    "prompt_cache_hit_tokens",
+    "prompt_cache_miss_tokens",
+)
+
+
+class UsageCounters:
+    replies = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    reasoning_tokens = Column(Integer, nullable=False, default=0)
+    prompt_cache_hit_tokens = Column(Integer, nullable=False, default=0)
+    prompt_cache_miss_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)  # prompt + completion
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SessionUsage(UsageCounters, Base):
+    __tablename__ = "session_usage"
+
+    session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        # 按用量倒序列出最耗 token 的会话
+        Index("ix_session_usage_total", "total_tokens", "session_id"),
+    )
+
+
+class DailyUsage(UsageCounters, Base):
+    """按 UTC 日期与模型汇总；删除会话不回退（已消耗的用量仍计入）"""
+    __tablename__ = "daily_usage"
+
+    day = Column(Date, primary_key=True)
+    model = Column(String(50), primary_key=True)
@@ -0,0 +1,79 @@
+"""批量对话任务 API：提交大量提示离线执行，查询状态、进度与结果"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.config import settings
+from app.database import get_db
+from app.models.batch import JOB_CANCELLED
+from app.schemas.batch import BatchCreate, BatchItemResponse, BatchJobResponse, BatchJobSummary
+from app.services.batch_runner import batch_runner
+from app.services.batch_service import (
+    ITEM_STATUSES,
+    cancel_job,
+    create_job,
+    get_job,
+    job_progress,
+    list_items,
+    list_jobs,
+)
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+
+@router.post("", response_model=BatchJobResponse, status_code=201)
+async def submit_batch(body: BatchCreate, db: DBSession = Depends(get_db)):
+    """创建任务：每条提示独立执行（单轮、非流式），结果按提交顺序写入新建的会话"""
+    if len(body.prompts) > settings.BATCH_MAX_PROMPTS:
+        raise HTTPException(status_code=400, detail=f"单个任务最多 {settings.BATCH_MAX_PROMPTS} 条提示")
+    prompts = [p.strip() for p in body.prompts]
+    if not all(prompts):
+        raise HTTPException(status_code=400, detail="prompts 不能包含空字符串")
+    job = await create_job(db, prompts, body.name.strip(), body.thinking_mode, body.priority)
+    batch_runner.notify()
+    return await job_progress(db, job)
+
+
+@router.get("", response_model=list[BatchJobSummary])
+async def list_batches(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: DBSession = Depends(get_db),
+):
+    """最近的任务，新任务在前"""
+    return await list_jobs(db, status, limit)
+
+
+@router.get("/{job_id}", response_model=BatchJobResponse)
+async def batch_status(job_id: int, db: DBSession = Depends(get_db)):
+    """任务状态与进度：各状态的条目数与完成比例"""
+    job = await get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return await job_progress(db, job)
+
+
+@router.get("/{job_id}/items", response_model=list[BatchItemResponse])
+async def batch_items(
+    job_id: int,
+    status: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: DBSession = Depends(get_db),
+):
+    """条目及其结果，按提交顺序；status 可筛选 pending/running/done/failed/cancelled"""
+    if status is not None and status not in ITEM_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status 仅支持 {','.join(ITEM_STATUSES)}")
+    if await get_job(db, job_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return await list_items(db, job_id, status, offset, limit)
+
+
+@router.post("/{job_id}/cancel", response_model=BatchJobResponse)
+async def cancel_batch(job_id: int, db: DBSession = Depends(get_db)):
+    job = await cancel_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job.status != JOB_CANCELLED:
+        raise HTTPException(status_code=409, detail="任务已结束")
+    return await job_progress(db, job)
@@ -1,89 +1,237 @@
 """Chat 流式对话 API"""
+import asyncio
 import json
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session as DBSession
 
-from app.database import get_db, SessionLocal
+from app.config import settings
+from app.database import SessionLocal
+from app.models.message import MESSAGE_ABORTED, MESSAGE_COMPLETE
 from app.schemas.chat import ChatRequest
-from app.services.llm_service import build_messages_for_api, stream_chat
+from app.services import metrics
+from app.services.llm_service import build_messages_for_api, context_fingerprint, context_mode, stream_chat
+from app.services.coalesce import coalesce_chunks
+from app.services.group_commit import run_write
+from app.services.reply_buffer import ReplyBuffer
+from app.services.response_cache import replay, response_cache
 from app.services.session_service import (
-    create_session,
-    get_messages,
-    messages_to_api_format,
-    add_message,
-    update_session_title_from_message,
-    get_session,
+    Turn,
+    cache_message,
+    checkpoint_reply,
+    finish_reply,
+    start_turn,
 )
+from app.services.stream_registry import Generation, stream_registry
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 
-def sse_line(data: dict) -> bytes:
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+def sse_line(data: dict, event_id: int = 0) -> bytes:
+    """SSE 帧；event_id 非 0 时带 id 字段，客户端重连时以 Last-Event-ID 续传"""
+    prefix = f"id: {event_id}\n" if event_id else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
 
 
-@router.post("/chat")
-def chat_stream(req: ChatRequest, db: DBSession = Depends(get_db)):
-    if not req.message.strip():
-        raise HTTPException(status_code=400, detail="message 不能为空")
+async def _prepare_turn(session_id: Optional[int], text: str) -> Turn:
+    """一轮对话的准备工作（单个事务）：会话、上下文、标题、用户消息、回复占位"""
+    async with SessionLocal() as db:
+        turn = await start_turn(db, session_id, text)
+    if turn is None:
+        raise HTTPException(status_code=404, detail="会话不存在")
+    return turn
+
+
+def _friendly_error(e: Exception) -> str:
+    err = str(e)
+    if "401" in err or "invalid" in err.lower() or "api_key" in err.lower():
+        err = "API Key 无效或未配置，请检查 .env 中的 DEEPSEEK_API_KEY"
+    elif "429" in err or "rate" in err.lower() or "limit" in err.lower():
+        err = "请求过于频繁或 Token 已达上限，请稍后重试"
+    elif "500" in err or "503" in err.lower():
+        err = "DeepSeek 服务暂时不可用，请稍后重试"
+    return err
+
+
+async def _finish(reply_id: int, reply: ReplyBuffer, status: str, usage: Optional[dict]) -> None:
+    content, reasoning = reply.content, reply.reasoning
+    m = await run_write(lambda db: finish_reply(db, reply_id, content, reasoning, status, usage))
+    if m is not None:
+        cache_message(m)
 
-    session_id = req.session_id
-    if session_id is None:
-        s = create_session(db)
-        session_id = s.id
-    else:
-        s = get_session(db, session_id)
-        if not s:
-            raise HTTPException(status_code=404, detail="会话不存在")
-
-    messages = get_messages(db, session_id)
-    api_messages = messages_to_api_format(messages)
-    api_messages.append({"role": "user", "content": req.message.strip()})
-
-    # 若为首条消息，用其更新会话标题
-    new_title = None
-    if len(messages) == 0:
-        update_session_title_from_message(db, session_id, req.message.strip())
-        t = req.message.strip()
-        new_title = (t[:30] + "…") if len(t) > 30 else (t or "新对话")
-
-    # 先持久化用户消息
-    add_message(db, session_id, "user", req.message.strip())
-
-    reasoning = ""
-    content = ""
-
-    def generate():
-        nonlocal reasoning, content
+
+async def _shielded(coro) -> None:
+    """在独立任务中运行 coro 并等待其完成：期间再被取消也不中断它，完成后再传播取消"""
+    task = asyncio.ensure_future(coro)
+    cancelled = False
+    while not task.done():
         try:
-            for chunk in stream_chat(api_messages, req.thinking_mode):
-                if chunk["type"] == "reasoning":
-                    reasoning += chunk["data"]
-                elif chunk["type"] == "content":
-                    content += chunk["data"]
-                if chunk["type"] == "done" and new_title is not None:
-                    yield sse_line({"type": "session_title", "data": new_title})
-                yield sse_line(chunk)
-        except Exception as e:
-            err = str(e)
-            if "401" in err or "invalid" in err.lower() or "api_key" in err.lower():
-                err = "API Key 无效或未配置，请检查 .env 中的 DEEPSEEK_API_KEY"
-            elif "429" in err or "rate" in err.lower() or "limit" in err.lower():
-                err = "请求过于频繁或 Token 已达上限，请稍后重试"
-            elif "500" in err or "503" in err.lower():
-                err = "DeepSeek 服务暂时不可用，请稍后重试"
-            yield sse_line({"type": "content", "data": f"[错误] {err}"})
-            yield sse_line({"type": "done", "data": ""})
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            cancelled = True
+    if cancelled:
+        raise asyncio.CancelledError
+    task.result()
+
+
+async def _produce(
+    gen: Generation,
+    turn: Turn,
+    api_messages: List[dict],
+    thinking_mode: bool,
+    coalesce: bool,
+    started: float,
+    mode: str,
+) -> None:
+    """生成任务：独立于 HTTP 连接运行，把上游增量发布到注册表"""
+    db_time = metrics.track_db_time()
+    reply = ReplyBuffer(settings.CHECKPOINT_EVERY_TOKENS, settings.CHECKPOINT_INTERVAL_SECONDS)
+    status = MESSAGE_ABORTED
+
+    key = context_fingerprint(api_messages, thinking_mode) if settings.RESPONSE_CACHE_ENABLED else None
+    cached = None
+    usage: Optional[dict] = None
+    first_token: Dict[str, float] = {}
+    token_count = 0
+
+    async def upstream():
+        """上游（或缓存重放）的原始增量：逐个累积到回复缓冲并按需检查点；用量只记录，不发给客户端"""
+        nonlocal cached, usage, token_count
+        if key is not None:
+            cached = await response_cache.lookup(key)
+        if cached is not None:
+            source = replay(
+                cached,
+                settings.RESPONSE_CACHE_REPLAY_CHUNK_CHARS,
+                settings.RESPONSE_CACHE_REPLAY_INTERVAL_MS / 1000,
+            )
         else:
-            db2 = SessionLocal()
+            source = stream_chat(api_messages, thinking_mode, client_key=str(turn.session_id))
+        async for chunk in source:
+            ctype = chunk["type"]
+            if ctype == "usage":
+                usage = chunk["data"]
+                continue
+            if ctype != "done":
+                token_count += 1
+                if ctype not in first_token:
+                    first_token[ctype] = time.perf_counter()
+                    origin = "cache" if cached is not None else "upstream"
+                    metrics.first_token_seconds.observe(first_token[ctype] - started, ctype, origin)
+            reply.add(chunk)
+            yield chunk
+            if reply.checkpoint_due():
+                reply.mark_checkpoint()
+                content, reasoning = reply.content, reply.reasoning
+                await run_write(lambda db: checkpoint_reply(db, turn.reply_id, content, reasoning))
+
+    chunks = upstream()
+    if coalesce:
+        chunks = coalesce_chunks(chunks, settings.SSE_COALESCE_WINDOW_MS / 1000, settings.SSE_COALESCE_MAX_BYTES)
+    try:
+        async for chunk in chunks:
+            if chunk["type"] == "done" and turn.new_title is not None:
+                gen.publish({"type": "session_title", "data": turn.new_title})
+            gen.publish(chunk)
+        status = MESSAGE_COMPLETE
+        if key is not None and cached is None and reply.content:
+            await response_cache.store(key, reply.reasoning, reply.content)
+    except asyncio.CancelledError:
+        # 被取消（DELETE 或进程关闭）：订阅者照常收到 done 后结束
+        gen.publish({"type": "done", "data": ""})
+        raise
+    except Exception as e:
+        gen.publish({"type": "content", "data": f"[错误] {_friendly_error(e)}"})
+        gen.publish({"type": "done", "data": ""})
+    finally:
+        ended = time.perf_counter()
+        metrics.stream_seconds.observe(ended - started, status)
+        if cached is None and first_token:
+            ttft = min(first_token.values()) - started
+            metrics.context_first_token_seconds.observe(ttft, mode)
+            if usage:
+                usage = {**usage, "context_mode": mode, "first_token_ms": round(ttft * 1000)}
+        if usage:
+            metrics.prompt_cache_tokens.inc(usage.get("prompt_cache_hit_tokens") or 0, mode, "hit")
+            metrics.prompt_cache_tokens.inc(usage.get("prompt_cache_miss_tokens") or 0, mode, "miss")
+        if status == MESSAGE_COMPLETE and first_token:
+            streamed = ended - min(first_token.values())
+            if streamed > 0:
+                tokens = usage["completion_tokens"] if usage else token_count
+                metrics.tokens_per_second.observe(tokens / streamed)
+
+        async def settle():
             try:
-                add_message(db2, session_id, "assistant", content, reasoning if reasoning else None)
+                await chunks.aclose()  # 停止读取上游，回复缓冲不再变化
+                await _finish(turn.reply_id, reply, status, usage)
             finally:
-                db2.close()
+                stream_registry.finish(gen)
+                metrics.generation_db_seconds.observe(db_time.seconds)
 
+        # 生成任务被取消（DELETE 或进程关闭，可能不止一次）时也要保证最终状态落库
+        await _shielded(settle())
+
+
+def _stream_response(gen: Generation, after: int) -> StreamingResponse:
+    async def frames():
+        async for event_id, frame in gen.subscribe(after):
+            yield sse_line(frame, event_id)
+
+    # 异步生成器由事件循环直接驱动，每个打开的流不再独占一个线程
     return StreamingResponse(
-        generate(),
+        frames(),
         media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Generation-Id": gen.id},
     )
+
+
+@router.post("/chat")
+async def chat_stream(req: ChatRequest):
+    started = time.perf_counter()
+    text = req.message.strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="message 不能为空")
+
+    # 不使用 get_db 依赖，否则连接会被占用到整个流结束，并发流会耗尽连接池
+    turn = await _prepare_turn(req.session_id, text)
+    mode = context_mode()
+    api_messages = build_messages_for_api(turn.history, mode=mode)
+    metrics.context_build_seconds.observe(time.perf_counter() - started)
+    coalesce = settings.SSE_COALESCE_ENABLED if req.coalesce is None else req.coalesce
+
+    gen = stream_registry.create(turn.session_id, turn.reply_id)
+    gen.task = asyncio.create_task(_produce(gen, turn, api_messages, req.thinking_mode, coalesce, started, mode))
+    return _stream_response(gen, 0)
+
+
+@router.get("/chat/streams/{generation_id}")
+async def resume_stream(
+    generation_id: str,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    重新连接进行中（或刚结束）的生成，从 Last-Event-ID（请求头或查询参数）之后续传；
+    不带 Last-Event-ID 时从头重放，可供其他标签页附加到同一生成。
+    """
+    gen = stream_registry.get(generation_id)
+    if gen is None:
+        raise HTTPException(status_code=404, detail="生成不存在或已过期")
+    try:
+        after = int(last_event_id_header or last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的 Last-Event-ID")
+    if after > gen.last_event_id:
+        raise HTTPException(status_code=400, detail=f"Last-Event-ID 超出当前最后的事件 {gen.last_event_id}")
+    return _stream_response(gen, max(0, after))
+
+
+@router.delete("/chat/streams/{generation_id}")
+async def cancel_stream(generation_id: str):
+    """停止进行中的生成，已生成的部分保存为 aborted 回复"""
+    gen = stream_registry.get(generation_id)
+    if gen is None:
+        raise HTTPException(status_code=404, detail="生成不存在或已过期")
+    return {"ok": True, "cancelled": await stream_registry.cancel(gen)}
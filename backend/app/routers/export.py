@@ -0,0 +1,32 @@
+"""数据导出/导入 API：NDJSON 流式传输，适合备份、迁移与离线分析"""
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.export_service import InvalidImport, export_ndjson, import_ndjson
+
+router = APIRouter(prefix="/api", tags=["export"])
+
+
+@router.get("/export")
+async def export_data(gzip: bool = Query(False, description="输出 gzip 压缩的 NDJSON")):
+    """导出全部会话与消息；不使用 get_db 依赖，数据库会话由导出生成器自行持有到流结束"""
+    filename = f"minichatgpt-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_ndjson(gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+async def import_data(request: Request):
+    """请求体为 /api/export 的输出（NDJSON 或 gzip），边接收边分批写入；会话以新 id 导入"""
+    try:
+        return await import_ndjson(request.stream())
+    except InvalidImport as e:
+        imported = e.imported
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e}（此前已导入 {imported['sessions']} 个会话、{imported['messages']} 条消息）",
+        )
@@ -0,0 +1,28 @@
+"""Prometheus 指标 API"""
+import anyio.to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.admission import admission
+from app.services.batch_runner import batch_runner
+from app.services.metrics import registry
+from app.services.stream_registry import stream_registry
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 文本格式；瞬时值在抓取时采样"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    streams = stream_registry.stats()
+    gauges = [
+        ("chat_streams_in_flight", "Generations still streaming", streams["running"]),
+        ("chat_stream_subscribers", "Open SSE subscriptions", streams["subscribers"]),
+        ("upstream_in_flight", "Upstream calls holding an admission slot", admission.in_flight),
+        ("upstream_queued", "Requests waiting for an admission slot", admission.queued),
+        ("batch_workers_busy", "Batch workers waiting on an upstream call", batch_runner.busy),
+        ("threadpool_busy_threads", "Worker threads currently borrowed from the threadpool", limiter.borrowed_tokens),
+        ("threadpool_max_threads", "Threadpool capacity", limiter.total_tokens),
+    ]
+    return PlainTextResponse(registry.render(gauges), media_type="text/plain; version=0.0.4")
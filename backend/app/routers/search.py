@@ -0,0 +1,24 @@
+"""全文搜索 API"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.database import get_db
+from app.schemas.search import SearchResponse
+from app.services.search_service import search
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_messages(
+    q: str = Query(..., max_length=200, description="空格分隔的关键词，全部命中才返回"),
+    reasoning: bool = Query(False, description="同时搜索思考过程"),
+    limit: int = Query(20, ge=1, le=100, description="每页会话数"),
+    offset: int = Query(0, ge=0),
+    per_session: int = Query(3, ge=1, le=20, description="每个会话返回的命中消息数"),
+    db: DBSession = Depends(get_db),
+):
+    """搜索所有会话的消息，结果按会话分组并按相关度排序"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q 不能为空")
+    return await search(db, q.strip(), reasoning, limit, offset, per_session)
@@ -1,58 +1,139 @@
 """会话 CRUD API"""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session as DBSession
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
 
 from app.database import get_db
-from app.schemas.session import SessionCreate, SessionUpdate, SessionResponse
+from app.schemas.session import SessionBulkDelete, SessionCreate, SessionUpdate, SessionResponse
 from app.schemas.message import MessageResponse
 from app.services.session_service import (
     get_sessions,
+    get_sessions_page,
     create_session,
     get_session,
     delete_session,
+    delete_sessions,
     update_session,
     get_messages,
+    get_messages_page,
+    InvalidCursor,
 )
+from app.services.serialization import RowSerializer
 
 router = APIRouter(prefix="/api", tags=["sessions"])
 
 
+SESSIONS_PAGE_SIZE = 50
+SESSION_FIELDS = ("id", "title", "created_at", "updated_at")
+
+# 列表接口只查询响应模型的列并直接编码为 JSON，不逐行构造 ORM 对象、不经过 response_model 校验
+_session_rows = RowSerializer(SessionResponse.model_fields)
+_message_rows = RowSerializer(MessageResponse.model_fields)
+
+
 @router.get("/sessions", response_model=list[SessionResponse])
-def list_sessions(db: DBSession = Depends(get_db)):
-    return get_sessions(db)
+async def list_sessions(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的字段投影，如 id,title"),
+    db: DBSession = Depends(get_db),
+):
+    """
+    不带参数时返回全部会话（兼容旧客户端）；
+    带 limit/cursor 时按 updated_at 倒序分页，响应头 X-Next-Cursor 为下一页游标。
+    fields 指定时只查询并返回这些字段（仅投影，不影响是否分页），便于轻量渲染侧边栏。
+    """
+    serializer = _session_rows
+    if fields:
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        if not selected or any(f not in SESSION_FIELDS for f in selected):
+            raise HTTPException(status_code=400, detail=f"fields 仅支持 {','.join(SESSION_FIELDS)}")
+        serializer = RowSerializer(selected)
+
+    if limit is None and cursor is None:
+        return serializer.response(await get_sessions(db, serializer.fields))
+    try:
+        rows, next_cursor = await get_sessions_page(db, limit or SESSIONS_PAGE_SIZE, cursor, serializer.fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的游标")
+    return serializer.response(rows, {"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 
 @router.post("/sessions", response_model=SessionResponse)
-def create_new_session(db: DBSession = Depends(get_db)):
-    return create_session(db)
+async def create_new_session(db: DBSession = Depends(get_db)):
+    return await create_session(db)
 
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
-def get_session_detail(session_id: int, db: DBSession = Depends(get_db)):
-    s = get_session(db, session_id)
+async def get_session_detail(session_id: int, db: DBSession = Depends(get_db)):
+    s = await get_session(db, session_id)
     if not s:
         raise HTTPException(status_code=404, detail="会话不存在")
     return s
 
 
+MESSAGES_PAGE_SIZE = 50
+
+
 @router.get("/sessions/{session_id}/messages", response_model=list[MessageResponse])
-def list_messages(session_id: int, db: DBSession = Depends(get_db)):
-    s = get_session(db, session_id)
+async def list_messages(
+    session_id: int,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: DBSession = Depends(get_db),
+):
+    """
+    不带参数时返回完整历史（兼容旧客户端）；
+    带 limit/before/after 时按游标分页，首页为最新的 limit 条，响应头 X-Has-More 表示是否还有更多。
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="before 与 after 不能同时使用")
+    s = await get_session(db, session_id)
     if not s:
         raise HTTPException(status_code=404, detail="会话不存在")
-    return get_messages(db, session_id)
+    if limit is None and before is None and after is None:
+        return _message_rows.response(await get_messages(db, session_id, _message_rows.fields))
+    try:
+        rows, has_more = await get_messages_page(
+            db, session_id, limit or MESSAGES_PAGE_SIZE, before, after, _message_rows.fields
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的游标")
+    return _message_rows.response(rows, {"X-Has-More": "true" if has_more else "false"})
+
+
+@router.delete("/sessions")
+async def remove_sessions(body: SessionBulkDelete):
+    """
+    批量删除会话（ids，和/或 updated_before、older_than_days 按最后活动时间），分批在多个短事务中执行；
+    返回删除的会话数与消息数。中途失败时此前的批次已删除。
+    """
+    cutoffs = []
+    if body.updated_before is not None:
+        before = body.updated_before
+        if before.tzinfo is not None:
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)  # 库中时间为 UTC naive
+        cutoffs.append(before)
+    if body.older_than_days is not None:
+        cutoffs.append(datetime.utcnow() - timedelta(days=body.older_than_days))
+    if body.ids is None and not cutoffs:
+        raise HTTPException(status_code=400, detail="需要指定 ids、updated_before 或 older_than_days")
+    deleted = await delete_sessions(body.ids, min(cutoffs) if cutoffs else None)
+    return {"ok": True, "deleted": deleted["sessions"], "messages": deleted["messages"]}
 
 
 @router.delete("/sessions/{session_id}")
-def remove_session(session_id: int, db: DBSession = Depends(get_db)):
-    if not delete_session(db, session_id):
+async def remove_session(session_id: int, db: DBSession = Depends(get_db)):
+    if not await delete_session(db, session_id):
         raise HTTPException(status_code=404, detail="会话不存在")
     return {"ok": True}
 
 
 @router.patch("/sessions/{session_id}", response_model=SessionResponse)
-def patch_session(session_id: int, body: SessionUpdate, db: DBSession = Depends(get_db)):
-    s = update_session(db, session_id, body.title)
+async def patch_session(session_id: int, body: SessionUpdate, db: DBSession = Depends(get_db)):
+    s = await update_session(db, session_id, body.title)
     if not s:
         raise HTTPException(status_code=404, detail="会话不存在")
     return s
@@ -0,0 +1,64 @@
+"""
+运行时统计 API：连接池、缓存等内部状态，便于调优。
+这些状态属于事件循环（admission 队列、注册表、缓存字典等），处理函数须为 async def，不能放进线程池读取。
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.database import get_db
+from app.services.admission import admission
+from app.services.archive_service import archive_totals, archiver
+from app.services.batch_runner import batch_runner
+from app.services.context_cache import context_cache
+from app.services.group_commit import group_commit_writer
+from app.services.llm_service import get_pool_stats, get_single_flight_stats
+from app.services.response_cache import response_cache
+from app.services.stream_registry import stream_registry
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+@router.get("/upstream")
+async def upstream_stats():
+    return get_pool_stats()
+
+
+@router.get("/admission")
+async def admission_stats():
+    return admission.stats()
+
+
+@router.get("/single-flight")
+async def single_flight_stats():
+    return get_single_flight_stats()
+
+
+@router.get("/context-cache")
+async def context_cache_stats():
+    return context_cache.stats()
+
+
+@router.get("/group-commit")
+async def group_commit_stats():
+    return group_commit_writer.stats()
+
+
+@router.get("/streams")
+async def stream_stats():
+    return stream_registry.stats()
+
+
+@router.get("/response-cache")
+async def response_cache_stats():
+    return response_cache.stats()
+
+
+@router.get("/batch")
+async def batch_stats():
+    return batch_runner.stats()
+
+
+@router.get("/archive")
+async def archive_stats(db: DBSession = Depends(get_db)):
+    """归档任务与恢复耗时（进程内），以及归档表中累计的压缩前后字节数与节省的字节数"""
+    return {**archiver.stats(), "stored": await archive_totals(db)}
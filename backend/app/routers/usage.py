@@ -0,0 +1,39 @@
+"""用量统计 API：读取随回复完成累加的汇总表，不扫描 messages 表"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.database import get_db
+from app.schemas.usage import DailyUsageResponse, ModelUsageResponse, SessionUsageResponse
+from app.services.usage_service import daily_usage, get_session_usage, model_usage, top_sessions
+
+router = APIRouter(prefix="/api/usage", tags=["usage"])
+
+
+@router.get("/sessions", response_model=list[SessionUsageResponse])
+async def list_session_usage(limit: int = Query(50, ge=1, le=500), db: DBSession = Depends(get_db)):
+    """用量最高的会话，按总 token 倒序"""
+    return await top_sessions(db, limit)
+
+
+@router.get("/sessions/{session_id}", response_model=SessionUsageResponse)
+async def session_usage(session_id: int, db: DBSession = Depends(get_db)):
+    usage = await get_session_usage(db, session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="会话不存在")
+    return usage
+
+
+@router.get("/daily", response_model=list[DailyUsageResponse])
+async def list_daily_usage(
+    days: int = Query(30, ge=1, le=366),
+    model: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """最近 days 天（UTC）每日用量，新日期在前"""
+    return await daily_usage(db, days, model)
+
+
+@router.get("/models", response_model=list[ModelUsageResponse])
+async def list_model_usage(db: DBSession = Depends(get_db)):
+    return await model_usage(db)
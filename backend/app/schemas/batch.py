@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class BatchCreate(BaseModel):
+    prompts: List[str] = Field(..., min_length=1)
+    name: str = Field("", max_length=200)
+    thinking_mode: bool = False
+    priority: int = 0  # 越大越先执行；交互请求总是优先于所有批量任务
+
+
+class BatchJobResponse(BaseModel):
+    id: int
+    name: str
+    status: str
+    priority: int
+    thinking_mode: bool
+    session_id: Optional[int] = None
+    total: int
+    items: Dict[str, int]  # 各状态的条目数
+    progress: float  # 已结束（成功、失败、取消）的比例
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class BatchJobSummary(BaseModel):
+    id: int
+    name: str
+    status: str
+    priority: int
+    session_id: Optional[int] = None
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class BatchItemResponse(BaseModel):
+    id: int
+    position: int
+    prompt: str
+    status: str
+    attempts: int
+    content: Optional[str] = None
+    reasoning_content: Optional[str] = None
+    error: Optional[str] = None
+    message_id: Optional[int] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
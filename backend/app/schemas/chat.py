@@ -6,3 +6,4 @@ class ChatRequest(BaseModel):
     session_id: Optional[int] = None
     message: str
     thinking_mode: bool = False
+    coalesce: Optional[bool] = None  # 是否合并 SSE 帧，None 时使用服务端默认配置
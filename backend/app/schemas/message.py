@@ -9,6 +9,7 @@ class MessageResponse(BaseModel):
     role: str
     content: str
     reasoning_content: Optional[str] = None
+    status: Optional[str] = None
     created_at: datetime
 
     class Config:
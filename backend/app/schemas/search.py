@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class SearchHit(BaseModel):
+    message_id: int
+    role: str
+    created_at: datetime
+    snippet: str  # 已转义的 HTML，命中处以 <mark> 包裹
+
+
+class SessionSearchResult(BaseModel):
+    session_id: int
+    title: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    hits: int
+    messages: List[SearchHit]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    total_sessions: int
+    truncated: bool
+    next_offset: Optional[int] = None
+    results: List[SessionSearchResult]
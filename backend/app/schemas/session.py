@@ -1,5 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 
 class SessionCreate(BaseModel):
@@ -15,6 +16,14 @@ class SessionResponse(BaseModel):
     title: str
     created_at: datetime
     updated_at: datetime
+    archived_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+
+class SessionBulkDelete(BaseModel):
+    """按 id 列表和/或最后活动时间批量删除，至少给出一个条件；同时给出时取交集"""
+    ids: Optional[List[int]] = Field(None, max_length=100000)
+    updated_before: Optional[datetime] = None
+    older_than_days: Optional[float] = Field(None, ge=0)
@@ -0,0 +1,26 @@
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel
+
+
+class UsageTotals(BaseModel):
+    replies: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reasoning_tokens: int = 0
+    prompt_cache_hit_tokens: int = 0
+    prompt_cache_miss_tokens: int = 0
+    total_tokens: int = 0
+
+
+class SessionUsageResponse(UsageTotals):
+    session_id: int
+    title: Optional[str] = None
+
+
+class DailyUsageResponse(UsageTotals):
+    day: date
+
+
+class ModelUsageResponse(UsageTotals):
+    model: str
@@ -0,0 +1,133 @@
+"""上游准入控制：限制并发上游调用数，超出时按会话公平排队，排队有最长等待时间；批量任务排在交互请求之后"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+from app.config import settings
+from app.services import metrics
+
+
+class AdmissionTimeout(Exception):
+    """排队等待超过 max_wait 秒仍未获得上游调用名额"""
+
+
+class AdmissionController:
+    """
+    最多 max_in_flight 个上游调用同时进行（0 表示不限制）。名额用尽时请求按 key（会话）分队，
+    释放的名额在各队列间轮转分配，单个会话的连发请求不会饿死其他会话；超过 max_wait 秒抛 AdmissionTimeout。
+    background（批量任务）请求另排一队：只有没有交互请求排队时才获得名额，且不设等待上限。
+    仅在事件循环中访问，无需加锁。
+    """
+
+    def __init__(self, max_in_flight: int, max_wait: float):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._background: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued_total = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.retries = 0
+        self.retry_after_honoured = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values()) + len(self._background)
+
+    async def acquire(self, key: str, background: bool = False) -> None:
+        waiting = self._queues or (background and self._background)
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not waiting):
+            self.in_flight += 1
+            self.admitted += 1
+            metrics.upstream_queue_seconds.observe(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if background:
+            self._background.append(future)
+        else:
+            self._queues.setdefault(key, deque()).append(future)
+        self.queued_total += 1
+        t0 = time.monotonic()
+        try:
+            timeout = self.max_wait if self.max_wait > 0 and not background else None
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._discard(key, future)
+            self.timeouts += 1
+            raise AdmissionTimeout("排队等待超时，服务繁忙，请稍后重试")
+        except asyncio.CancelledError:
+            if background:
+                if future in self._background:
+                    self._background.remove(future)
+            else:
+                self._discard(key, future)
+            # 名额已转交给本请求但任务随即被取消：归还名额
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            waited = time.monotonic() - t0
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            metrics.upstream_queue_seconds.observe(waited)
+        self.admitted += 1
+
+    def release(self) -> None:
+        """归还名额：有排队请求时按会话轮转直接转交（交互请求优先于批量任务），in_flight 不变"""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        while self._background:
+            future = self._background.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _discard(self, key: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._queues[key]
+
+    @asynccontextmanager
+    async def slot(self, key: str, background: bool = False) -> AsyncIterator[None]:
+        await self.acquire(key, background)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_wait": self.max_wait,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queued_sessions": len(self._queues),
+            "queued_background": len(self._background),
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "timeouts": self.timeouts,
+            "avg_wait": self.wait_total / self.queued_total if self.queued_total else 0.0,
+            "max_wait_seen": self.wait_max,
+            "retries": self.retries,
+            "retry_after_honoured": self.retry_after_honoured,
+        }
+
+
+admission = AdmissionController(settings.UPSTREAM_MAX_IN_FLIGHT, settings.UPSTREAM_QUEUE_TIMEOUT)
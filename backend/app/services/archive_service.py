@@ -0,0 +1,346 @@
+"""
+冷存储：长期无活动的会话把全部消息序列化为 NDJSON、整体压缩为一个二进制块存入 session_archives，
+并从 messages 表（及全文索引）删除，热库只保留活跃会话；读取消息时自动恢复回 messages 表。
+"""
+import asyncio
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import DateTime, delete, exists, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Message, Session, SessionArchive
+from app.models.message import MESSAGE_STREAMING
+from app.services import metrics
+from app.services.context_cache import context_cache
+from app.services.search_service import merge_search_index
+from app.services.serialization import dumps
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：未安装时只能使用 zlib
+    zstandard = None
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+# 归档保存消息的全部列（含 id，恢复后消息 id 不变，分页游标与搜索结果仍然有效）
+ARCHIVE_FIELDS = tuple(c.name for c in Message.__table__.columns if c.name != "session_id")
+_DATETIME_FIELDS = frozenset(c.name for c in Message.__table__.columns if isinstance(c.type, DateTime))
+CHUNK_ROWS = 5000  # 每条 DELETE .. IN 的 id 数与每次 INSERT 的行数，低于各数据库的绑定参数上限
+
+
+def _codec() -> str:
+    if settings.ARCHIVE_COMPRESSION == CODEC_ZSTD and zstandard is not None:
+        return CODEC_ZSTD
+    return CODEC_ZLIB
+
+
+def _compress(payload: bytes, codec: str, level: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+    return zlib.compress(payload, level)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("归档使用 zstd 压缩，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_messages(rows) -> bytes:
+    """消息行（含 ARCHIVE_FIELDS 各列）序列化为 NDJSON"""
+    return b"".join(dumps(dict(r._mapping)) + b"\n" for r in rows)
+
+
+def decode_messages(data: bytes, codec: str) -> List[dict]:
+    """解压并解析归档，返回按时间正序的消息字典；只保留当前模型中仍存在的列"""
+    messages = []
+    for line in _decompress(data, codec).splitlines():
+        raw = json.loads(line)
+        m = {f: raw.get(f) for f in ARCHIVE_FIELDS}
+        for f in _DATETIME_FIELDS:
+            if m[f] is not None:
+                m[f] = datetime.fromisoformat(m[f])
+        messages.append(m)
+    return messages
+
+
+def _has_streaming(session_id_column):
+    return exists().where(Message.session_id == session_id_column, Message.status == MESSAGE_STREAMING)
+
+
+async def archive_session(session_id: int) -> Optional[dict]:
+    """
+    归档一个会话：先在事务外读取消息并在线程中压缩，再在一个短事务中写入归档、删除消息、标记会话。
+    标记时校验 updated_at 未变（期间有新消息则放弃，下次再试），写锁只覆盖写入与删除。
+    返回 {"messages", "raw_bytes", "stored_bytes"}；会话不存在、已归档或期间有活动时返回 None。
+    """
+    async with SessionLocal() as db:
+        updated_at = await db.scalar(
+            select(Session.updated_at).where(Session.id == session_id, Session.archived_at.is_(None))
+        )
+        if updated_at is None:
+            return None
+        rows = (await db.execute(
+            select(*(getattr(Message, f) for f in ARCHIVE_FIELDS))
+            .where(Message.session_id == session_id)
+            .order_by(Message.created_at, Message.id)
+        )).all()
+        ids = [r.id for r in rows]
+        payload = encode_messages(rows)
+        del rows
+        codec, level = _codec(), settings.ARCHIVE_COMPRESSION_LEVEL
+        data = await asyncio.to_thread(_compress, payload, codec, level)
+
+        now = datetime.utcnow()
+        claimed = await db.execute(
+            update(Session)
+            .where(
+                Session.id == session_id,
+                Session.archived_at.is_(None),
+                Session.updated_at == updated_at,
+                ~_has_streaming(Session.id),
+            )
+            # 显式保留 updated_at：归档不是会话活动，不能触发 onupdate 改变侧边栏排序
+            .values(archived_at=now, updated_at=Session.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if claimed.rowcount == 0:
+            await db.rollback()
+            return None
+        await db.execute(insert(SessionArchive).values(
+            session_id=session_id, codec=codec, message_count=len(ids), raw_bytes=len(payload),
+            stored_bytes=len(data), data=data, archived_at=now,
+        ))
+        for i in range(0, len(ids), CHUNK_ROWS):
+            await db.execute(
+                delete(Message)
+                .where(Message.id.in_(ids[i:i + CHUNK_ROWS]))
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+    context_cache.invalidate(session_id)
+    metrics.archive_sessions.inc(1, "archived")
+    metrics.archive_bytes.inc(len(payload), "raw")
+    metrics.archive_bytes.inc(len(data), "stored")
+    return {"messages": len(ids), "raw_bytes": len(payload), "stored_bytes": len(data)}
+
+
+async def restore_session(db: DBSession, session_id: int) -> bool:
+    """
+    在调用方的数据库会话中把归档的消息按原 id 批量插入 messages 并删除归档，提交（调用方不能有未提交的写入）。
+    并发的恢复请求只有一个执行，其余等待写锁后发现已恢复，直接返回 False。
+    """
+    t0 = time.perf_counter()
+    claimed = await db.execute(
+        update(Session)
+        .where(Session.id == session_id, Session.archived_at.isnot(None))
+        .values(archived_at=None, restored_at=datetime.utcnow(), updated_at=Session.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount == 0:
+        await db.commit()
+        return False
+    archive = (await db.execute(
+        select(SessionArchive.data, SessionArchive.codec).where(SessionArchive.session_id == session_id)
+    )).first()
+    if archive is not None:
+        messages = await asyncio.to_thread(decode_messages, archive.data, archive.codec)
+        for i in range(0, len(messages), CHUNK_ROWS):
+            chunk = [{**m, "session_id": session_id} for m in messages[i:i + CHUNK_ROWS]]
+            # messages 改为 AUTOINCREMENT 之前，原 id 可能已被新消息占用：这些消息改用新 id 恢复
+            taken = set(await db.scalars(select(Message.id).where(Message.id.in_([m["id"] for m in chunk]))))
+            kept = [m for m in chunk if m["id"] not in taken]
+            if kept:
+                await db.execute(insert(Message), kept)
+            moved = [{k: v for k, v in m.items() if k != "id"} for m in chunk if m["id"] in taken]
+            if moved:
+                await db.execute(insert(Message), moved)
+        await db.execute(delete(SessionArchive).where(SessionArchive.session_id == session_id))
+    await db.commit()
+    context_cache.invalidate(session_id)
+    seconds = time.perf_counter() - t0
+    metrics.archive_sessions.inc(1, "restored")
+    metrics.archive_restore_seconds.observe(seconds)
+    archiver.restores += 1
+    archiver.restore_seconds += seconds
+    archiver.restore_max_seconds = max(archiver.restore_max_seconds, seconds)
+    return True
+
+
+async def restore_if_archived(db: DBSession, session_id: int) -> bool:
+    """读取会话消息前调用：已归档时先恢复（主键查询一次，未归档时没有其他开销）"""
+    archived_at = await db.scalar(select(Session.archived_at).where(Session.id == session_id))
+    if archived_at is None:
+        return False
+    return await restore_session(db, session_id)
+
+
+async def load_archived_messages(db: DBSession, session_id: int) -> List[dict]:
+    """只读地解出会话的归档消息（导出用，不恢复到 messages）；没有归档时返回空列表"""
+    archive = (await db.execute(
+        select(SessionArchive.data, SessionArchive.codec).where(SessionArchive.session_id == session_id)
+    )).first()
+    if archive is None:
+        return []
+    return await asyncio.to_thread(decode_messages, archive.data, archive.codec)
+
+
+async def archive_inactive_sessions(cutoff: datetime, batch: int) -> dict:
+    """
+    归档最后活动（及最近一次恢复）早于 cutoff、有消息且没有生成中回复的会话，每次查询 batch 个候选，
+    逐个会话各用一个短事务，结束后整理全文索引。返回本次归档的会话数、消息数与压缩前后字节数。
+    """
+    totals = {"sessions": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+    while True:
+        async with SessionLocal() as db:
+            ids = list(await db.scalars(
+                select(Session.id)
+                .where(
+                    Session.archived_at.is_(None),
+                    Session.updated_at < cutoff,
+                    or_(Session.restored_at.is_(None), Session.restored_at < cutoff),
+                    exists().where(Message.session_id == Session.id),
+                    ~_has_streaming(Session.id),
+                )
+                .order_by(Session.updated_at)
+                .limit(batch)
+            ))
+        archived = 0
+        for session_id in ids:
+            result = await archive_session(session_id)
+            if result is not None:
+                archived += 1
+                totals["sessions"] += 1
+                for key in ("messages", "raw_bytes", "stored_bytes"):
+                    totals[key] += result[key]
+            await asyncio.sleep(0)
+        # 候选都在期间有了活动（或不足一批）时结束，避免反复查询同一批会话
+        if archived == 0 or len(ids) < batch:
+            break
+    if totals["sessions"]:
+        await merge_search_index()  # 释放被删除消息在全文索引中占用的空间
+    return totals
+
+
+async def archive_totals(db: DBSession) -> dict:
+    """归档表的汇总：会话数、消息数、压缩前后字节数与节省的字节数（按压缩算法）"""
+    rows = (await db.execute(
+        select(
+            SessionArchive.codec,
+            func.count(),
+            func.sum(SessionArchive.message_count),
+            func.sum(SessionArchive.raw_bytes),
+            func.sum(SessionArchive.stored_bytes),
+        ).group_by(SessionArchive.codec)
+    )).all()
+    codecs = {}
+    for codec, sessions, messages, raw, stored in rows:
+        codecs[codec] = {
+            "sessions": sessions,
+            "messages": messages or 0,
+            "raw_bytes": raw or 0,
+            "stored_bytes": stored or 0,
+            "bytes_saved": (raw or 0) - (stored or 0),
+            "ratio": (raw / stored) if stored else None,
+        }
+    raw = sum(c["raw_bytes"] for c in codecs.values())
+    stored = sum(c["stored_bytes"] for c in codecs.values())
+    return {
+        "sessions": sum(c["sessions"] for c in codecs.values()),
+        "messages": sum(c["messages"] for c in codecs.values()),
+        "raw_bytes": raw,
+        "stored_bytes": stored,
+        "bytes_saved": raw - stored,
+        "codecs": codecs,
+    }
+
+
+class Archiver:
+    """后台归档任务：每隔 interval 秒归档超过 after_days 天无活动的会话；恢复的耗时也记在这里"""
+
+    def __init__(self, enabled: bool, after_days: float, interval: float, batch: int):
+        self.enabled = enabled
+        self.after_days = after_days
+        self.interval = interval
+        self.batch = max(1, batch)
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.errors = 0
+        self.archived_sessions = 0
+        self.archived_messages = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.last_pass_at: Optional[datetime] = None
+        self.last_pass_seconds = 0.0
+        self.restores = 0
+        self.restore_seconds = 0.0
+        self.restore_max_seconds = 0.0
+
+    def start(self) -> None:
+        if self._task is None and self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """取消后台任务；进行中的会话事务随之回滚，下一次启动时重新归档"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1  # 数据库暂不可写等：下个周期重试
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> dict:
+        t0 = time.perf_counter()
+        totals = await archive_inactive_sessions(datetime.utcnow() - timedelta(days=self.after_days), self.batch)
+        self.passes += 1
+        self.archived_sessions += totals["sessions"]
+        self.archived_messages += totals["messages"]
+        self.raw_bytes += totals["raw_bytes"]
+        self.stored_bytes += totals["stored_bytes"]
+        self.last_pass_at = datetime.utcnow()
+        self.last_pass_seconds = time.perf_counter() - t0
+        return totals
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "codec": _codec(),
+            "after_days": self.after_days,
+            "passes": self.passes,
+            "errors": self.errors,
+            "last_pass_at": self.last_pass_at,
+            "last_pass_seconds": round(self.last_pass_seconds, 3),
+            "archived_sessions": self.archived_sessions,
+            "archived_messages": self.archived_messages,
+            "bytes_saved": self.raw_bytes - self.stored_bytes,
+            "restores": self.restores,
+            "restore_avg_ms": round(self.restore_seconds / self.restores * 1000, 2) if self.restores else None,
+            "restore_max_ms": round(self.restore_max_seconds * 1000, 2),
+        }
+
+
+archiver = Archiver(
+    settings.ARCHIVE_ENABLED,
+    settings.ARCHIVE_AFTER_DAYS,
+    settings.ARCHIVE_INTERVAL_SECONDS,
+    settings.ARCHIVE_BATCH_SESSIONS,
+)
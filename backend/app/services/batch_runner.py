@@ -0,0 +1,155 @@
+"""批量任务执行器：进程内有界工作协程池，非流式调用上游，结果按批写入数据库"""
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.batch_service import Result, claim_items, write_results
+from app.services.context_cache import context_cache
+from app.services.llm_service import build_messages_for_api, complete_chat
+
+IDLE_POLL_SECONDS = 5.0  # 没有待执行条目时的轮询间隔（提交新任务会立即唤醒）
+
+
+class BatchRunner:
+    """
+    workers 个工作协程从数据库领取待执行条目（每次领取 2×workers 个并标记为 running），逐条以非流式调用上游；
+    上游调用以 background 身份排队，交互请求总是先获得名额。工作协程数即批量任务的上游并发上限。
+    结果在内存中缓冲，每 flush_size 条或每 flush_interval 秒在一个事务中批量写入。
+    启动时 running 的条目重置为待执行，进程重启后从最近一次写入的进度继续（未写入的结果会重新执行）。
+    """
+
+    def __init__(self, workers: int, flush_size: int, flush_interval: float, max_attempts: int):
+        self.workers = workers
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._claimed: Deque[dict] = deque()
+        self._results: List[Result] = []
+        self._claim_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_due: Optional[asyncio.Event] = None
+        self.busy = 0
+        self.executed = 0
+        self.errors = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._claim_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._flush_due = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """取消工作协程（执行中的上游调用随之取消，条目保持 running，下次启动时重置），写入已缓冲的结果"""
+        if not self._tasks:
+            return
+        for task in self._tasks + [self._flusher]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, self._flusher, return_exceptions=True)
+        self._tasks = []
+        self._flusher = None
+        self._claimed.clear()
+        await self.flush()
+
+    def notify(self) -> None:
+        """有新任务提交：唤醒空闲的工作协程"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _claim(self) -> Optional[dict]:
+        async with self._claim_lock:
+            if not self._claimed:
+                # 先清除唤醒标记再查询：查询之后提交的任务会重新置位，不会错过
+                self._wake.clear()
+                async with SessionLocal() as db:
+                    self._claimed.extend(await claim_items(db, self.workers * 2))
+            return self._claimed.popleft() if self._claimed else None
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                item = await self._claim()
+            except Exception:
+                item = None  # 数据库暂不可用：稍后重试领取
+            if item is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            messages = build_messages_for_api([{"role": "user", "content": item["prompt"]}], budget=0)
+            self.busy += 1
+            try:
+                result = await complete_chat(messages, item["thinking_mode"], client_key=f"batch:{item['job_id']}")
+                self._results.append((item, result, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self._results.append((item, None, str(e) or type(e).__name__))
+            finally:
+                self.busy -= 1
+            self.executed += 1
+            if len(self._results) >= self.flush_size:
+                self._flush_due.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_due.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_due.clear()
+            try:
+                await self.flush()
+            except Exception:
+                pass  # 数据库暂不可写：结果已放回缓冲，下个周期重试
+
+    async def flush(self) -> None:
+        """在一个事务中写入已缓冲的结果；失败时结果放回缓冲"""
+        if not self._results:
+            return
+        batch, self._results = self._results, []
+        try:
+            async with SessionLocal() as db:
+                sessions = await write_results(db, batch, self.max_attempts)
+                await db.commit()
+        except BaseException:
+            self._results[:0] = batch
+            raise
+        self.flushes += 1
+        for session_id in sessions:
+            context_cache.invalidate(session_id)
+        if any(item["attempts"] + 1 < self.max_attempts for item, _, error in batch if error is not None):
+            self.notify()  # 有条目重新待执行
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "busy": self.busy,
+            "claimed": len(self._claimed),
+            "buffered_results": len(self._results),
+            "executed": self.executed,
+            "errors": self.errors,
+            "flushes": self.flushes,
+        }
+
+
+batch_runner = BatchRunner(
+    settings.BATCH_WORKERS,
+    settings.BATCH_FLUSH_SIZE,
+    settings.BATCH_FLUSH_INTERVAL_SECONDS,
+    settings.BATCH_MAX_ATTEMPTS,
+)
@@ -0,0 +1,269 @@
+"""批量对话任务：创建、查询、取消，批量写入执行结果，启动时恢复中断的条目"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.models import BatchItem, BatchJob, Message, Session
+from app.models.batch import (
+    ITEM_CANCELLED,
+    ITEM_DONE,
+    ITEM_FAILED,
+    ITEM_PENDING,
+    ITEM_RUNNING,
+    JOB_CANCELLED,
+    JOB_COMPLETED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+)
+from app.models.message import MESSAGE_COMPLETE
+from app.models.usage import USAGE_FIELDS
+from app.services.token_service import count_tokens
+from app.services.usage_service import accumulate_usage
+
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+ITEM_STATUSES = (ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED, ITEM_CANCELLED)
+
+
+async def create_job(
+    db: DBSession, prompts: Sequence[str], name: str = "", thinking_mode: bool = False, priority: int = 0
+) -> BatchJob:
+    """创建任务与结果会话，全部提示一次批量插入为待执行条目"""
+    s = Session(title=(f"批量任务：{name}" if name else "批量任务")[:255])
+    db.add(s)
+    await db.flush()
+    job = BatchJob(
+        name=name, priority=priority, thinking_mode=thinking_mode, session_id=s.id, total=len(prompts),
+        status=JOB_QUEUED, completed=0, failed=0,
+    )
+    db.add(job)
+    await db.flush()
+    await db.execute(
+        insert(BatchItem),
+        [{"job_id": job.id, "position": i, "prompt": p, "status": ITEM_PENDING, "attempts": 0}
+         for i, p in enumerate(prompts)],
+    )
+    await db.commit()
+    return job
+
+
+async def get_job(db: DBSession, job_id: int) -> Optional[BatchJob]:
+    return await db.get(BatchJob, job_id)
+
+
+async def list_jobs(db: DBSession, status: Optional[str] = None, limit: int = 50) -> List[BatchJob]:
+    q = select(BatchJob).order_by(BatchJob.id.desc()).limit(limit)
+    if status is not None:
+        q = q.where(BatchJob.status == status)
+    return list(await db.scalars(q))
+
+
+async def job_progress(db: DBSession, job: BatchJob) -> dict:
+    """任务及其各状态条目数（走 (job_id, status) 索引）"""
+    rows = await db.execute(
+        select(BatchItem.status, func.count()).where(BatchItem.job_id == job.id).group_by(BatchItem.status)
+    )
+    counts = {status: 0 for status in ITEM_STATUSES}
+    counts.update({status: n for status, n in rows})
+    finished = counts[ITEM_DONE] + counts[ITEM_FAILED] + counts[ITEM_CANCELLED]
+    return {
+        "id": job.id,
+        "name": job.name,
+        "status": job.status,
+        "priority": job.priority,
+        "thinking_mode": job.thinking_mode,
+        "session_id": job.session_id,
+        "total": job.total,
+        "items": counts,
+        "progress": finished / job.total if job.total else 1.0,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def list_items(
+    db: DBSession, job_id: int, status: Optional[str] = None, offset: int = 0, limit: int = 100
+) -> List[BatchItem]:
+    q = select(BatchItem).where(BatchItem.job_id == job_id)
+    if status is not None:
+        q = q.where(BatchItem.status == status)
+    return list(await db.scalars(q.order_by(BatchItem.position).offset(offset).limit(limit)))
+
+
+async def cancel_job(db: DBSession, job_id: int) -> Optional[BatchJob]:
+    """取消未结束的任务：待执行的条目标记为 cancelled，已领取的条目执行完仍会写入结果"""
+    job = await db.get(BatchJob, job_id)
+    if job is None or job.status not in ACTIVE_JOB_STATUSES:
+        return job
+    await db.execute(
+        update(BatchItem)
+        .where(BatchItem.job_id == job_id, BatchItem.status == ITEM_PENDING)
+        .values(status=ITEM_CANCELLED, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    job.status = JOB_CANCELLED
+    job.finished_at = datetime.utcnow()
+    await db.commit()
+    return job
+
+
+async def recover_batch_items(db: DBSession) -> int:
+    """
+    启动时调用：上次进程退出时已领取但结果未写入的条目，未结束任务的重置为待执行，
+    已取消任务的标记为 cancelled（claim_items 不再领取这些任务的条目）。返回重置为待执行的条目数。
+    """
+    active = select(BatchJob.id).where(BatchJob.status.in_(ACTIVE_JOB_STATUSES))
+    result = await db.execute(
+        update(BatchItem)
+        .where(BatchItem.status == ITEM_RUNNING, BatchItem.job_id.in_(active))
+        .values(status=ITEM_PENDING)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(BatchItem)
+        .where(BatchItem.status == ITEM_RUNNING, BatchItem.job_id.not_in(active))
+        .values(status=ITEM_CANCELLED, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def claim_items(db: DBSession, limit: int) -> List[dict]:
+    """
+    领取至多 limit 个待执行条目并标记为 running（提交）：按任务优先级从高到低、同优先级先提交的任务优先，
+    任务内按提交顺序。逐个任务走 (job_id, status, position) 索引取条目，不对全部待执行条目排序。
+    """
+    jobs = (await db.execute(
+        select(BatchJob.id, BatchJob.thinking_mode)
+        .where(BatchJob.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(BatchJob.priority.desc(), BatchJob.id)
+    )).all()
+    claimed: List[dict] = []
+    for job_id, thinking_mode in jobs:
+        rows = (await db.execute(
+            select(BatchItem.id, BatchItem.prompt, BatchItem.attempts)
+            .where(BatchItem.job_id == job_id, BatchItem.status == ITEM_PENDING)
+            .order_by(BatchItem.position)
+            .limit(limit - len(claimed))
+        )).all()
+        claimed += [
+            {"id": r.id, "job_id": job_id, "prompt": r.prompt, "attempts": r.attempts, "thinking_mode": thinking_mode}
+            for r in rows
+        ]
+        if len(claimed) >= limit:
+            break
+    if claimed:
+        now = datetime.utcnow()
+        await db.execute(
+            update(BatchItem)
+            .where(BatchItem.id.in_([c["id"] for c in claimed]))
+            .values(status=ITEM_RUNNING)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(BatchJob)
+            .where(BatchJob.id.in_({c["job_id"] for c in claimed}), BatchJob.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, started_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return claimed
+
+
+# 执行结果：(领取的条目, 上游结果 {"content", "reasoning", "usage"} 或 None, 错误信息或 None)
+Result = Tuple[dict, Optional[dict], Optional[str]]
+
+
+async def write_results(db: DBSession, results: List[Result], max_attempts: int) -> Set[int]:
+    """
+    在当前事务中批量写入一批执行结果（不提交）：成功的提示与回复作为一问一答插入任务的会话
+    （INSERT .. RETURNING 取回复 id），条目按主键批量更新，任务进度与用量汇总各累加一次。
+    失败的条目未达 max_attempts 时重新待执行。返回写入了消息的会话 id。
+    """
+    now = datetime.utcnow()
+    job_ids = {item["job_id"] for item, _, _ in results}
+    # 只向仍存在的会话写消息
+    sessions: Dict[int, int] = dict((await db.execute(
+        select(BatchJob.id, Session.id)
+        .join(Session, Session.id == BatchJob.session_id)
+        .where(BatchJob.id.in_(job_ids))
+    )).all())
+
+    messages: List[dict] = []
+    written: List[int] = []  # 写入了消息的结果在 results 中的下标
+    for i, (item, result, error) in enumerate(results):
+        session_id = sessions.get(item["job_id"])
+        if error is not None or session_id is None:
+            continue
+        usage = result["usage"] or {}
+        base = {"session_id": session_id, "status": MESSAGE_COMPLETE, "created_at": now, "model": None,
+                **{f: None for f in USAGE_FIELDS}}
+        messages.append({**base, "role": "user", "content": item["prompt"], "reasoning_content": None,
+                         "token_count": count_tokens(item["prompt"])})
+        messages.append({**base, "role": "assistant", "content": result["content"],
+                         "reasoning_content": result["reasoning"] or None,
+                         "token_count": count_tokens(result["content"]),
+                         "model": usage.get("model"), **{f: usage.get(f) for f in USAGE_FIELDS}})
+        written.append(i)
+    message_ids: Dict[int, int] = {}
+    if messages:
+        ids = list((await db.execute(
+            insert(Message).returning(Message.id, sort_by_parameter_order=True), messages
+        )).scalars())
+        message_ids = {index: ids[2 * k + 1] for k, index in enumerate(written)}
+        await accumulate_usage(db, [m for m in messages if m["role"] == "assistant" and m["model"] is not None])
+
+    updates = []
+    progress: Dict[int, List[int]] = {job_id: [0, 0] for job_id in job_ids}  # job_id -> [成功, 失败]
+    for i, (item, result, error) in enumerate(results):
+        attempts = item["attempts"] + 1
+        if error is None:
+            status = ITEM_DONE
+            progress[item["job_id"]][0] += 1
+        elif attempts < max_attempts:
+            status = ITEM_PENDING
+        else:
+            status = ITEM_FAILED
+            progress[item["job_id"]][1] += 1
+        updates.append({
+            "id": item["id"],
+            "status": status,
+            "attempts": attempts,
+            "content": result["content"] if result else None,
+            "reasoning_content": (result["reasoning"] or None) if result else None,
+            "error": error,
+            "message_id": message_ids.get(i),
+            "finished_at": now if status != ITEM_PENDING else None,
+        })
+    await db.execute(update(BatchItem), updates)
+
+    for job_id, (done, failed) in progress.items():
+        if done or failed:
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id)
+                .values(completed=BatchJob.completed + done, failed=BatchJob.failed + failed)
+                .execution_options(synchronize_session=False)
+            )
+    await db.execute(
+        update(BatchJob)
+        .where(
+            BatchJob.id.in_(job_ids),
+            BatchJob.status == JOB_RUNNING,
+            BatchJob.completed + BatchJob.failed >= BatchJob.total,
+        )
+        .values(status=JOB_COMPLETED, finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    touched = set(sessions[results[i][0]["job_id"]] for i in written)
+    if touched:
+        await db.execute(
+            update(Session)
+            .where(Session.id.in_(touched))
+            .values(updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    return touched
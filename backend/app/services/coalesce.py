@@ -0,0 +1,93 @@
+"""SSE 帧合并：把相邻的同类型增量合并为一帧，降低逐 token 的 JSON 编码与发送开销"""
+import asyncio
+from typing import Any, AsyncIterator, AsyncGenerator, List, Optional
+
+# 可合并的增量类型；其他事件（done、session_title 等）原样透传并先冲刷缓冲
+DELTA_TYPES = ("reasoning", "content")
+
+_END: Any = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def _pump(chunks: AsyncIterator[dict], queue: "asyncio.Queue[Any]") -> None:
+    try:
+        async for chunk in chunks:
+            queue.put_nowait(chunk)
+    except Exception as e:
+        queue.put_nowait(_Failed(e))
+    else:
+        queue.put_nowait(_END)
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[dict], window: float, max_bytes: int
+) -> AsyncGenerator[dict, None]:
+    """
+    合并相邻的同类型增量：缓冲从第一段开始计时，满 window 秒、累计 max_bytes 字节、
+    类型切换或遇到非增量事件时输出一帧（字节数按字符数近似）。每种类型的首个增量立即输出，首 token 延迟不变。
+    上游由独立任务读入队列，消费端有缓冲时每个窗口只唤醒一次并批量取出，上游停顿也按时冲刷。
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    pump = asyncio.ensure_future(_pump(chunks, queue))
+    seen = set()
+    buf_type: Optional[str] = None
+    parts: List[str] = []
+    size = 0
+    deadline = 0.0
+
+    def flush() -> dict:
+        nonlocal buf_type, parts, size
+        frame = {"type": buf_type, "data": "".join(parts)}
+        buf_type, parts, size = None, [], 0
+        return frame
+
+    try:
+        while True:
+            if parts:
+                delay = deadline - loop.time()
+                if delay > 0 and queue.empty():
+                    await asyncio.sleep(delay)
+                if queue.empty():
+                    yield flush()
+                    continue
+                item = queue.get_nowait()
+            else:
+                item = await queue.get()
+
+            if item is _END:
+                break
+            if isinstance(item, _Failed):
+                if parts:
+                    yield flush()
+                raise item.error
+
+            ctype = item["type"]
+            if ctype not in DELTA_TYPES:
+                if parts:
+                    yield flush()
+                yield item
+                continue
+            if ctype not in seen:
+                seen.add(ctype)
+                if parts:
+                    yield flush()
+                yield item
+                continue
+            if parts and ctype != buf_type:
+                yield flush()
+            if not parts:
+                buf_type = ctype
+                deadline = loop.time() + window
+            parts.append(item["data"])
+            size += len(item["data"])
+            if size >= max_bytes or loop.time() >= deadline:
+                yield flush()
+        if parts:
+            yield flush()
+    finally:
+        pump.cancel()
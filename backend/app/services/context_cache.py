@@ -0,0 +1,98 @@
+"""会话上下文 LRU 缓存：按 session_id 缓存精简的 role/content 历史，避免每轮重新加载 ORM 对象"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+def _message_size(m: dict) -> int:
+    return len(m["content"].encode("utf-8")) + 64  # 64：dict 与字段的固定开销估算
+
+
+class ContextCache:
+    """
+    有界 LRU 缓存，同时按条目数与字节数限制。
+    add_message 增量追加、delete_session 失效；通过版本号避免"加载期间有写入"导致缓存陈旧。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[List[dict], int]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: int) -> Tuple[Optional[List[dict]], int]:
+        """返回 (历史副本或 None, 版本号)；未命中时调用方加载后以该版本号 put"""
+        with self._lock:
+            version = self._versions.get(session_id, 0)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return list(entry[0]), version
+
+    def put(self, session_id: int, messages: List[dict], version: int) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # 加载期间该会话有新写入，放弃回填，下次再从数据库加载
+            if self._versions.get(session_id, 0) != version or session_id in self._entries:
+                return
+            size = sum(_message_size(m) for m in messages)
+            if size > self.max_bytes:
+                return
+            self._entries[session_id] = (list(messages), size)
+            self._bytes += size
+            self._evict()
+
+    def append(self, session_id: int, message: dict) -> None:
+        with self._lock:
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            messages, size = entry
+            added = _message_size(message)
+            messages.append(message)
+            self._entries[session_id] = (messages, size + added)
+            self._bytes += added
+            self._entries.move_to_end(session_id)
+            self._evict()
+
+    def invalidate(self, session_id: int) -> None:
+        with self._lock:
+            self._versions.pop(session_id, None)
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+context_cache = ContextCache(settings.CONTEXT_CACHE_MAX_ENTRIES, settings.CONTEXT_CACHE_MAX_BYTES)
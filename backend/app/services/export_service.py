@@ -0,0 +1,267 @@
+"""
+会话数据的 NDJSON 导出/导入，内存占用与数据量无关。
+格式：首行 meta，之后每个会话一行 session，紧跟其全部消息（每条一行 message，按时间正序）。
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncGenerator, AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, insert, select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Message, Session
+from app.models.message import MESSAGE_ABORTED, MESSAGE_COMPLETE, MESSAGE_STREAMING
+from app.services.archive_service import load_archived_messages
+from app.services.serialization import dumps
+from app.services.usage_service import accumulate_usage
+
+FORMAT = "minichatgpt-export"
+FORMAT_VERSION = 1
+CHUNK_BYTES = 64 * 1024  # 响应体按块输出，避免每行一次发送
+MAX_LINE_BYTES = 64 * 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+SESSION_FIELDS = ("title", "created_at", "updated_at")
+MESSAGE_FIELDS = tuple(c.name for c in Message.__table__.columns if c.name not in ("id", "session_id"))
+ROLES = ("user", "assistant", "system")
+STATUSES = (None, MESSAGE_COMPLETE, MESSAGE_ABORTED)
+# 导入时按列类型校验消息字段：整数列只接受整数（不含 bool），字符串列只接受字符串
+_FIELD_TYPES = {
+    c.name: int if isinstance(c.type, Integer) else str
+    for c in Message.__table__.columns
+    if c.name in MESSAGE_FIELDS and isinstance(c.type, (Integer, String))
+}
+_TYPE_NAMES = {int: "整数", str: "字符串"}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def _line(obj: dict) -> bytes:
+    return dumps(obj) + b"\n"
+
+
+async def _rows(result) -> AsyncGenerator:
+    """逐行遍历流式结果；按 yield_per 分区取，避免每行一次 greenlet 切换"""
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+async def export_ndjson(compress: bool = False) -> AsyncGenerator[bytes, None]:
+    """
+    流式导出全部会话与消息：会话按 id、消息按 (session_id, created_at, id) 各用一个服务端游标分批读取
+    （yield_per），两路有序结果归并输出；二者在同一只读事务中，导出的是一致的快照。
+    已归档的会话从归档中解出消息（不恢复到 messages），内存占用以单个归档会话的大小为上限。
+    compress 时输出 gzip 流（边生成边压缩）。
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = bytearray(_line({"type": "meta", "format": FORMAT, "version": FORMAT_VERSION,
+                           "exported_at": datetime.utcnow()}))
+
+    def drain() -> bytes:
+        data = bytes(buf)
+        buf.clear()
+        return compressor.compress(data) if compressor else data
+
+    yield_per = settings.EXPORT_YIELD_PER
+    async with SessionLocal() as db:
+        sessions = await db.stream(
+            select(Session.id, *(getattr(Session, f) for f in SESSION_FIELDS), Session.archived_at)
+            .order_by(Session.id)
+            .execution_options(yield_per=yield_per)
+        )
+        result = await db.stream(
+            select(Message.session_id, *(getattr(Message, f) for f in MESSAGE_FIELDS))
+            .order_by(Message.session_id, Message.created_at, Message.id)
+            .execution_options(yield_per=yield_per)
+        )
+        messages = _rows(result)
+        pending = await anext(messages, None)
+        async for s in _rows(sessions):
+            buf += _line({"type": "session", "id": s.id, **{f: getattr(s, f) for f in SESSION_FIELDS}})
+            if s.archived_at is not None:
+                for m in await load_archived_messages(db, s.id):
+                    buf += _line({"type": "message", "session_id": s.id, **{f: m[f] for f in MESSAGE_FIELDS}})
+                    if len(buf) >= CHUNK_BYTES:
+                        data = drain()
+                        if data:
+                            yield data
+            # 会话 id 递增：小于当前会话 id 的消息属于已不存在的会话，跳过
+            while pending is not None and pending.session_id <= s.id:
+                if pending.session_id == s.id:
+                    buf += _line({"type": "message", **pending._mapping})
+                    if len(buf) >= CHUNK_BYTES:
+                        data = drain()
+                        if data:
+                            yield data
+                pending = await anext(messages, None)
+            if len(buf) >= CHUNK_BYTES:
+                data = drain()
+                if data:
+                    yield data
+        await result.close()
+
+    data = drain()
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncGenerator[Tuple[int, bytes], None]:
+    """把上传的字节流切分为行（自动识别 gzip），返回 (行号, 行)"""
+    decompressor = None
+    first = True
+    rest = b""
+    line_no = 0
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(31)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        rest += chunk
+        *lines, rest = rest.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(rest) > MAX_LINE_BYTES:
+            raise InvalidImport(f"第 {line_no + 1} 行超过 {MAX_LINE_BYTES} 字节")
+    if decompressor is not None:
+        rest += decompressor.flush()
+        if not decompressor.eof:
+            raise InvalidImport("gzip 数据不完整")
+    if rest:
+        yield line_no + 1, rest
+
+
+def _parse_time(value, line_no: int) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidImport(f"第 {line_no} 行：无效的时间 {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)  # 库中时间为 UTC naive
+    return parsed
+
+
+def _check_type(value, kind: type, field: str, line_no: int) -> None:
+    """None 或 kind 类型的值（bool 不算整数，整数须在 64 位范围内），否则抛 InvalidImport"""
+    if value is None:
+        return
+    if not isinstance(value, kind) or isinstance(value, bool) or (kind is int and not -2**63 <= value < 2**63):
+        raise InvalidImport(f"第 {line_no} 行：{field} 应为{_TYPE_NAMES[kind]}，而不是 {value!r:.80}")
+
+
+class _Importer:
+    """
+    按批缓冲会话与消息，每 IMPORT_BATCH_SIZE 行在一个事务中批量插入：会话用 INSERT .. RETURNING
+    取得新 id，再批量插入消息。消息必须紧跟其会话行；只记住当前会话，内存占用与文件大小无关。
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.sessions: List[dict] = []
+        self.messages: List[dict] = []
+        self.source_id = None  # 当前会话在导出文件中的 id
+        self.current: Optional[Tuple[str, int]] = None  # ("pending", 本批下标) 或 ("id", 已入库的新 id)
+        self.imported_sessions = 0
+        self.imported_messages = 0
+
+    async def add(self, line_no: int, obj: dict) -> None:
+        kind = obj.get("type") if isinstance(obj, dict) else None
+        if kind == "meta":
+            if obj.get("format") != FORMAT or obj.get("version", 0) > FORMAT_VERSION:
+                raise InvalidImport(f"第 {line_no} 行：不支持的导出格式")
+            return
+        if kind == "session":
+            _check_type(obj.get("id"), int, "id", line_no)
+            _check_type(obj.get("title"), str, "title", line_no)
+            self.sessions.append({
+                "title": (obj.get("title") or "新对话")[:255],
+                "created_at": _parse_time(obj.get("created_at"), line_no) or datetime.utcnow(),
+                "updated_at": _parse_time(obj.get("updated_at"), line_no) or datetime.utcnow(),
+            })
+            self.source_id = obj.get("id")
+            self.current = ("pending", len(self.sessions) - 1)
+        elif kind == "message":
+            _check_type(obj.get("id"), int, "id", line_no)
+            _check_type(obj.get("session_id"), int, "session_id", line_no)
+            if self.current is None or obj.get("session_id", self.source_id) != self.source_id:
+                raise InvalidImport(f"第 {line_no} 行：消息必须紧跟其所属会话")
+            self.messages.append(self._message(line_no, obj))
+        else:
+            raise InvalidImport(f"第 {line_no} 行：未知的记录类型 {kind!r}")
+        if len(self.sessions) + len(self.messages) >= self.batch_size:
+            await self.flush()
+
+    def _message(self, line_no: int, obj: dict) -> dict:
+        row = {f: obj.get(f) for f in MESSAGE_FIELDS}
+        for field, kind in _FIELD_TYPES.items():
+            _check_type(row[field], kind, field, line_no)
+        if row["role"] not in ROLES:
+            raise InvalidImport(f"第 {line_no} 行：无效的 role {row['role']!r}")
+        if row["status"] == MESSAGE_STREAMING:
+            row["status"] = MESSAGE_ABORTED  # 导出时仍在生成的回复，导入后不会再完成
+        elif row["status"] not in STATUSES:
+            raise InvalidImport(f"第 {line_no} 行：无效的 status {row['status']!r}")
+        row["content"] = row["content"] or ""
+        row["created_at"] = _parse_time(row["created_at"], line_no) or datetime.utcnow()
+        kind, ref = self.current
+        row["session_id"] = ref if kind == "id" else None
+        row["_session"] = ref if kind == "pending" else None
+        return row
+
+    async def flush(self) -> None:
+        if not self.sessions and not self.messages:
+            return
+        async with SessionLocal() as db:
+            ids: List[int] = []
+            if self.sessions:
+                result = await db.execute(
+                    insert(Session).returning(Session.id, sort_by_parameter_order=True), self.sessions
+                )
+                ids = list(result.scalars())
+            for m in self.messages:
+                index = m.pop("_session")
+                if index is not None:
+                    m["session_id"] = ids[index]
+            if self.messages:
+                await db.execute(insert(Message), self.messages)
+                await accumulate_usage(db, self.messages)
+            await db.commit()
+        if self.current is not None and self.current[0] == "pending":
+            self.current = ("id", ids[self.current[1]])
+        self.imported_sessions += len(self.sessions)
+        self.imported_messages += len(self.messages)
+        self.sessions.clear()
+        self.messages.clear()
+
+
+async def import_ndjson(chunks: AsyncIterator[bytes]) -> dict:
+    """
+    流式导入 export_ndjson 的输出（可为 gzip）。会话以新 id 插入，不覆盖已有数据。
+    出错时抛 InvalidImport，此前已提交的批次保留（异常的 imported 属性为已导入的数量）。
+    """
+    importer = _Importer(settings.IMPORT_BATCH_SIZE)
+    try:
+        async for line_no, line in _lines(chunks):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                raise InvalidImport(f"第 {line_no} 行：不是有效的 JSON")
+            await importer.add(line_no, obj)
+        await importer.flush()
+    except InvalidImport as e:
+        e.imported = {"sessions": importer.imported_sessions, "messages": importer.imported_messages}
+        raise
+    return {"sessions": importer.imported_sessions, "messages": importer.imported_messages}
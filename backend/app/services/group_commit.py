@@ -0,0 +1,152 @@
+"""组提交写入器：把并发流的写操作合并到同一个事务，减少 SQLite 每次提交的 fsync 次数"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.config import settings
+from app.database import SessionLocal
+
+# 写操作：接收数据库会话、只写入不提交的协程函数，提交由执行方负责
+WriteFn = Callable[[DBSession], Awaitable[Any]]
+_STOP: Any = object()
+
+
+class GroupCommitWriter:
+    """
+    后台任务每隔 interval_ms 收集一批写操作，用一个事务执行并提交。
+    submit() 在该批提交成功后返回写操作的结果；批量提交失败时逐条重试，单条失败只影响自身。
+    """
+
+    def __init__(self, interval_ms: float, max_batch: int):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "Optional[asyncio.Queue[Tuple[WriteFn, asyncio.Future]]]" = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.writes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务：先把队列中已提交的写操作处理完"""
+        if self._task is None or self._queue is None:
+            return
+        await self._queue.put(_STOP)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+
+    async def submit(self, fn: WriteFn) -> Any:
+        assert self._queue is not None, "GroupCommitWriter 未启动"
+        if not self.running:
+            # 后台任务已异常退出：不再排队（没有人处理），直接单独提交
+            return await _commit_one(fn)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, future))
+        return await future
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        batch: List[Tuple[WriteFn, asyncio.Future]] = []
+        try:
+            stopping = False
+            while not stopping:
+                first = await self._queue.get()
+                if first is _STOP:
+                    return
+                batch = [first]
+                # 等待一个时间窗口，让并发写入汇入同一批
+                await asyncio.sleep(self.interval)
+                while not self._queue.empty() and len(batch) < self.max_batch:
+                    item = self._queue.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                try:
+                    await self._flush(batch)
+                except Exception as e:
+                    # 整批未能执行（如取不到连接）：本批写操作收到异常，继续处理之后的批次
+                    _fail(batch, e)
+                batch = []
+        except BaseException as e:
+            # 后台任务意外退出：正在处理与仍在排队的写操作收到异常，不会一直等待
+            error = e if isinstance(e, Exception) else RuntimeError("组提交写入器已停止")
+            _fail(batch, error)
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    _fail([item], error)
+            raise
+
+    async def _flush(self, batch: List[Tuple[WriteFn, asyncio.Future]]) -> None:
+        results = await _commit_batch([fn for fn, _ in batch])
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": self.writes / self.batches if self.batches else 0.0,
+        }
+
+
+def _fail(batch: List[Tuple[WriteFn, asyncio.Future]], error: Exception) -> None:
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+async def _commit_batch(fns: List[WriteFn]) -> List[Tuple[bool, Any]]:
+    async with SessionLocal() as db:
+        try:
+            results = [(True, await fn(db)) for fn in fns]
+            await db.commit()
+            return results
+        except Exception:
+            await db.rollback()
+        # 整批失败：逐条单独提交，隔离出错的写操作
+        results = []
+        for fn in fns:
+            try:
+                value = await fn(db)
+                await db.commit()
+                results.append((True, value))
+            except Exception as e:
+                await db.rollback()
+                results.append((False, e))
+        return results
+
+
+group_commit_writer = GroupCommitWriter(settings.GROUP_COMMIT_INTERVAL_MS, settings.GROUP_COMMIT_MAX_BATCH)
+
+
+async def _commit_one(fn: WriteFn) -> Any:
+    async with SessionLocal() as db:
+        value = await fn(db)
+        await db.commit()
+        return value
+
+
+async def run_write(fn: WriteFn) -> Any:
+    """执行一个写操作：组提交开启时并入批次，否则用独立会话单独提交"""
+    if group_commit_writer.running:
+        return await group_commit_writer.submit(fn)
+    return await _commit_one(fn)
@@ -1,47 +1,420 @@
 """DeepSeek LLM 服务：流式对话，支持思考模式"""
-from typing import List, Dict, Generator
-from openai import OpenAI
+import asyncio
+import hashlib
+import json
+import random
+import time
+import unicodedata
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, List, Dict, AsyncGenerator, Optional
+import httpx
 
 from app.config import settings
+from app.services import metrics
+from app.services.admission import admission
+from app.services.token_service import count_tokens
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+CHAT_MODEL = "deepseek-chat"
+
+# 进程内共享的上游客户端，由启动预热创建、main.lifespan 关闭；openai 包导入较慢，在创建客户端时才导入
+_client: Optional["AsyncOpenAI"] = None
+_http: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncHTTPTransport] = None
+_pool_counters = {"requests": 0, "tcp_connects": 0, "tls_handshakes": 0}
 
-def get_client() -> OpenAI:
-    return OpenAI(
-        api_key=settings.DEEPSEEK_API_KEY,
-        base_url=settings.DEEPSEEK_BASE_URL,
-    )
 
+# httpcore trace 事件 -> (计数器, 建连阶段)
+_CONNECT_PHASES = {
+    "connection.connect_tcp": ("tcp_connects", "tcp"),
+    "connection.start_tls": ("tls_handshakes", "tls"),
+}
 
-def build_messages_for_api(session_messages: List[dict]) -> List[Dict]:
+
+def _make_trace():
     """
-    构建发送给 DeepSeek 的 messages。
-    多轮对话仅拼接 content，不拼接 reasoning_content（按官方规范）。
+    每个请求一个 httpcore trace 回调：统计新建 TCP 连接与 TLS 握手次数（观察连接复用率），
+    并把各阶段耗时记入 upstream_connect_seconds 直方图
     """
-    return [{"role": m["role"], "content": m["content"] or ""} for m in session_messages]
+    started: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: dict) -> None:
+        step, _, state = event_name.rpartition(".")
+        phase = _CONNECT_PHASES.get(step)
+        if phase is None:
+            return
+        if state == "started":
+            started[step] = time.perf_counter()
+        elif state == "complete":
+            _pool_counters[phase[0]] += 1
+            if step in started:
+                metrics.upstream_connect_seconds.observe(time.perf_counter() - started.pop(step), phase[1])
+
+    return trace
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _pool_counters["requests"] += 1
+    request.extensions["trace"] = _make_trace()
+
+
+def init_client() -> "AsyncOpenAI":
+    """创建共享客户端：连接池大小、keep-alive、超时与 HTTP/2 均来自配置"""
+    global _client, _http, _transport
+    if _client is None:
+        from openai import AsyncOpenAI
 
+        _transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+            http2=settings.UPSTREAM_HTTP2,  # 需安装 httpx[http2]
+        )
+        timeout = httpx.Timeout(settings.UPSTREAM_READ_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT)
+        _http = httpx.AsyncClient(transport=_transport, timeout=timeout, event_hooks={"request": [_on_request]})
+        _client = AsyncOpenAI(
+            # 未配置 Key 时仍允许应用启动，首次请求由上游返回 401 并提示用户
+            api_key=settings.DEEPSEEK_API_KEY or "not-configured",
+            base_url=settings.DEEPSEEK_BASE_URL,
+            timeout=timeout,
+            max_retries=0,  # 重试由 _stream_upstream 统一处理（退避 + Retry-After）
+            http_client=_http,
+        )
+    return _client
 
-def stream_chat(messages: List[dict], thinking_mode: bool) -> Generator:
+
+async def close_client() -> None:
+    global _client, _http, _transport
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _http = None
+    _transport = None
+
+
+async def warm_upstream(connections: int) -> int:
     """
-    流式调用 DeepSeek，yield SSE 格式 chunk: {"type": "reasoning"|"content"|"done", "data": "..."}
+    预先建立 connections 条上游连接（TCP/TLS 握手），首个对话请求不必再建连：并发请求 GET {base_url}/models，
+    收到任何 HTTP 响应即说明连接已建立并回到 keep-alive 池。返回成功的请求数，全部失败时抛出最后一个错误。
     """
+    init_client()
+    url = settings.DEEPSEEK_BASE_URL.rstrip("/") + "/models"
+    headers = {"Authorization": f"Bearer {settings.DEEPSEEK_API_KEY or 'not-configured'}"}
+    results = await asyncio.gather(
+        *(_http.get(url, headers=headers) for _ in range(connections)), return_exceptions=True
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors and len(errors) == len(results):
+        raise errors[-1]
+    return len(results) - len(errors)
+
+
+def get_client() -> "AsyncOpenAI":
+    """返回共享客户端；未经 lifespan 初始化时（如脚本中）惰性创建"""
+    return _client or init_client()
+
+
+def get_pool_stats() -> dict:
+    """上游连接池统计：配置、当前连接状态与累计请求/建连次数"""
+    connections = []
+    if _transport is not None:
+        pool = getattr(_transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for c in connections if c.is_idle())
+    return {
+        "initialized": _client is not None,
+        "http2": settings.UPSTREAM_HTTP2,
+        "max_connections": settings.UPSTREAM_MAX_CONNECTIONS,
+        "max_keepalive": settings.UPSTREAM_MAX_KEEPALIVE,
+        "keepalive_expiry": settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        "connections": len(connections),
+        "idle_connections": idle,
+        "active_connections": len(connections) - idle,
+        **_pool_counters,
+    }
+
+
+CONTEXT_MODE_SLIDING = "sliding"
+CONTEXT_MODE_PREFIX_STABLE = "prefix_stable"
+CONTEXT_MODES = (CONTEXT_MODE_SLIDING, CONTEXT_MODE_PREFIX_STABLE)
+
+
+def context_mode() -> str:
+    """配置的上下文组装模式，未知取值按 sliding 处理"""
+    mode = settings.CONTEXT_MODE.strip().lower()
+    return mode if mode in CONTEXT_MODES else CONTEXT_MODE_SLIDING
+
+
+def _tokens(m: dict) -> int:
+    n = m.get("token_count")
+    return n if n is not None else count_tokens(m["content"])
+
+
+def _sliding_start(session_messages: List[dict], budget: int) -> int:
+    """从最新消息向前保留到预算用尽；每轮起点都可能后移一条，前缀随之变化"""
+    used = 0
+    start = len(session_messages)
+    for i in range(len(session_messages) - 1, -1, -1):
+        used += _tokens(session_messages[i])
+        if used > budget and i < len(session_messages) - 1:
+            break
+        start = i
+    return start
+
+
+def _stable_start(session_messages: List[dict], budget: int, target: int) -> int:
+    """
+    前缀稳定的起点：按时间顺序模拟逐条追加，累计超出 budget 时把起点一次性前移到剩余不超过 target。
+    起点只取决于此前的历史、且只在溢出时跳变，两次压缩之间每轮发送的前缀逐字节相同。
+    """
+    start = 0
+    used = 0
+    sizes = []
+    for i, m in enumerate(session_messages):
+        sizes.append(_tokens(m))
+        used += sizes[-1]
+        if used > budget:
+            # 压缩后从一条 user 消息开始（当前消息总是保留）
+            while start < i and (used > target or session_messages[start]["role"] == "assistant"):
+                used -= sizes[start]
+                start += 1
+    return start
+
+
+def build_messages_for_api(
+    session_messages: List[dict], budget: Optional[int] = None, mode: Optional[str] = None
+) -> List[Dict]:
+    """按 token 预算与上下文组装模式构建发送给 DeepSeek 的 messages"""
+    if budget is None:
+        budget = settings.CONTEXT_TOKEN_BUDGET
+    mode = mode or context_mode()
+
+    start = 0
+    if budget > 0 and session_messages:
+        if mode == CONTEXT_MODE_PREFIX_STABLE:
+            start = _stable_start(session_messages, budget, int(budget * settings.CONTEXT_COMPACT_RATIO))
+        else:
+            start = _sliding_start(session_messages, budget)
+        # 不以 assistant 消息开头，保证上下文从完整的一轮对话开始
+        while start < len(session_messages) - 1 and session_messages[start]["role"] == "assistant":
+            start += 1
+
+    preamble = [{"role": "system", "content": settings.CONTEXT_SYSTEM_PROMPT}] if settings.CONTEXT_SYSTEM_PROMPT else []
+    return preamble + [{"role": m["role"], "content": m["content"] or ""} for m in session_messages[start:]]
+
+
+def context_fingerprint(messages: List[dict], thinking_mode: bool, model: str = CHAT_MODEL) -> str:
+    """对 build_messages_for_api 的结果做规范化（NFC、去首尾空白）后与思考模式、模型一起取 sha256"""
+    normalized = [[m["role"], unicodedata.normalize("NFC", m["content"]).strip()] for m in messages]
+    payload = json.dumps([model, bool(thinking_mode), normalized], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _retryable() -> tuple:
+    """首字节前可重试的上游错误：429、5xx、连接失败与超时（此时客户端已创建，openai 已导入）"""
+    import openai
+    return openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从 429/503 响应头读取建议等待秒数（retry-after-ms 或 retry-after，后者可为秒数或 HTTP 日期）"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _usage_dict(model: str, usage) -> dict:
+    """上游 usage 对象 -> 用量 dict；缓存命中/未命中与推理 token 为 DeepSeek 扩展字段，缺失时为 None"""
+    details = getattr(usage, "completion_tokens_details", None)
+    return {
+        "model": model,
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "reasoning_tokens": getattr(details, "reasoning_tokens", None),
+        "prompt_cache_hit_tokens": getattr(usage, "prompt_cache_hit_tokens", None),
+        "prompt_cache_miss_tokens": getattr(usage, "prompt_cache_miss_tokens", None),
+    }
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """第 attempt 次重试前的等待秒数：有 Retry-After 时遵从，否则为带完全抖动的指数退避；None 表示不再重试"""
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        if retry_after > settings.UPSTREAM_RETRY_AFTER_MAX:
+            return None
+        admission.retry_after_honoured += 1
+        return retry_after + random.uniform(0, settings.UPSTREAM_BACKOFF_BASE)
+    return random.uniform(0, min(settings.UPSTREAM_BACKOFF_MAX, settings.UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+
+async def _create_with_retry(**kwargs):
+    """调用 chat.completions.create；可重试错误（流式时为首字节之前）按退避策略重试"""
     client = get_client()
+    attempt = 0
+    while True:
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except _retryable() as e:
+            delay = _retry_delay(e, attempt) if attempt < settings.UPSTREAM_MAX_RETRIES else None
+            if delay is None:
+                raise
+            attempt += 1
+            admission.retries += 1
+            await asyncio.sleep(delay)
+
+
+async def complete_chat(messages: List[dict], thinking_mode: bool, client_key: str = "") -> dict:
+    """
+    非流式对话（批量任务使用），返回 {"content", "reasoning", "usage"}。
+    以 background 身份经准入控制排队：只有没有交互请求等待时才占用上游名额。
+    """
     extra = {"thinking": {"type": "enabled"}} if thinking_mode else None
+    async with admission.slot(client_key, background=True):
+        response = await _create_with_retry(model=CHAT_MODEL, messages=messages, stream=False, extra_body=extra)
+    message = response.choices[0].message if response.choices else None
+    return {
+        "content": getattr(message, "content", None) or "",
+        "reasoning": getattr(message, "reasoning_content", None) or "",
+        "usage": _usage_dict(response.model or CHAT_MODEL, response.usage) if response.usage else None,
+    }
 
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream=True,
-        extra_body=extra,
-    )
 
-    for chunk in response:
-        delta = chunk.choices[0].delta
-        rc = getattr(delta, "reasoning_content", None) or ""
-        c = getattr(delta, "content", None) or ""
+async def _stream_upstream(
+    messages: List[dict], thinking_mode: bool, client_key: str = ""
+) -> AsyncGenerator[dict, None]:
+    """
+    流式调用 DeepSeek，yield SSE 格式 chunk: {"type": "reasoning"|"content"|"done", "data": "..."}
+    开启 UPSTREAM_INCLUDE_USAGE 时，done 之前另有一个 {"type": "usage", "data": {...}}（仅供服务端记录）。
+    基于 AsyncOpenAI，等待上游 token 时不占用线程池线程。
+    调用前经准入控制取得名额（整个流期间占用）；建立流（首字节）之前的可重试错误按退避策略重试。
+    """
+    extra = {"thinking": {"type": "enabled"}} if thinking_mode else None
+    options = {"stream_options": {"include_usage": True}} if settings.UPSTREAM_INCLUDE_USAGE else {}
+
+    async with admission.slot(client_key):
+        response = await _create_with_retry(
+            model=CHAT_MODEL, messages=messages, stream=True, extra_body=extra, **options
+        )
+        async for chunk in response:
+            # include_usage 时最后一个 chunk 的 choices 为空，只带 usage
+            if chunk.choices:
+                delta = chunk.choices[0].delta
+                rc = getattr(delta, "reasoning_content", None) or ""
+                c = getattr(delta, "content", None) or ""
 
-        if rc:
-            yield {"type": "reasoning", "data": rc}
-        if c:
-            yield {"type": "content", "data": c}
+                if rc:
+                    yield {"type": "reasoning", "data": rc}
+                if c:
+                    yield {"type": "content", "data": c}
+            if getattr(chunk, "usage", None) is not None:
+                yield {"type": "usage", "data": _usage_dict(chunk.model or CHAT_MODEL, chunk.usage)}
 
     yield {"type": "done", "data": ""}
+
+
+class _Flight:
+    """一次被多个调用方共享的上游调用：chunk 依次追加到列表，各调用方按自己的下标读取"""
+
+    def __init__(self):
+        self.chunks: List[dict] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+_flights: Dict[str, _Flight] = {}
+_flight_counters = {"requests": 0, "upstream_calls": 0, "shared": 0}
+
+
+def _drop_flight(key: str, flight: _Flight) -> None:
+    if _flights.get(key) is flight:
+        del _flights[key]
+
+
+async def _run_flight(key: str, flight: _Flight, messages: List[dict], thinking_mode: bool, client_key: str) -> None:
+    try:
+        async for chunk in _stream_upstream(messages, thinking_mode, client_key):
+            flight.chunks.append(chunk)
+            flight.wake()
+    except Exception as e:
+        flight.error = e
+    finally:
+        flight.done = True
+        _drop_flight(key, flight)
+        flight.wake()
+
+
+async def stream_chat(
+    messages: List[dict], thinking_mode: bool, client_key: str = ""
+) -> AsyncGenerator[dict, None]:
+    """流式对话；开启单飞时相同上下文的并发请求共享同一个上游调用"""
+    _flight_counters["requests"] += 1
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        _flight_counters["upstream_calls"] += 1
+        async for chunk in _stream_upstream(messages, thinking_mode, client_key):
+            yield chunk
+        return
+
+    key = context_fingerprint(messages, thinking_mode)
+    flight = _flights.get(key)
+    leader = flight is None
+    if leader:
+        flight = _flights[key] = _Flight()
+        flight.task = asyncio.create_task(_run_flight(key, flight, messages, thinking_mode, client_key))
+        _flight_counters["upstream_calls"] += 1
+    else:
+        _flight_counters["shared"] += 1
+
+    flight.waiters += 1
+    i = 0
+    try:
+        while True:
+            changed = flight._changed
+            while i < len(flight.chunks):
+                chunk = flight.chunks[i]
+                i += 1
+                if leader or chunk["type"] != "usage":
+                    yield chunk
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await changed.wait()
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.done and flight.task is not None:
+            _drop_flight(key, flight)
+            flight.task.cancel()
+
+
+def get_single_flight_stats() -> dict:
+    requests = _flight_counters["requests"]
+    return {
+        "enabled": settings.SINGLE_FLIGHT_ENABLED,
+        "in_flight": len(_flights),
+        **_flight_counters,
+        "upstream_calls_per_request": _flight_counters["upstream_calls"] / requests if requests else 0.0,
+    }
@@ -0,0 +1,232 @@
+"""
+进程内指标：固定桶直方图与 Prometheus 文本格式输出，不依赖 prometheus_client。
+记录只是对列表中的计数器加一（二分查找桶），没有抓取时几乎无开销；格式化仅在 /api/metrics 被请求时进行。
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+PREFIX = "minichatgpt_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Histogram:
+    """累积直方图；labelnames 非空时按标签值分别统计"""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # 标签值 -> [各桶计数（最后一个为 +Inf）, 总和]
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """单调递增计数器；labelnames 非空时按标签值分别计数"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, n: float = 1, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0) + n
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        values = self._values or ({(): 0} if not self.labelnames else {})
+        for labels, v in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.histograms: List[Histogram] = []
+        self.counters: List[Counter] = []
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        h = Histogram(name, help, buckets, labelnames)
+        self.histograms.append(h)
+        return h
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        c = Counter(name, help, labelnames)
+        self.counters.append(c)
+        return c
+
+    def render(self, gauges: Sequence[Tuple[str, str, float]] = ()) -> str:
+        """输出所有直方图，以及调用方在抓取时采样的瞬时值 (name, help, value)"""
+        lines: List[str] = []
+        for h in self.histograms:
+            lines.extend(h.render())
+        for c in self.counters:
+            lines.extend(c.render())
+        for name, help, value in gauges:
+            name = PREFIX + name
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+db_query_seconds = registry.histogram("db_query_seconds", "Duration of a single SQL statement", LATENCY_BUCKETS)
+request_db_seconds = registry.histogram(
+    "request_db_seconds", "Total SQL time spent per HTTP request", LATENCY_BUCKETS, ("route",)
+)
+generation_db_seconds = registry.histogram(
+    "chat_generation_db_seconds",
+    "Total SQL time spent by one chat generation task (checkpoints, final reply, cache store)",
+    LATENCY_BUCKETS,
+)
+context_build_seconds = registry.histogram(
+    "chat_context_build_seconds", "Turn setup and context assembly before the upstream call", LATENCY_BUCKETS
+)
+upstream_connect_seconds = registry.histogram(
+    "upstream_connect_seconds", "New upstream connection setup time", LATENCY_BUCKETS, ("phase",)
+)
+upstream_queue_seconds = registry.histogram(
+    "upstream_queue_seconds", "Time spent waiting for an upstream admission slot", LATENCY_BUCKETS
+)
+# source：upstream 为上游生成，cache 为响应缓存重放（几乎为零，单独统计以免拉低上游的首 token 延迟）
+first_token_seconds = registry.histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from request start to the first token",
+    LATENCY_BUCKETS,
+    ("type", "source"),
+)
+tokens_per_second = registry.histogram(
+    "chat_tokens_per_second", "Streaming rate from first token to end of stream", RATE_BUCKETS
+)
+stream_seconds = registry.histogram(
+    "chat_stream_duration_seconds", "Total duration of a chat generation", LATENCY_BUCKETS, ("status",)
+)
+context_first_token_seconds = registry.histogram(
+    "chat_upstream_first_token_seconds",
+    "Time from request start to the first upstream token, by context assembly mode",
+    LATENCY_BUCKETS,
+    ("context_mode",),
+)
+prompt_cache_tokens = registry.counter(
+    "chat_prompt_cache_tokens_total",
+    "Prompt tokens reported by the upstream as context cache hits or misses",
+    ("context_mode", "result"),
+)
+db_write_statements = registry.counter("db_write_statements_total", "INSERT/UPDATE/DELETE statements executed")
+db_commits = registry.counter("db_commits_total", "Committed database transactions")
+archive_restore_seconds = registry.histogram(
+    "archive_restore_seconds", "Time to restore an archived session into the messages table", LATENCY_BUCKETS
+)
+archive_sessions = registry.counter("archive_sessions_total", "Sessions archived or restored", ("op",))
+archive_bytes = registry.counter(
+    "archive_bytes_total", "Message bytes moved to cold storage, before and after compression", ("kind",)
+)
+
+
+class _RequestDBTime:
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+# 当前请求的 SQL 累计时间。chat 生成任务比请求活得久，用 track_db_time() 改为独立累计，
+# 记入 chat_generation_db_seconds；组提交的批量写入在写入器任务中执行，不计入任何请求或生成
+_request_db: ContextVar[Optional[_RequestDBTime]] = ContextVar("request_db", default=None)
+
+
+def track_db_time() -> _RequestDBTime:
+    """在当前任务的上下文中开始独立累计 SQL 时间（不再计入创建它的请求），返回累加器"""
+    acc = _RequestDBTime()
+    _request_db.set(acc)
+    return acc
+
+
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE")
+
+
+def _on_commit(conn):
+    db_commits.inc()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    db_query_seconds.observe(elapsed)
+    if statement.lstrip()[:6].upper() in _WRITE_VERBS:
+        db_write_statements.inc(len(parameters) if executemany else 1)
+    acc = _request_db.get()
+    if acc is not None:
+        acc.seconds += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """在引擎上挂 SQL 计时钩子（异步引擎挂在其 sync_engine 上）"""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "commit", _on_commit)
+
+
+class RequestMetricsMiddleware:
+    """纯 ASGI 中间件：为每个 HTTP 请求累计 SQL 时间，按路由模板记入直方图（不包装响应体，不影响流式输出）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        acc = _RequestDBTime()
+        token = _request_db.set(acc)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_db.reset(token)
+            route = scope.get("route")
+            request_db_seconds.observe(acc.seconds, getattr(route, "path", "unmatched"))
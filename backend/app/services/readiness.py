@@ -0,0 +1,116 @@
+"""
+启动预热与就绪状态：服务开始监听后在后台导入 openai、创建上游客户端、打开数据库连接池中的连接、
+预先建立上游连接；完成后 /api/ready 才返回 200（/api/health 只表示进程存活）。
+"""
+import asyncio
+import importlib
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+from app.services.llm_service import init_client, warm_upstream
+
+RETRY_SECONDS = 5.0  # READY_REQUIRE_UPSTREAM 时上游预热失败的重试间隔
+
+
+async def warm_database(connections: int) -> int:
+    """同时签出 connections 个连接并各执行一次查询后归还：连接（含 SQLite PRAGMA）在首个请求之前建立"""
+    conns = []
+    try:
+        for _ in range(connections):
+            conn = await engine.connect()
+            conns.append(conn)
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in conns:
+            await conn.close()
+    return len(conns)
+
+
+class Readiness:
+    """
+    就绪状态：数据库预热成功后就绪；上游预热失败只记录错误（上游故障时仍可浏览历史会话），
+    READY_REQUIRE_UPSTREAM 开启时则要求上游预热成功，失败后每 RETRY_SECONDS 秒重试。
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+        self.ready_at: Optional[datetime] = None
+        self.migration: Optional[dict] = None
+        self.components = {
+            "database": {"ready": False, "connections": 0, "seconds": None, "error": None},
+            "upstream": {"ready": False, "connections": 0, "seconds": None, "error": None, "attempts": 0},
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def begin(self) -> None:
+        """lifespan 开始时调用，作为启动耗时的起点"""
+        self.started = time.perf_counter()
+
+    def start(self, migration: dict) -> None:
+        """lifespan 完成必要的初始化（迁移、回收中断的回复）后调用：记录启动耗时并在后台开始预热"""
+        self.migration = migration
+        self.startup_seconds = time.perf_counter() - self.started
+        self._task = asyncio.create_task(self._warm())
+
+    async def stop(self) -> None:
+        """关闭时先标记未就绪，负载均衡不再转发新请求"""
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _step(self, name: str, fn) -> bool:
+        component = self.components[name]
+        t0 = time.perf_counter()
+        try:
+            component["connections"] = await fn()
+            component["ready"], component["error"] = True, None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            component["error"] = str(e) or type(e).__name__
+        component["seconds"] = round(time.perf_counter() - t0, 4)
+        return component["ready"]
+
+    async def _warm(self) -> None:
+        # openai 导入约占进程导入时间的一半，在线程中进行，期间事件循环仍可响应 /api/health
+        await asyncio.to_thread(importlib.import_module, "openai")
+        init_client()
+        timeout = settings.STARTUP_WARMUP_TIMEOUT
+        # SQLite 内存库等不设连接池大小的引擎只有一个连接
+        pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+        while not await self._step("database", lambda: asyncio.wait_for(warm_database(pool_size), timeout)):
+            await asyncio.sleep(RETRY_SECONDS)
+        upstream = self.components["upstream"]
+        while settings.STARTUP_UPSTREAM_CONNECTIONS > 0:
+            upstream["attempts"] += 1
+            if await self._step(
+                "upstream", lambda: asyncio.wait_for(warm_upstream(settings.STARTUP_UPSTREAM_CONNECTIONS), timeout)
+            ) or not settings.READY_REQUIRE_UPSTREAM:
+                break
+            await asyncio.sleep(RETRY_SECONDS)
+        self.ready = True
+        self.ready_at = datetime.utcnow()
+        self.ready_seconds = time.perf_counter() - self.started
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "ready_at": self.ready_at,
+            "startup_seconds": round(self.startup_seconds, 4) if self.startup_seconds is not None else None,
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "migration": self.migration,
+            "components": self.components,
+        }
+
+
+readiness = Readiness()
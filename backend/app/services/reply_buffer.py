@@ -0,0 +1,45 @@
+"""流式回复缓冲：线性时间累积 reasoning/content，并按 token 数或时间间隔触发检查点"""
+import time
+from typing import List
+
+
+class ReplyBuffer:
+    """以分片列表累积增量（避免字符串 += 的二次复杂度），读取时再拼接"""
+
+    def __init__(self, every_tokens: int, every_seconds: float):
+        self.every_tokens = every_tokens
+        self.every_seconds = every_seconds
+        self._reasoning: List[str] = []
+        self._content: List[str] = []
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    def add(self, chunk: dict) -> None:
+        if chunk["type"] == "reasoning":
+            self._reasoning.append(chunk["data"])
+        elif chunk["type"] == "content":
+            self._content.append(chunk["data"])
+        else:
+            return
+        self._pending += 1  # 上游每个增量约为一个 token
+
+    @property
+    def reasoning(self) -> str:
+        return "".join(self._reasoning)
+
+    @property
+    def content(self) -> str:
+        return "".join(self._content)
+
+    @property
+    def empty(self) -> bool:
+        return not self._reasoning and not self._content
+
+    def checkpoint_due(self) -> bool:
+        if self._pending == 0:
+            return False
+        return self._pending >= self.every_tokens or time.monotonic() - self._last_checkpoint >= self.every_seconds
+
+    def mark_checkpoint(self) -> None:
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
@@ -0,0 +1,178 @@
+"""精确匹配回复缓存：相同上下文、思考模式与模型的请求直接重放已缓存的回复，不再调用上游"""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, NamedTuple, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.response_cache import ResponseCacheEntry
+from app.services.group_commit import run_write
+from app.services.token_service import count_tokens
+
+
+class CachedReply(NamedTuple):
+    reasoning: str
+    content: str
+    token_count: int
+    created: float  # time.time()，用于 TTL
+
+
+def _reply_size(reply: CachedReply) -> int:
+    return len(reply.reasoning.encode("utf-8")) + len(reply.content.encode("utf-8")) + 128
+
+
+class ResponseCache:
+    """
+    内存 LRU，按条目数、字节数与 TTL 限制；persist 开启时同时写入 response_cache 表，
+    内存未命中再查表（命中后回填内存）。内存部分只在事件循环中访问，无需加锁。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, persist: bool):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.persist = persist
+        self._entries: "OrderedDict[str, CachedReply]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.disk_errors = 0
+        self.saved_tokens = 0
+
+    def _expired(self, reply: CachedReply) -> bool:
+        return self.ttl > 0 and time.time() - reply.created > self.ttl
+
+    def get(self, key: str) -> Optional[CachedReply]:
+        reply = self._entries.get(key)
+        if reply is None:
+            return None
+        if self._expired(reply):
+            self._remove(key)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def put(self, key: str, reply: CachedReply) -> None:
+        size = _reply_size(reply)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = reply
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= _reply_size(old)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= _reply_size(old)
+
+    async def lookup(self, key: str) -> Optional[CachedReply]:
+        reply = self.get(key)
+        if reply is None and self.persist:
+            try:
+                reply = await _load(key, self.ttl)
+            except SQLAlchemyError:
+                self.disk_errors += 1
+            if reply is not None:
+                self.disk_hits += 1
+                self.put(key, reply)
+        if reply is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_tokens += reply.token_count
+        return reply
+
+    async def store(self, key: str, reasoning: str, content: str) -> None:
+        """缓存一条完整回复；落盘失败只计数，不影响已完成的对话"""
+        reply = CachedReply(reasoning, content, count_tokens(reasoning) + count_tokens(content), time.time())
+        self.put(key, reply)
+        if self.persist:
+            try:
+                await run_write(lambda db: _save(db, key, reply, self.ttl))
+            except SQLAlchemyError:
+                self.disk_errors += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "persist": self.persist,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "disk_errors": self.disk_errors,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+async def _load(key: str, ttl: float) -> Optional[CachedReply]:
+    async with SessionLocal() as db:
+        row = await db.get(ResponseCacheEntry, key)
+    if row is None:
+        return None
+    created = (row.created_at - datetime(1970, 1, 1)).total_seconds()
+    if ttl > 0 and time.time() - created > ttl:
+        return None
+    return CachedReply(row.reasoning or "", row.content, row.token_count or 0, created)
+
+
+async def _save(db: DBSession, key: str, reply: CachedReply, ttl: float) -> None:
+    """写入（或覆盖）一条缓存，并顺带清理已过期的行"""
+    now = datetime.utcnow()
+    if ttl > 0:
+        await db.execute(
+            delete(ResponseCacheEntry)
+            .where(ResponseCacheEntry.created_at < now - timedelta(seconds=ttl))
+            .execution_options(synchronize_session=False)
+        )
+    await db.merge(ResponseCacheEntry(
+        key=key,
+        reasoning=reply.reasoning,
+        content=reply.content,
+        token_count=reply.token_count,
+        created_at=now,
+    ))
+
+
+async def replay(reply: CachedReply, chunk_chars: int, interval: float) -> AsyncGenerator[dict, None]:
+    """
+    以与 stream_chat 相同的 chunk 格式重放缓存回复：按 chunk_chars 个字符切片，
+    每片之间等待 interval 秒（0 表示不等待，尽快输出）。
+    """
+    for ctype, text in (("reasoning", reply.reasoning), ("content", reply.content)):
+        step = chunk_chars if chunk_chars > 0 else max(len(text), 1)
+        for i in range(0, len(text), step):
+            yield {"type": ctype, "data": text[i:i + step]}
+            if interval > 0:
+                await asyncio.sleep(interval)
+    yield {"type": "done", "data": ""}
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES,
+    settings.RESPONSE_CACHE_MAX_BYTES,
+    settings.RESPONSE_CACHE_TTL_SECONDS,
+    settings.RESPONSE_CACHE_PERSIST,
+)
@@ -0,0 +1,280 @@
+"""
+全文搜索：SQLite FTS5 外部内容表 messages_fts（trigram 分词，适合无空格分词的中文），由触发器增量维护。
+trigram 只能匹配不少于 3 个字符的子串；更短的词（如两字中文词）对 FTS 命中结果再用 LIKE 过滤，
+查询只含短词、非 SQLite 或 FTS5/trigram 不可用（SQLite < 3.34）时整体退化为按时间倒序的 LIKE 扫描。
+"""
+import asyncio
+import html
+import re
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Message, Session
+from app.models.message import MESSAGE_STREAMING
+
+FTS_TABLE = "messages_fts"
+MIN_FTS_TERM_CHARS = 3
+MAX_TERMS = 8
+SNIPPET_TOKENS = 32  # trigram 下一个 token 约一个字符
+SNIPPET_CHARS = 48
+MERGE_PAGES = 500  # 整理索引时每个事务至多处理的页数
+
+# 高亮标记先用私用区字符，转义 HTML 后再替换为 <mark>，原文中的标签不会被当作 HTML
+_HL_START, _HL_END = "\ue000", "\ue001"
+
+_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+
+
+def _indexed(row: str) -> str:
+    """生成中的回复频繁检查点，不进入索引；结束（complete/aborted）时再一次性写入"""
+    return f"({row}.status IS NULL OR {row}.status != '{MESSAGE_STREAMING}')"
+
+
+_CREATE_FTS = f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    content, reasoning_content, content='messages', content_rowid='id', tokenize='trigram'
+)"""
+
+_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON messages WHEN {_indexed("new")} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, reasoning_content)
+        VALUES (new.id, new.content, new.reasoning_content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON messages WHEN {_indexed("old")} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, reasoning_content)
+        VALUES ('delete', old.id, old.content, old.reasoning_content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content, reasoning_content, status ON messages
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, reasoning_content)
+        SELECT 'delete', old.id, old.content, old.reasoning_content WHERE {_indexed("old")};
+        INSERT INTO {FTS_TABLE}(rowid, content, reasoning_content)
+        SELECT new.id, new.content, new.reasoning_content WHERE {_indexed("new")};
+    END""",
+)
+
+_fts_ready = False
+
+
+def ensure_search_index(conn) -> bool:
+    """
+    init_db 中以 run_sync 调用：首次创建 FTS 表时从 messages 回填，之后由触发器增量维护。
+    SEARCH_FTS_ENABLED 关闭时不创建（已有的索引与触发器保留并继续维护）。返回 FTS 是否可用。
+    """
+    global _fts_ready
+    _fts_ready = False
+    if conn.dialect.name != "sqlite" or not settings.SEARCH_FTS_ENABLED:
+        return False
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    if exists is None:
+        try:
+            with conn.begin_nested():
+                conn.execute(text(_CREATE_FTS))
+        except OperationalError:
+            return False
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, content, reasoning_content) "
+            f"SELECT id, content, reasoning_content FROM messages WHERE {_indexed('messages')}"
+        ))
+    for trigger in _TRIGGERS:
+        conn.execute(text(trigger))
+    _fts_ready = True
+    return True
+
+
+async def merge_search_index(pages: int = MERGE_PAGES) -> int:
+    """
+    大量删除（如归档）后整理索引：FTS5 的删除只写入墓碑，旧数据要到段合并时才释放，删除后索引反而变大。
+    用 'merge' 命令分多个事务把所有段合并为一个，每个事务至多处理 pages 页；total_changes 增量小于 2
+    表示已无可合并的内容。返回执行的事务数，索引不存在时为 0。
+    """
+    async with SessionLocal() as db:
+        if db.bind.dialect.name != "sqlite" or await db.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ) is None:
+            return 0
+    n = -pages  # 负数：合并全部段（而不只是达到 automerge 阈值的层级）；之后的正数继续这次合并
+    rounds = 0
+    while True:
+        async with SessionLocal() as db:
+            before = await db.scalar(text("SELECT total_changes()"))
+            await db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('merge', :n)"), {"n": n})
+            changed = await db.scalar(text("SELECT total_changes()")) - before
+            await db.commit()
+        rounds += 1
+        if changed < 2:
+            return rounds
+        n = pages
+        await asyncio.sleep(0)
+
+
+def _terms(query: str) -> List[str]:
+    """按空白切分为 AND 关系的词，去重，最多 MAX_TERMS 个"""
+    terms: List[str] = []
+    for t in query.split():
+        if t not in terms:
+            terms.append(t)
+    return terms[:MAX_TERMS]
+
+
+def _fts_match(terms: Sequence[str], include_reasoning: bool) -> str:
+    """每个词作为带引号的短语（FTS5 语法字符不生效）；不含思考过程时限定 content 列"""
+    expr = " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    return expr if include_reasoning else "{content} : (" + expr + ")"
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _like_filters(terms: Sequence[str], include_reasoning: bool) -> list:
+    filters = []
+    for t in terms:
+        pattern = _like_pattern(t)
+        cond = Message.content.like(pattern, escape="\\")
+        if include_reasoning:
+            cond = or_(cond, Message.reasoning_content.like(pattern, escape="\\"))
+        filters.append(cond)
+    return filters
+
+
+def _render(marked: str) -> str:
+    return html.escape(marked).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def _make_snippet(body: str, terms: Sequence[str]) -> str:
+    """LIKE 路径的片段：截取首个命中附近 SNIPPET_CHARS 个字符并标记所有命中词（不区分大小写）"""
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(body)
+    start = max(0, (first.start() if first else 0) - SNIPPET_CHARS // 3)
+    window = body[start:start + SNIPPET_CHARS]
+    marked = pattern.sub(lambda m: _HL_START + m.group(0) + _HL_END, window)
+    return ("…" if start > 0 else "") + marked + ("…" if start + SNIPPET_CHARS < len(body) else "")
+
+
+async def _fts_hits(
+    db: DBSession, match: str, short_terms: Sequence[str], include_reasoning: bool, max_hits: int
+) -> List[Tuple[int, int]]:
+    """
+    取最新的 max_hits 条 FTS 命中（按 rowid 倒序，FTS5 可直接按此顺序遍历并提前停止），
+    再按 bm25 相关度排序（rank 越小越相关）。极常见的词不必为全部命中计算 bm25。返回 [(message_id, session_id)]
+    """
+    candidates = (
+        select(Message.id, Message.session_id, _fts.c.rank)
+        .select_from(_fts.join(Message, Message.id == _fts.c.rowid))
+        .where(text(f"{FTS_TABLE} MATCH :match"), *_like_filters(short_terms, include_reasoning))
+        .order_by(_fts.c.rowid.desc())
+        .limit(max_hits)
+        .subquery()
+    )
+    stmt = select(candidates.c.id, candidates.c.session_id).order_by(candidates.c.rank)
+    return [tuple(r) for r in await db.execute(stmt, {"match": match})]
+
+
+async def _like_hits(
+    db: DBSession, terms: Sequence[str], include_reasoning: bool, max_hits: int
+) -> List[Tuple[int, int]]:
+    """无法使用 FTS 时按消息 id 倒序（新消息在前）扫描，取满 max_hits 条即停"""
+    stmt = (
+        select(Message.id, Message.session_id)
+        .where(or_(Message.status.is_(None), Message.status != MESSAGE_STREAMING))
+        .where(and_(*_like_filters(terms, include_reasoning)))
+        .order_by(Message.id.desc())
+        .limit(max_hits)
+    )
+    return [tuple(r) for r in await db.execute(stmt)]
+
+
+async def _fts_snippets(db: DBSession, match: str, ids: Sequence[int]) -> Dict[int, str]:
+    stmt = text(
+        f"SELECT rowid, snippet({FTS_TABLE}, -1, :start, :end, '…', {SNIPPET_TOKENS}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :match AND rowid IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    rows = await db.execute(stmt, {"match": match, "ids": list(ids), "start": _HL_START, "end": _HL_END})
+    return {rowid: snippet for rowid, snippet in rows}
+
+
+async def search(
+    db: DBSession,
+    query: str,
+    include_reasoning: bool = False,
+    limit: int = 20,
+    offset: int = 0,
+    per_session: int = 3,
+) -> dict:
+    """
+    搜索消息并按会话分组：会话按其最佳命中排序，按会话分页（offset/limit），每个会话最多返回 per_session 条命中。
+    只考虑最新的 SEARCH_MAX_HITS 条命中，超出时 truncated 为 True。
+    snippet 为已转义的 HTML，命中处以 <mark> 包裹。
+    """
+    terms = _terms(query)
+    long_terms = [t for t in terms if len(t) >= MIN_FTS_TERM_CHARS]
+    short_terms = [t for t in terms if len(t) < MIN_FTS_TERM_CHARS]
+    max_hits = settings.SEARCH_MAX_HITS
+
+    match = _fts_match(long_terms, include_reasoning) if _fts_ready and long_terms else None
+    if match is not None:
+        hits = await _fts_hits(db, match, short_terms, include_reasoning, max_hits)
+    elif terms:
+        hits = await _like_hits(db, terms, include_reasoning, max_hits)
+    else:
+        hits = []
+
+    # 命中已按相关度（或时间）排序：会话首次出现的位置即其最佳命中
+    grouped: Dict[int, List[int]] = {}
+    for message_id, session_id in hits:
+        grouped.setdefault(session_id, []).append(message_id)
+    session_ids = list(grouped)
+    page = session_ids[offset:offset + limit]
+    picked = [mid for sid in page for mid in grouped[sid][:per_session]]
+
+    sessions = {}
+    messages = {}
+    snippets: Dict[int, str] = {}
+    if page:
+        rows = await db.execute(select(Session.id, Session.title, Session.updated_at).where(Session.id.in_(page)))
+        sessions = {r.id: r for r in rows}
+        rows = await db.execute(
+            select(Message.id, Message.role, Message.created_at, Message.content, Message.reasoning_content)
+            .where(Message.id.in_(picked))
+        )
+        messages = {r.id: r for r in rows}
+        if match is not None:
+            snippets = await _fts_snippets(db, match, picked)
+
+    results = []
+    for sid in page:
+        s = sessions.get(sid)
+        hit_list = []
+        for mid in grouped[sid][:per_session]:
+            m = messages.get(mid)
+            if m is None:
+                continue
+            if mid in snippets:
+                snippet = snippets[mid]
+            else:
+                in_content = any(t.lower() in (m.content or "").lower() for t in terms)
+                body = m.content if in_content or not include_reasoning else m.reasoning_content
+                snippet = _make_snippet(body or "", terms)
+            hit_list.append({"message_id": mid, "role": m.role, "created_at": m.created_at, "snippet": _render(snippet)})
+        results.append({
+            "session_id": sid,
+            "title": s.title if s else None,
+            "updated_at": s.updated_at if s else None,
+            "hits": len(grouped[sid]),
+            "messages": hit_list,
+        })
+
+    return {
+        "query": query,
+        "total_sessions": len(session_ids),
+        "truncated": len(hits) >= max_hits,
+        "next_offset": offset + limit if offset + limit < len(session_ids) else None,
+        "results": results,
+    }
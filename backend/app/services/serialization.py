@@ -0,0 +1,47 @@
+"""
+列表接口的快速序列化：查询只取需要的列（Core 行元组，不构造 ORM 对象），按预先确定的字段名直接编码为 JSON 字节，
+跳过逐行的 Pydantic 校验与 jsonable_encoder。输出与 response_model 的 JSON 一致（datetime 为 ISO 8601）。
+"""
+import json
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # 可选依赖：未安装时使用标准库 json
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def json_default(value):
+    """标准库 json 的 default：datetime 输出 ISO 8601（与 orjson、Pydantic 一致）"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} 无法序列化为 JSON")
+
+
+def dumps(obj) -> bytes:
+    """与 JSONResponse 相同的紧凑 UTF-8 JSON；有 orjson 时用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+class RowSerializer:
+    """
+    按字段名把查询行编码为 JSON 数组。行的前 len(fields) 列依次对应 fields，
+    之后的列（如分页游标额外查询的列）不输出。
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        fields = self.fields
+        return dumps([dict(zip(fields, row)) for row in rows])
+
+    def response(self, rows: Iterable[Sequence], headers: Optional[dict] = None) -> Response:
+        return Response(self.encode(rows), media_type=JSON_MEDIA_TYPE, headers=headers)
@@ -1,65 +1,396 @@
 """会话与消息业务逻辑"""
-from typing import List, Optional
-from sqlalchemy.orm import Session as DBSession
+import asyncio
+import base64
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
 
-from app.models import Session, Message
+from app.config import settings
+from app.database import SessionLocal, foreign_keys_enforced
+from app.models import BatchJob, Session, Message, SessionArchive, SessionUsage
+from app.models.message import MESSAGE_ABORTED, MESSAGE_STREAMING
+from app.services.archive_service import restore_if_archived
+from app.services.context_cache import context_cache
+from app.services.token_service import count_tokens
+from app.services.usage_service import record_usage
 
 
-def get_sessions(db: DBSession) -> List[Session]:
-    return db.query(Session).order_by(Session.updated_at.desc()).all()
+class InvalidCursor(ValueError):
+    pass
 
 
-def create_session(db: DBSession, title: str = "新对话") -> Session:
+async def get_sessions(db: DBSession, fields: Optional[Sequence[str]] = None) -> list:
+    """全部会话，按 updated_at 倒序。fields 指定时只查询这些列，返回行元组而非 ORM 对象。"""
+    columns = [getattr(Session, f) for f in fields] if fields else [Session]
+    result = await db.execute(select(*columns).order_by(Session.updated_at.desc(), Session.id.desc()))
+    return list(result.all() if fields else result.scalars())
+
+
+def encode_session_cursor(updated_at: datetime, session_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{session_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, session_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split("|")
+        return datetime.fromisoformat(updated_at), int(session_id)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+async def get_sessions_page(
+    db: DBSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Tuple[list, Optional[str]]:
+    """
+    按 (updated_at, id) 倒序的游标分页。fields 指定时只查询这些列，返回行元组而非 ORM 对象。
+    返回 (本页会话, 下一页游标或 None)。
+    """
+    columns = [getattr(Session, f) for f in fields] if fields else [Session]
+    # 生成游标需要 updated_at 与 id，投影时额外查询、不返回
+    extra = [c for c in (Session.updated_at, Session.id) if fields and c.key not in fields]
+    q = select(*columns, *extra)
+    if cursor is not None:
+        q = q.where(tuple_(Session.updated_at, Session.id) < decode_session_cursor(cursor))
+    result = await db.execute(q.order_by(Session.updated_at.desc(), Session.id.desc()).limit(limit + 1))
+    rows = list(result.all() if fields else result.scalars())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_session_cursor(rows[-1].updated_at, rows[-1].id)
+    return rows, next_cursor
+
+
+async def create_session(db: DBSession, title: str = "新对话") -> Session:
     s = Session(title=title)
     db.add(s)
-    db.commit()
-    db.refresh(s)
+    await db.commit()
     return s
 
 
-def get_session(db: DBSession, session_id: int) -> Optional[Session]:
-    return db.query(Session).filter(Session.id == session_id).first()
+async def get_session(db: DBSession, session_id: int) -> Optional[Session]:
+    return await db.get(Session, session_id)
 
 
-def delete_session(db: DBSession, session_id: int) -> bool:
-    s = get_session(db, session_id)
-    if not s:
-        return False
-    db.delete(s)
-    db.commit()
-    return True
+async def _delete_sessions(db: DBSession, session_ids: Sequence[int]) -> int:
+    """
+    在当前事务中按 id 集合删除会话（不提交），不加载 ORM 对象：消息、会话用量与归档由数据库 ON DELETE CASCADE 删除，
+    批量任务的 session_id 置空（按日汇总保留）；数据库未执行外键约束时改为显式的集合删除。返回删除的会话数。
+    """
+    if not foreign_keys_enforced(db.bind.dialect.name):
+        for stmt in (
+            delete(Message).where(Message.session_id.in_(session_ids)),
+            delete(SessionUsage).where(SessionUsage.session_id.in_(session_ids)),
+            delete(SessionArchive).where(SessionArchive.session_id.in_(session_ids)),
+            update(BatchJob).where(BatchJob.session_id.in_(session_ids)).values(session_id=None),
+        ):
+            await db.execute(stmt.execution_options(synchronize_session=False))
+    result = await db.execute(
+        delete(Session).where(Session.id.in_(session_ids)).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def delete_session(db: DBSession, session_id: int) -> bool:
+    deleted = await _delete_sessions(db, [session_id])
+    await db.commit()
+    context_cache.invalidate(session_id)
+    return deleted > 0
 
 
-def update_session(db: DBSession, session_id: int, title: str) -> Optional[Session]:
-    s = get_session(db, session_id)
+async def _delete_messages_chunked(session_ids: Sequence[int], rows: int) -> int:
+    """分块删除这些会话的消息，每个事务至多 rows 行，事务之间让出事件循环；返回删除的行数"""
+    total = 0
+    while True:
+        async with SessionLocal() as db:
+            # 先取 id 再删除（MySQL 不支持 IN 子查询中的 LIMIT）
+            ids = list(await db.scalars(select(Message.id).where(Message.session_id.in_(session_ids)).limit(rows)))
+            if ids:
+                await db.execute(
+                    delete(Message).where(Message.id.in_(ids)).execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        total += len(ids)
+        if len(ids) < rows:
+            return total
+        await asyncio.sleep(0)
+
+
+async def delete_sessions(
+    session_ids: Optional[Sequence[int]] = None, updated_before: Optional[datetime] = None
+) -> dict:
+    """
+    批量删除会话：按 id 列表和/或最后活动时间早于 updated_before 选择（同时给出时取交集）。
+    每批 DELETE_BATCH_SESSIONS 个会话：先分块删除消息（每个事务至多 DELETE_BATCH_ROWS 行），再删除会话本身，
+    单个事务持有写锁的时间有上限，其他会话的写入不必等待整个删除完成。不使用调用方的数据库会话。
+    """
+    batch = max(1, settings.DELETE_BATCH_SESSIONS)
+    pending = sorted(set(session_ids)) if session_ids is not None else None
+    last_id = 0
+    deleted = {"sessions": 0, "messages": 0}
+    while True:
+        q = select(Session.id).order_by(Session.id).limit(batch)
+        if updated_before is not None:
+            q = q.where(Session.updated_at < updated_before)
+        if pending is not None:
+            if not pending:
+                break
+            q = q.where(Session.id.in_(pending[:batch]))
+            pending = pending[batch:]
+        else:
+            q = q.where(Session.id > last_id)
+        async with SessionLocal() as db:
+            ids = list(await db.scalars(q))
+        if not ids:
+            if pending is None:
+                break
+            continue
+        last_id = ids[-1]
+        deleted["messages"] += await _delete_messages_chunked(ids, max(1, settings.DELETE_BATCH_ROWS))
+        async with SessionLocal() as db:
+            deleted["sessions"] += await _delete_sessions(db, ids)
+            await db.commit()
+        for session_id in ids:
+            context_cache.invalidate(session_id)
+        await asyncio.sleep(0)
+    return deleted
+
+
+async def update_session(db: DBSession, session_id: int, title: str) -> Optional[Session]:
+    s = await get_session(db, session_id)
     if not s:
         return None
     s.title = title
-    db.commit()
-    db.refresh(s)
+    await db.commit()
+    await db.refresh(s)
     return s
 
 
-def get_messages(db: DBSession, session_id: int) -> List[Message]:
-    return db.query(Message).filter(Message.session_id == session_id).order_by(Message.created_at.asc()).all()
+async def get_messages(db: DBSession, session_id: int, fields: Optional[Sequence[str]] = None) -> list:
+    """
+    会话的全部消息，按时间正序；会话已归档时先恢复到 messages 表。
+    fields 指定时只查询这些列，返回行元组而非 ORM 对象。
+    """
+    await restore_if_archived(db, session_id)
+    columns = [getattr(Message, f) for f in fields] if fields else [Message]
+    result = await db.execute(
+        select(*columns)
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+    )
+    return list(result.all() if fields else result.scalars())
+
+
+async def get_messages_page(
+    db: DBSession,
+    session_id: int,
+    limit: int,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Tuple[list, bool]:
+    """
+    基于 (created_at, id) 的游标分页，游标为消息 id。
+    默认与 before 方向从最新消息往前取；after 方向往后取。
+    返回 (按时间正序的一页消息, 是否还有更多)。会话已归档时先恢复。fields 指定时返回行元组。
+    """
+    await restore_if_archived(db, session_id)
+    columns = [getattr(Message, f) for f in fields] if fields else [Message]
+    q = select(*columns).where(Message.session_id == session_id)
+    cursor_id = before if before is not None else after
+    if cursor_id is not None:
+        cursor = (await db.execute(
+            select(Message.created_at, Message.id).where(Message.id == cursor_id, Message.session_id == session_id)
+        )).first()
+        if cursor is None:
+            raise InvalidCursor(cursor_id)
+        key = tuple_(Message.created_at, Message.id)
+        q = q.where(key > tuple(cursor) if after is not None else key < tuple(cursor))
+
+    if after is not None:
+        q = q.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        q = q.order_by(Message.created_at.desc(), Message.id.desc())
+    result = await db.execute(q.limit(limit + 1))
+    rows = list(result.all() if fields else result.scalars())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return rows, has_more
 
 
 def messages_to_api_format(messages: List[Message]) -> List[dict]:
-    """仅 role + content，不包含 reasoning_content（用于多轮上下文）"""
-    return [{"role": m.role, "content": m.content or ""} for m in messages]
+    """仅 role + content（附带缓存的 token_count），不包含 reasoning_content（用于多轮上下文）"""
+    return [
+        {
+            "role": m.role,
+            "content": m.content or "",
+            "token_count": m.token_count if m.token_count is not None else count_tokens(m.content),
+        }
+        for m in messages
+    ]
+
+
+async def get_context(db: DBSession, session_id: int) -> List[dict]:
+    """会话的精简上下文（role/content/token_count），优先读 LRU 缓存，未命中再查库并回填"""
+    cached, version = context_cache.get(session_id)
+    if cached is not None:
+        return cached
+    history = messages_to_api_format([m for m in await get_messages(db, session_id) if _in_context(m)])
+    context_cache.put(session_id, history, version)
+    return history
 
 
-def add_message(db: DBSession, session_id: int, role: str, content: str, reasoning_content: Optional[str] = None) -> Message:
-    m = Message(session_id=session_id, role=role, content=content, reasoning_content=reasoning_content)
+async def stage_message(
+    db: DBSession, session_id: int, role: str, content: str, reasoning_content: Optional[str] = None
+) -> Message:
+    """在当前事务中写入消息并更新会话活动时间，不提交；提交后需调用 cache_message"""
+    m = Message(
+        session_id=session_id,
+        role=role,
+        content=content,
+        reasoning_content=reasoning_content,
+        token_count=count_tokens(content),
+    )
     db.add(m)
-    db.commit()
-    db.refresh(m)
+    # 新消息即会话活动：在同一事务内顺带更新 updated_at，保证侧边栏排序正确
+    await _touch_session(db, session_id)
     return m
 
 
-def update_session_title_from_message(db: DBSession, session_id: int, first_user_content: str) -> None:
+async def _touch_session(db: DBSession, session_id: int) -> None:
+    await db.execute(
+        update(Session)
+        .where(Session.id == session_id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cache_message(m: Message) -> None:
+    """事务提交后把消息追加到上下文缓存"""
+    context_cache.append(m.session_id, {"role": m.role, "content": m.content or "", "token_count": m.token_count})
+
+
+def _in_context(m: Message) -> bool:
+    """生成中的回复不进入上下文；中断的回复保留其已生成的部分"""
+    if m.status == MESSAGE_STREAMING:
+        return False
+    return not (m.status == MESSAGE_ABORTED and not m.content)
+
+
+async def add_message(
+    db: DBSession, session_id: int, role: str, content: str, reasoning_content: Optional[str] = None
+) -> Message:
+    m = await stage_message(db, session_id, role, content, reasoning_content)
+    await db.commit()
+    cache_message(m)
+    return m
+
+
+def title_from_message(first_user_content: str) -> str:
     """用首条用户消息前 30 字作为会话标题"""
     title = (first_user_content[:30] + "…") if len(first_user_content) > 30 else first_user_content
     if not title.strip():
         title = "新对话"
-    update_session(db, session_id, title)
+    return title
+
+
+async def update_session_title_from_message(db: DBSession, session_id: int, first_user_content: str) -> None:
+    await update_session(db, session_id, title_from_message(first_user_content))
+
+
+class Turn(NamedTuple):
+    session_id: int
+    history: List[dict]  # 含本条提问的上下文
+    new_title: Optional[str]  # 首条消息生成的标题
+    reply_id: int  # assistant 回复占位消息的 id
+
+
+async def start_turn(db: DBSession, session_id: Optional[int], text: str) -> Optional[Turn]:
+    """
+    一轮对话的准备工作在单个事务内完成：按需创建会话、读取上下文、首条消息设标题、
+    写入用户消息与状态为 streaming 的 assistant 占位消息。会话不存在时返回 None。
+    """
+    if session_id is None:
+        s = Session(title=title_from_message(text))
+        db.add(s)
+        await db.flush()
+        history: List[dict] = []
+    else:
+        s = await get_session(db, session_id)
+        if not s:
+            return None
+        history = await get_context(db, s.id)
+
+    new_title = None
+    if not history:
+        new_title = title_from_message(text)
+        s.title = new_title
+
+    m = await stage_message(db, s.id, "user", text)
+    reply = Message(session_id=s.id, role="assistant", content="", token_count=0, status=MESSAGE_STREAMING)
+    db.add(reply)
+    await db.commit()
+    cache_message(m)
+    history.append({"role": "user", "content": text, "token_count": m.token_count})
+    return Turn(s.id, history, new_title, reply.id)
+
+
+async def checkpoint_reply(db: DBSession, message_id: int, content: str, reasoning_content: Optional[str]) -> None:
+    """把生成中的回复内容写回占位消息（不提交）；回复已结束时不再覆盖"""
+    await db.execute(
+        update(Message)
+        .where(Message.id == message_id, Message.status == MESSAGE_STREAMING)
+        .values(content=content, reasoning_content=reasoning_content or None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def finish_reply(
+    db: DBSession,
+    message_id: int,
+    content: str,
+    reasoning_content: Optional[str],
+    status: str,
+    usage: Optional[dict] = None,
+) -> Optional[Message]:
+    """
+    写入回复的最终内容与状态（不提交）；提交后需对返回值调用 cache_message。
+    中断且尚未生成任何内容时删除占位消息，返回 None。usage 为上游返回的用量，同时累加到汇总表。
+    """
+    m = await db.get(Message, message_id)
+    if m is None:
+        return None
+    if status == MESSAGE_ABORTED and not content and not reasoning_content:
+        await db.delete(m)
+        return None
+    m.content = content
+    m.reasoning_content = reasoning_content or None
+    m.token_count = count_tokens(content)
+    m.status = status
+    if usage:
+        await record_usage(db, m, usage)
+    await _touch_session(db, m.session_id)
+    return m
+
+
+async def abort_interrupted_replies(db: DBSession) -> int:
+    """
+    启动时调用：上次进程退出时仍处于 streaming 的回复标记为 aborted，保留已检查点的内容。
+    多 worker 部署时其他 worker 的进行中回复也会被标记，其完成时会再写回 complete。
+    """
+    result = await db.execute(
+        update(Message)
+        .where(Message.status == MESSAGE_STREAMING)
+        .values(status=MESSAGE_ABORTED)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,153 @@
+"""流注册表：每次生成独立于 HTTP 连接运行，带有界重放缓冲，支持断线续传与多订阅者"""
+import asyncio
+import uuid
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+Event = Tuple[int, dict]
+
+
+class Generation:
+    """
+    一次 assistant 回复的生成过程。生产者调用 publish() 发布帧（事件 id 从 1 递增），
+    订阅者通过 subscribe() 从任意 Last-Event-ID 之后继续读取；所有订阅者共享同一个上游调用。
+    """
+
+    def __init__(self, generation_id: str, session_id: int, reply_id: int, buffer_size: int):
+        self.id = generation_id
+        self.session_id = session_id
+        self.reply_id = reply_id
+        self.finished = False
+        self.cancelling = False  # 已请求取消，不再重复 task.cancel()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._events: Deque[Event] = deque(maxlen=buffer_size)
+        self._last_id = 0
+        # 已发布的增量文本与非增量帧（generation/session_title/done），用于缓冲溢出后的快照
+        self._reasoning: List[str] = []
+        self._content: List[str] = []
+        self._markers: List[Event] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    def publish(self, frame: dict) -> None:
+        self._last_id += 1
+        event = (self._last_id, frame)
+        self._events.append(event)
+        if frame["type"] == "reasoning":
+            self._reasoning.append(frame["data"])
+        elif frame["type"] == "content":
+            self._content.append(frame["data"])
+        else:
+            self._markers.append(event)
+        self._wake()
+
+    def finish(self) -> None:
+        self.finished = True
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _snapshot(self, after: int) -> List[Event]:
+        """
+        所需帧已被挤出重放缓冲：续传的订阅者先收到 reset，然后是截至当前的完整文本快照与
+        非增量帧；最后一帧携带当前事件 id，之后从缓冲正常续传。
+        """
+        frames: List[dict] = []
+        if after > 0:
+            frames.append({"type": "reset", "data": ""})
+        frames.extend(f for _, f in self._markers if f["type"] == "generation")
+        if self._reasoning:
+            frames.append({"type": "reasoning", "data": "".join(self._reasoning)})
+        if self._content:
+            frames.append({"type": "content", "data": "".join(self._content)})
+        frames.extend(f for _, f in self._markers if f["type"] != "generation")
+        # 快照中间帧不携带 id（0），仅最后一帧携带当前 id 供 Last-Event-ID 续传
+        return [(0, f) for f in frames[:-1]] + [(self._last_id, frames[-1])]
+
+    async def subscribe(self, after: int = 0) -> AsyncGenerator[Event, None]:
+        """从事件 id after 之后开始读取，直到生成结束；事件 id 为 0 表示该帧不可用于续传"""
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                while after < self._last_id:
+                    first_id = self._events[0][0]
+                    if after < first_id - 1:
+                        # 首次订阅或读得太慢，所需帧已被挤出缓冲
+                        for item in self._snapshot(after):
+                            yield item
+                        after = self._last_id
+                        break
+                    event = self._events[after - first_id + 1]
+                    yield event
+                    after = event[0]
+                if self.finished and after >= self._last_id:
+                    return
+                if after >= self._last_id:
+                    await changed.wait()
+        finally:
+            self.subscribers -= 1
+
+
+class StreamRegistry:
+    """进程内的生成注册表；生成结束后保留一段时间供迟到的重连重放"""
+
+    def __init__(self, buffer_size: int, retention_seconds: float):
+        self.buffer_size = buffer_size
+        self.retention_seconds = retention_seconds
+        self._generations: Dict[str, Generation] = {}
+
+    def create(self, session_id: int, reply_id: int) -> Generation:
+        gen = Generation(uuid.uuid4().hex, session_id, reply_id, self.buffer_size)
+        self._generations[gen.id] = gen
+        gen.publish({"type": "generation", "data": gen.id})
+        return gen
+
+    def get(self, generation_id: str) -> Optional[Generation]:
+        return self._generations.get(generation_id)
+
+    async def cancel(self, gen: Generation) -> bool:
+        """取消进行中的生成（停止上游调用、释放并发名额），回复记为 aborted；已结束时返回 False"""
+        if gen.finished or gen.task is None or gen.task.done():
+            return False
+        first = not gen.cancelling
+        if first:
+            gen.cancelling = True
+            gen.task.cancel()
+        # wait 不会在调用方被取消时连带取消生成任务
+        await asyncio.wait({gen.task})
+        return first
+
+    def finish(self, gen: Generation) -> None:
+        gen.finish()
+        asyncio.get_running_loop().call_later(self.retention_seconds, self._generations.pop, gen.id, None)
+
+    async def shutdown(self) -> None:
+        """关闭时取消仍在运行的生成，由其自身的清理逻辑把回复标记为 aborted"""
+        gens = [g for g in self._generations.values() if g.task is not None and not g.task.done()]
+        for gen in gens:
+            if not gen.cancelling:
+                gen.cancelling = True
+                gen.task.cancel()
+        await asyncio.gather(*(g.task for g in gens), return_exceptions=True)
+
+    def stats(self) -> dict:
+        gens = list(self._generations.values())
+        return {
+            "generations": len(gens),
+            "running": sum(1 for g in gens if not g.finished),
+            "subscribers": sum(g.subscribers for g in gens),
+            "buffer_size": self.buffer_size,
+            "retention_seconds": self.retention_seconds,
+        }
+
+
+stream_registry = StreamRegistry(settings.STREAM_REPLAY_BUFFER, settings.STREAM_RETENTION_SECONDS)
@@ -0,0 +1,28 @@
+"""Token 计数：按 DeepSeek 官方换算规则估算，用于上下文预算"""
+from typing import Optional
+
+# DeepSeek 文档给出的经验换算：1 个中文字符 ≈ 0.6 token，1 个英文字符 ≈ 0.3 token
+_CJK_RATIO = 0.6
+_OTHER_RATIO = 0.3
+# 每条消息的角色与格式开销
+MESSAGE_OVERHEAD = 4
+
+
+def _is_cjk(ch: str) -> bool:
+    cp = ord(ch)
+    return (
+        0x4E00 <= cp <= 0x9FFF
+        or 0x3400 <= cp <= 0x4DBF
+        or 0x3000 <= cp <= 0x303F
+        or 0xFF00 <= cp <= 0xFFEF
+        or 0x3040 <= cp <= 0x30FF
+        or 0xAC00 <= cp <= 0xD7AF
+    )
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """估算单条消息占用的 token 数（含消息开销）"""
+    if not text:
+        return MESSAGE_OVERHEAD
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return int(cjk * _CJK_RATIO + (len(text) - cjk) * _OTHER_RATIO) + 1 + MESSAGE_OVERHEAD
@@ -0,0 +1,129 @@
+"""用量统计：回复完成时写入消息用量并累加汇总表；聚合查询只读汇总表"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+
+from app.models import DailyUsage, Message, Session, SessionUsage
+from app.models.usage import USAGE_FIELDS
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的方言
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+ROLLUP_COLUMNS = ("replies",) + USAGE_FIELDS + ("total_tokens",)
+
+
+def _increments(usage: dict) -> dict:
+    values = {f: usage.get(f) or 0 for f in USAGE_FIELDS}
+    values["replies"] = 1
+    values["total_tokens"] = values["prompt_tokens"] + values["completion_tokens"]
+    return values
+
+
+async def _add_to_rollup(db: DBSession, table, keys: dict, inc: dict) -> None:
+    """汇总行不存在则插入，存在则原子累加；不支持 upsert 的方言先 UPDATE，未命中再 INSERT"""
+    now = datetime.utcnow()
+    insert = _UPSERT_INSERTS.get(db.bind.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(**keys, **inc, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={**{c: getattr(table, c) + stmt.excluded[c] for c in inc}, "updated_at": now},
+        )
+        await db.execute(stmt)
+        return
+    conditions = [getattr(table, k) == v for k, v in keys.items()]
+    result = await db.execute(
+        update(table)
+        .where(*conditions)
+        .values(**{c: getattr(table, c) + v for c, v in inc.items()}, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(table(**keys, **inc, updated_at=now))
+
+
+async def record_usage(db: DBSession, m: Message, usage: dict) -> None:
+    """在当前事务中写入回复的用量并累加会话与按日汇总（不提交）"""
+    m.model = usage.get("model")
+    m.context_mode = usage.get("context_mode")
+    m.first_token_ms = usage.get("first_token_ms")
+    for f in USAGE_FIELDS:
+        setattr(m, f, usage.get(f))
+    inc = _increments(usage)
+    day = (m.created_at or datetime.utcnow()).date()
+    await _add_to_rollup(db, SessionUsage, {"session_id": m.session_id}, inc)
+    await _add_to_rollup(db, DailyUsage, {"day": day, "model": m.model or "unknown"}, inc)
+
+
+async def accumulate_usage(db: DBSession, rows: Iterable[dict]) -> None:
+    """批量写入的消息（如导入）：按会话与 (日期, 模型) 先在内存中合并，每个汇总行只累加一次（不提交）"""
+    per_session: Dict[int, dict] = {}
+    per_day: Dict[Tuple, dict] = {}
+    for r in rows:
+        if r.get("prompt_tokens") is None and r.get("completion_tokens") is None:
+            continue
+        inc = _increments(r)
+        day_key = ((r.get("created_at") or datetime.utcnow()).date(), r.get("model") or "unknown")
+        for totals in (per_session.setdefault(r["session_id"], {}), per_day.setdefault(day_key, {})):
+            for c, v in inc.items():
+                totals[c] = totals.get(c, 0) + v
+    for session_id, inc in per_session.items():
+        await _add_to_rollup(db, SessionUsage, {"session_id": session_id}, inc)
+    for (day, model), inc in per_day.items():
+        await _add_to_rollup(db, DailyUsage, {"day": day, "model": model}, inc)
+
+
+def _totals(row) -> dict:
+    return {c: getattr(row, c) or 0 for c in ROLLUP_COLUMNS}
+
+
+async def get_session_usage(db: DBSession, session_id: int) -> Optional[dict]:
+    """单个会话的用量；会话不存在返回 None，尚无用量时各项为 0"""
+    row = (await db.execute(
+        select(Session.id, Session.title, SessionUsage)
+        .outerjoin(SessionUsage, SessionUsage.session_id == Session.id)
+        .where(Session.id == session_id)
+    )).first()
+    if row is None:
+        return None
+    usage = row.SessionUsage
+    totals = _totals(usage) if usage is not None else {c: 0 for c in ROLLUP_COLUMNS}
+    return {"session_id": row.id, "title": row.title, **totals}
+
+
+async def top_sessions(db: DBSession, limit: int) -> List[dict]:
+    """按总 token 倒序的会话用量（走 ix_session_usage_total 索引）"""
+    rows = await db.execute(
+        select(SessionUsage, Session.title)
+        .join(Session, Session.id == SessionUsage.session_id)
+        .order_by(SessionUsage.total_tokens.desc(), SessionUsage.session_id.desc())
+        .limit(limit)
+    )
+    return [{"session_id": u.session_id, "title": title, **_totals(u)} for u, title in rows]
+
+
+def _summed():
+    return [func.sum(getattr(DailyUsage, c)).label(c) for c in ROLLUP_COLUMNS]
+
+
+async def daily_usage(db: DBSession, days: int, model: Optional[str] = None) -> List[dict]:
+    """最近 days 天（UTC）每日用量，新日期在前；model 为空时合计所有模型"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    stmt = select(DailyUsage.day, *_summed()).where(DailyUsage.day >= since)
+    if model:
+        stmt = stmt.where(DailyUsage.model == model)
+    rows = await db.execute(stmt.group_by(DailyUsage.day).order_by(DailyUsage.day.desc()))
+    return [{"day": r.day, **_totals(r)} for r in rows]
+
+
+async def model_usage(db: DBSession) -> List[dict]:
+    """按模型合计的用量"""
+    rows = await db.execute(
+        select(DailyUsage.model, *_summed())
+        .group_by(DailyUsage.model)
+        .order_by(func.sum(DailyUsage.total_tokens).desc())
+    )
+    return [{"model": r.model, **_totals(r)} for r in rows]
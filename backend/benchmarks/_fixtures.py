@@ -0,0 +1,94 @@
+"""
+基准共用的夹具：临时数据库与批量造数。
+app.database 在导入时按 DATABASE_URL 创建引擎，temp_database() 须在导入 app 之前调用，因此本模块只在函数内导入 app。
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional
+
+INSERT_BATCH = 20000  # 每次 executemany 的行数
+
+
+def temp_database(mmap: bool = True) -> str:
+    """
+    DATABASE_URL 指向新建临时目录中的 bench.db，返回数据库文件路径。
+    mmap=False 时关闭 SQLite mmap：mmap 读到的数据库页会计入 RSS，测内存时需关闭。
+    """
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    if not mmap:
+        os.environ.setdefault("SQLITE_MMAP_SIZE", "0")
+    return path
+
+
+def default_message(i: int) -> dict:
+    """会话内第 i 条消息：user / assistant 交替"""
+    return {
+        "role": "user" if i % 2 == 0 else "assistant",
+        "content": f"message {i} " * 8,
+        "token_count": 30,
+        "status": "complete",
+    }
+
+
+async def seed_sessions(count: int, when: Optional[datetime] = None) -> List[int]:
+    """插入 count 个会话（创建与最后活动时间均为 when，默认当前时间），返回按插入顺序的 id"""
+    from sqlalchemy import insert
+
+    from app.database import engine
+    from app.models import Session
+
+    when = when or datetime.utcnow()
+    async with engine.begin() as conn:
+        return list((await conn.execute(
+            insert(Session).returning(Session.id, sort_by_parameter_order=True),
+            [{"title": f"bench {i}", "created_at": when, "updated_at": when} for i in range(count)],
+        )).scalars())
+
+
+async def insert_messages(rows: Iterable[dict]) -> int:
+    """在一个事务中按 INSERT_BATCH 行一批写入消息（各行的键须相同），返回行数"""
+    from sqlalchemy import insert
+
+    from app.database import engine
+    from app.models import Message
+
+    total = 0
+    batch = []
+    async with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH:
+                await conn.execute(insert(Message), batch)
+                total += len(batch)
+                batch.clear()
+        if batch:
+            await conn.execute(insert(Message), batch)
+            total += len(batch)
+    return total
+
+
+async def seed(
+    sessions: int,
+    messages_per_session: int,
+    message: Callable[[int], dict] = default_message,
+    when: Optional[datetime] = None,
+    interleave: bool = False,
+) -> List[int]:
+    """
+    插入 sessions 个会话，每个 messages_per_session 条消息（message(i) 给出会话内第 i 条的列），返回会话 id。
+    消息的 created_at 从 when 起每条递增一秒；interleave 时消息在会话间轮流写入（同一会话的行不相邻，接近真实负载）。
+    """
+    when = when or datetime.utcnow()
+    ids = await seed_sessions(sessions, when)
+    if interleave:
+        order = ((ids[k % sessions], k // sessions) for k in range(sessions * messages_per_session))
+    else:
+        order = ((session_id, i) for session_id in ids for i in range(messages_per_session))
+    await insert_messages(
+        {"session_id": session_id, "created_at": when + timedelta(seconds=n), **message(i)}
+        for n, (session_id, i) in enumerate(order)
+    )
+    return ids
@@ -0,0 +1,113 @@
+"""
+冷存储基准：生成 --sessions 个长期无活动的会话（每个 --per-session 条消息，assistant 带思考内容），
+执行一轮归档，输出压缩前后字节数、归档耗时、数据库文件（VACUUM 后）大小的变化，
+再写入一个新会话的消息（回归检查：新消息不得占用归档消息的 id），
+逐个读取 --restore 个归档会话，统计 get_messages 透明恢复的延迟，并校验恢复后的消息 id 不变。
+运行：python -m benchmarks.bench_archive --sessions 500（需在 backend 目录）；ARCHIVE_COMPRESSION=zstd 对比 zstd
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._fixtures import seed, temp_database
+
+DB_PATH = temp_database(mmap=False)
+
+from sqlalchemy import select, text  # noqa: E402
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.models import Message  # noqa: E402
+from app.services.archive_service import archive_totals, archiver  # noqa: E402
+from app.services.session_service import get_messages  # noqa: E402
+
+# 混合中英文词表随机成文：比重复的固定句子更接近真实对话的压缩率
+WORDS = (
+    "的 是 在 我们 可以 这个 问题 因为 所以 如果 需要 使用 数据 函数 返回 请求 模型 上下文 缓存 性能 "
+    "首先 然后 最后 例如 注意 其中 方法 结果 参数 配置 the a of to and in is for that with return value "
+    "async await select from where import class def self None True False list dict error timeout"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def message_maker(rng: random.Random):
+    """带思考内容的 assistant 消息（会话内第 i 条）"""
+    def make(i: int) -> dict:
+        return {"role": "user" if i % 2 == 0 else "assistant", "content": sentence(rng, 30 if i % 2 == 0 else 150),
+                "reasoning_content": sentence(rng, 400) if i % 2 else None, "token_count": 100, "status": "complete"}
+    return make
+
+
+async def db_size() -> int:
+    """VACUUM 后的文件大小：删除的行只进入空闲页列表，不收缩文件；WAL 模式下 VACUUM 写入 WAL，检查点后才落到主文件"""
+    async with engine.connect() as conn:
+        await (await conn.get_raw_connection()).driver_connection.execute("VACUUM")
+        await conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    return os.path.getsize(DB_PATH)
+
+
+async def main(args):
+    await init_db()
+    old = datetime.utcnow() - timedelta(days=90)
+    ids = await seed(args.sessions, args.per_session, message_maker(random.Random(0)), old)
+    size_before = await db_size()
+    async with SessionLocal() as db:
+        original = {}
+        for session_id, message_id in await db.execute(
+            select(Message.session_id, Message.id).where(Message.session_id.in_(ids[:args.restore]))
+        ):
+            original.setdefault(session_id, []).append(message_id)
+
+    archiver.after_days = 30
+    t0 = time.perf_counter()
+    totals = await archiver.run_once()
+    elapsed = time.perf_counter() - t0
+    size_after = await db_size()
+    async with SessionLocal() as db:
+        stored = await archive_totals(db)
+    print(f"codec={archiver.stats()['codec']}  archived {totals['sessions']} sessions / {totals['messages']} messages "
+          f"in {elapsed:.2f}s ({totals['messages'] / elapsed:,.0f} msg/s)")
+    raw, compressed = stored["raw_bytes"], stored["stored_bytes"]
+    print(f"message bytes {raw / 2**20:8.1f} MiB -> {compressed / 2**20:6.1f} MiB "
+          f"(x{raw / max(1, compressed):.1f}), saved {stored['bytes_saved'] / 2**20:.1f} MiB")
+    print(f"db file (after VACUUM) {size_before / 2**20:8.1f} MiB -> {size_after / 2**20:6.1f} MiB")
+
+    # 全部消息已归档：新消息的 id 须继续递增，而不是复用归档消息的 id
+    await seed(1, args.per_session)
+
+    latencies = []
+    for session_id in ids[:args.restore]:
+        t0 = time.perf_counter()
+        async with SessionLocal() as db:
+            messages = await get_messages(db, session_id)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        assert [m.id for m in messages] == original[session_id], f"session {session_id}: message ids changed"
+    latencies.sort()
+    print(f"restore on get_messages ({args.per_session} messages)  p50={statistics.median(latencies):6.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)]:6.1f}ms max={latencies[-1]:6.1f}ms")
+
+    latencies = []
+    for session_id in ids[:args.restore]:
+        t0 = time.perf_counter()
+        async with SessionLocal() as db:
+            await get_messages(db, session_id)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    print(f"get_messages (hot, for comparison)         p50={statistics.median(latencies):6.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)]:6.1f}ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500, help="长期无活动的会话数")
+    parser.add_argument("--per-session", type=int, default=40, help="每个会话的消息数")
+    parser.add_argument("--restore", type=int, default=100, help="读取（恢复）的归档会话数")
+    asyncio.run(main(parser.parse_args()))
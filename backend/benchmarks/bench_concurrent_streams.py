@@ -0,0 +1,123 @@
+"""
+并发流基准：验证大量 /api/chat 流打开时，非 chat 接口的 p99 延迟保持平稳。
+上游用本地假流替代（固定 token 间隔），无需 API Key 与网络。
+运行：python -m benchmarks.bench_concurrent_streams --streams 1000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks._fixtures import temp_database
+
+temp_database()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routers import chat  # noqa: E402
+
+
+def make_fake_stream(duration: float, interval: float):
+    """按固定间隔持续输出 token，持续 duration 秒，保证采样期间所有流都处于打开状态"""
+    async def fake_stream_chat(messages, thinking_mode, client_key=""):
+        deadline = time.monotonic() + duration
+        i = 0
+        while time.monotonic() < deadline:
+            yield {"type": "content", "data": f"t{i} "}
+            i += 1
+            await asyncio.sleep(interval)
+        yield {"type": "done", "data": ""}
+
+    return fake_stream_chat
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+async def probe_latency(client: httpx.AsyncClient, n: int):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await client.get("/api/sessions")
+        r.raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.01)
+    return samples
+
+
+async def open_stream(client: httpx.AsyncClient, started: asyncio.Event, counter: list, total: int):
+    async with client.stream("POST", "/api/chat", json={"message": "hi"}) as r:
+        counter[0] += 1
+        if counter[0] == total:
+            started.set()
+        async for _ in r.aiter_bytes():
+            pass
+
+
+def report(name, samples):
+    print(
+        f"{name:<20} n={len(samples):<5} p50={statistics.median(samples):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms max={max(samples):7.2f}ms"
+    )
+
+
+def serve(args):
+    """子进程：以假上游运行应用，与压测客户端分属不同进程，避免共享事件循环"""
+    chat.stream_chat = make_fake_stream(args.duration, args.interval)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+async def wait_ready(base: str):
+    async with httpx.AsyncClient(base_url=base) as client:
+        for _ in range(200):
+            try:
+                await client.get("/api/health")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+async def main(args):
+    base = f"http://127.0.0.1:{args.port}"
+    await wait_ready(base)
+    limits = httpx.Limits(max_connections=args.streams + 10, max_keepalive_connections=args.streams + 10)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=None) as client:
+        report("idle", await probe_latency(client, args.probes))
+
+        started = asyncio.Event()
+        counter = [0]
+        streams = [asyncio.create_task(open_stream(client, started, counter, args.streams)) for _ in range(args.streams)]
+        t0 = time.perf_counter()
+        await started.wait()
+        print(f"opened {args.streams} streams in {time.perf_counter() - t0:.1f}s")
+        report(f"{args.streams} streams open", await probe_latency(client, args.probes))
+        await asyncio.gather(*streams)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=1000, help="并发打开的流数量")
+    parser.add_argument("--interval", type=float, default=0.05, help="token 间隔（秒）")
+    parser.add_argument("--probes", type=int, default=200, help="延迟采样次数")
+    parser.add_argument("--duration", type=float, default=120.0, help="每个流的持续时间（秒）")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        proc = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_concurrent_streams", "--serve", *sys.argv[1:]])
+        try:
+            asyncio.run(main(args))
+        finally:
+            proc.terminate()
+            proc.wait()
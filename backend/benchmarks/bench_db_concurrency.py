@@ -0,0 +1,154 @@
+"""
+数据库读写并发基准：R 个读协程反复读取会话首页消息，W 个写协程反复写入消息并提交，统计吞吐与读延迟。
+对比：同步引擎 + 线程池 + 默认日志模式（旧实现）/ 同步引擎 + 线程池 + WAL / 异步引擎（aiosqlite）+ WAL。
+运行：python -m benchmarks.bench_db_concurrency --readers 64 --writers 8 --duration 10（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime
+
+from benchmarks._fixtures import seed, temp_database
+
+DB_PATH = temp_database()
+
+from sqlalchemy import create_engine, event, insert, select, text, update  # noqa: E402
+from sqlalchemy.orm import Session as SyncSession  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from app.database import SessionLocal, _set_sqlite_pragmas, engine, init_db  # noqa: E402
+from app.models import Message, Session  # noqa: E402
+
+
+def read_stmt(session_id: int):
+    # 只取列元组，避免 ORM 对象构造的 CPU 开销掩盖数据库本身的读写争用
+    return (
+        select(Message.id, Message.role, Message.content, Message.created_at)
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(50)
+    )
+
+
+def write_stmts(session_id: int, i: int):
+    now = datetime.utcnow()
+    return (
+        insert(Message).values(session_id=session_id, role="user", content=f"message {i} " * 8, token_count=30),
+        update(Session).where(Session.id == session_id).values(updated_at=now),
+    )
+
+
+class SyncBackend:
+    """旧实现：同步引擎，每次 DB 调用占用一个线程池线程"""
+
+    def __init__(self, wal: bool):
+        self.engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=" + ("WAL" if wal else "DELETE"))
+        if wal:
+            event.listen(self.engine, "connect", _set_sqlite_pragmas)
+
+    def _read(self, session_id: int) -> None:
+        with SyncSession(self.engine) as db:
+            db.execute(read_stmt(session_id)).all()
+
+    def _write(self, session_id: int, i: int) -> None:
+        with SyncSession(self.engine) as db:
+            for stmt in write_stmts(session_id, i):
+                db.execute(stmt)
+            db.commit()
+
+    async def read(self, session_id: int) -> None:
+        await run_in_threadpool(self._read, session_id)
+
+    async def write(self, session_id: int, i: int) -> None:
+        await run_in_threadpool(self._write, session_id, i)
+
+    async def close(self) -> None:
+        self.engine.dispose()
+
+
+class AsyncBackend:
+    """新实现：应用的异步引擎与会话工厂（PRAGMA 在连接建立时应用）"""
+
+    async def read(self, session_id: int) -> None:
+        async with SessionLocal() as db:
+            (await db.execute(read_stmt(session_id))).all()
+
+    async def write(self, session_id: int, i: int) -> None:
+        async with SessionLocal() as db:
+            for stmt in write_stmts(session_id, i):
+                await db.execute(stmt)
+            await db.commit()
+
+    async def close(self) -> None:
+        await engine.dispose()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))]
+
+
+async def run(name: str, backend, args) -> None:
+    deadline = time.monotonic() + args.duration
+    read_latency = []
+    writes = [0]
+    errors = [0]
+
+    async def reader(seed: int):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                await backend.read(rng.randint(1, args.sessions))
+            except Exception:
+                errors[0] += 1
+                continue
+            read_latency.append((time.perf_counter() - t0) * 1000)
+
+    async def writer(seed: int):
+        rng = random.Random(seed)
+        i = 0
+        while time.monotonic() < deadline:
+            try:
+                await backend.write(rng.randint(1, args.sessions), i)
+                writes[0] += 1
+            except Exception:
+                errors[0] += 1
+            i += 1
+
+    await asyncio.gather(
+        *(reader(i) for i in range(args.readers)),
+        *(writer(1000 + i) for i in range(args.writers)),
+    )
+    await backend.close()
+    print(
+        f"{name:<22} reads/s={len(read_latency) / args.duration:8.1f} writes/s={writes[0] / args.duration:7.1f} "
+        f"read p50={statistics.median(read_latency):6.2f}ms p99={percentile(read_latency, 99):7.2f}ms "
+        f"errors={errors[0]}"
+    )
+
+
+async def main(args):
+    await init_db()
+    await seed(args.sessions, args.messages)
+    await engine.dispose()
+    await run("sync + threadpool", SyncBackend(wal=False), args)
+    await run("sync + threadpool + WAL", SyncBackend(wal=True), args)
+    async with engine.connect() as conn:
+        mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+    await run(f"async + {mode.upper()}", AsyncBackend(), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=64, help="并发读协程数")
+    parser.add_argument("--writers", type=int, default=8, help="并发写协程数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种模式的运行秒数")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=200, help="每个会话预置的消息数")
+    asyncio.run(main(parser.parse_args()))
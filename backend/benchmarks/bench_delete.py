@@ -0,0 +1,106 @@
+"""
+会话删除基准：
+1. 单个长会话（--rows 条消息）：集合删除（DELETE + 外键级联）/ 旧做法（加载全部 Message 后逐条 DELETE）的耗时与峰值 RSS 增量；
+2. 批量删除 --sessions 个会话时，另一个协程每隔 --write-interval-ms 写入一条消息，统计其写入延迟：
+   分块的 delete_sessions / 单个事务一次删除全部会话。
+运行：python -m benchmarks.bench_delete --rows 200000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+
+from benchmarks._fixtures import seed, temp_database
+
+temp_database(mmap=False)
+
+from sqlalchemy import delete, select  # noqa: E402
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.models import Message, Session  # noqa: E402
+from app.services.session_service import delete_session, delete_sessions  # noqa: E402
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def message(i: int) -> dict:
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"第 {i} 条消息，用于删除基准。" * 4,
+            "status": "complete"}
+
+
+async def orm_delete(session_id: int) -> None:
+    """旧做法：ORM 级联，先加载会话的全部消息，再逐条 DELETE"""
+    async with SessionLocal() as db:
+        for m in await db.scalars(select(Message).where(Message.session_id == session_id)):
+            await db.delete(m)
+        await db.delete(await db.get(Session, session_id))
+        await db.commit()
+
+
+async def single_session(rows: int) -> None:
+    set_based, orm = await seed(2, rows, message)
+    for name, fn in (("set-based", lambda: _delete_one(set_based)), ("orm (old)", lambda: orm_delete(orm))):
+        rss = peak_rss_mib()
+        t0 = time.perf_counter()
+        await fn()
+        print(f"delete 1 session x {rows} messages  {name:<10} {time.perf_counter() - t0:7.2f}s  "
+              f"peak RSS +{peak_rss_mib() - rss:.1f} MiB")
+
+
+async def _delete_one(session_id: int) -> None:
+    async with SessionLocal() as db:
+        await delete_session(db, session_id)
+
+
+async def writer(session_id: int, interval: float, stop: asyncio.Event, latencies: list) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        async with SessionLocal() as db:
+            db.add(Message(session_id=session_id, role="user", content="并发写入", status="complete"))
+            await db.commit()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def bulk(sessions: int, per_session: int, interval: float) -> None:
+    for name in ("chunked", "one transaction"):
+        ids = await seed(sessions, per_session, message)
+        (other,) = await seed(1, 0)
+        latencies: list = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(writer(other, interval, stop, latencies))
+        await asyncio.sleep(0.2)
+        t0 = time.perf_counter()
+        if name == "chunked":
+            await delete_sessions(ids)
+        else:
+            async with SessionLocal() as db:
+                await db.execute(delete(Session).where(Session.id.in_(ids)))
+                await db.commit()
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await task
+        latencies.sort()
+        print(f"bulk delete {sessions} sessions x {per_session}  {name:<15} {elapsed:6.2f}s  concurrent write "
+              f"p50={statistics.median(latencies):6.1f}ms p99={latencies[int(len(latencies) * 0.99)]:7.1f}ms "
+              f"max={latencies[-1]:7.1f}ms")
+
+
+async def main(args):
+    await init_db()
+    await single_session(args.rows)
+    await bulk(args.sessions, args.per_session, args.write_interval_ms / 1000)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="单个长会话的消息数")
+    parser.add_argument("--sessions", type=int, default=500, help="批量删除的会话数")
+    parser.add_argument("--per-session", type=int, default=400, help="批量删除时每个会话的消息数")
+    parser.add_argument("--write-interval-ms", type=float, default=5, help="并发写入的间隔")
+    asyncio.run(main(parser.parse_args()))
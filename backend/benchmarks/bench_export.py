@@ -0,0 +1,100 @@
+"""
+导出/导入吞吐基准：messages 表共 N 行时 NDJSON 导出（明文 / gzip）与批量导入的行数每秒，以及导出期间的峰值 RSS 增量。
+SQLite mmap 读到的数据库页会计入 RSS，默认关闭 mmap 以便观察进程自身的内存占用。
+导入对比：export_service 的批量事务插入 / 逐条 add_message（每条一次提交，旧做法）。
+运行：python -m benchmarks.bench_export --rows 1000000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import time
+from datetime import datetime
+
+from benchmarks._fixtures import seed, temp_database
+
+DB_PATH = temp_database(mmap=False)
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.models import Message  # noqa: E402
+from app.services.export_service import export_ndjson, import_ndjson  # noqa: E402
+from app.services.session_service import add_message, create_session  # noqa: E402
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def message(i: int) -> dict:
+    return {
+        "role": "user" if i % 2 == 0 else "assistant",
+        "content": f"第 {i} 条消息，讨论导出与导入的性能。" * 3,
+        "token_count": 40,
+        "status": "complete",
+    }
+
+
+async def export_to(path: str, compress: bool, rows: int) -> None:
+    rss_before = peak_rss_mib()
+    t0 = time.perf_counter()
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in export_ndjson(compress):
+            size += len(chunk)
+            f.write(chunk)
+    elapsed = time.perf_counter() - t0
+    name = "gzip" if compress else "plain"
+    print(f"export {name:<5} {rows / elapsed:>10,.0f} rows/s  {size / 2**20:7.1f} MiB  "
+          f"peak RSS +{peak_rss_mib() - rss_before:.1f} MiB")
+
+
+async def file_chunks(path: str, size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+async def count_messages() -> int:
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count(Message.id)))
+
+
+async def main(args):
+    await init_db()
+    t0 = time.perf_counter()
+    await seed(args.sessions, args.rows // args.sessions, message, datetime(2024, 1, 1), interleave=True)
+    rows = await count_messages()
+    print(f"seeded {rows} messages in {args.sessions} sessions in {time.perf_counter() - t0:.1f}s")
+
+    plain = os.path.join(os.path.dirname(DB_PATH), "export.ndjson")
+    packed = plain + ".gz"
+    await export_to(plain, False, rows)
+    await export_to(packed, True, rows)
+
+    for name, path in (("plain", plain), ("gzip", packed)):
+        t0 = time.perf_counter()
+        result = await import_ndjson(file_chunks(path))
+        elapsed = time.perf_counter() - t0
+        print(f"import {name:<5} {result['messages'] / elapsed:>10,.0f} rows/s  ({result['messages']} messages)")
+
+    # 旧做法：逐条 add_message，每条消息一次提交
+    async with SessionLocal() as db:
+        s = await create_session(db, "baseline")
+        t0 = time.perf_counter()
+        for i in range(args.baseline):
+            await add_message(db, s.id, "user" if i % 2 == 0 else "assistant", f"第 {i} 条消息" * 3)
+        elapsed = time.perf_counter() - t0
+    print(f"add_message per row {args.baseline / elapsed:>7,.0f} rows/s  ({args.baseline} messages)")
+    print(f"messages in db: {await count_messages()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="messages 表总行数")
+    parser.add_argument("--sessions", type=int, default=20000, help="会话数量")
+    parser.add_argument("--baseline", type=int, default=2000, help="逐条 add_message 的消息数")
+    asyncio.run(main(parser.parse_args()))
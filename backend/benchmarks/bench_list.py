@@ -0,0 +1,103 @@
+"""
+列表接口序列化基准：生成一个 --messages 条消息的会话与 --sessions 个会话，经 ASGI 请求对比
+1. legacy：原做法（查询 ORM 对象 → response_model 逐行校验 → jsonable 转换 → 标准库 json 编码）；
+2. fast：当前的 GET /api/sessions、GET /api/sessions/{id}/messages（只查需要的列，行元组直接编码为 JSON 字节），
+   分别使用 orjson（已安装时）与标准库 json。
+输出每种做法的中位数 / 最小耗时、响应大小，并校验两种做法的响应字节完全一致。
+运行：python -m benchmarks.bench_list --messages 10000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks._fixtures import seed, temp_database
+
+temp_database()
+
+import httpx  # noqa: E402
+from fastapi import APIRouter, Depends  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession as DBSession  # noqa: E402
+
+from app.database import engine, get_db, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas.message import MessageResponse  # noqa: E402
+from app.schemas.session import SessionResponse  # noqa: E402
+from app.services import serialization  # noqa: E402
+from app.services.session_service import get_messages, get_sessions  # noqa: E402
+
+WORDS = "的 是 在 我们 可以 问题 因为 所以 需要 数据 函数 请求 模型 缓存 the a of to and return value async await".split()
+
+legacy = APIRouter(prefix="/legacy")
+
+
+@legacy.get("/sessions", response_model=list[SessionResponse])
+async def legacy_sessions(db: DBSession = Depends(get_db)):
+    return await get_sessions(db)
+
+
+@legacy.get("/sessions/{session_id}/messages", response_model=list[MessageResponse])
+async def legacy_messages(session_id: int, db: DBSession = Depends(get_db)):
+    return await get_messages(db, session_id)
+
+
+app.include_router(legacy)
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def message_maker(rng: random.Random):
+    """会话内第 i 条消息，assistant 带思考内容"""
+    def make(i: int) -> dict:
+        return {"role": "user" if i % 2 == 0 else "assistant", "content": sentence(rng, 20 if i % 2 == 0 else 80),
+                "reasoning_content": sentence(rng, 60) if i % 2 else None, "token_count": 50, "status": "complete"}
+    return make
+
+
+async def measure(client: httpx.AsyncClient, url: str, repeat: int):
+    samples, body = [], b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        r = await client.get(url)
+        samples.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+        body = r.content
+    return statistics.median(samples), min(samples), body
+
+
+async def main(args):
+    await init_db()
+    (session_id,) = await seed(1, args.messages, message_maker(random.Random(0)))
+    await seed(args.sessions - 1, 0)
+    encoders = (["orjson"] if serialization.orjson is not None else []) + ["json"]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, path in (
+            (f"messages ({args.messages} rows)", f"/sessions/{session_id}/messages"),
+            (f"sessions ({args.sessions} rows)", "/sessions"),
+        ):
+            await client.get(f"/api{path}")  # 预热：连接池、语句缓存
+            p50, best, expected = await measure(client, f"/legacy{path}", args.repeat)
+            print(f"{name:<24} legacy          p50={p50:8.1f}ms min={best:8.1f}ms  {len(expected) / 2**20:.2f} MiB")
+            orjson = serialization.orjson
+            for encoder in encoders:
+                if encoder == "json":
+                    serialization.orjson = None
+                p50_fast, best_fast, body = await measure(client, f"/api{path}", args.repeat)
+                serialization.orjson = orjson
+                assert body == expected, f"{name}: fast path ({encoder}) differs from legacy"
+                print(f"{name:<24} fast ({encoder:<6})   p50={p50_fast:8.1f}ms min={best_fast:8.1f}ms  "
+                      f"x{p50 / p50_fast:.1f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000, help="长会话的消息数")
+    parser.add_argument("--sessions", type=int, default=5000, help="会话总数（GET /api/sessions 的行数）")
+    parser.add_argument("--repeat", type=int, default=10, help="每种做法的请求次数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+消息分页基准：messages 表共 1M 行时，打开一个长会话的首页延迟。
+对比：全量加载（旧接口行为）/ 游标分页（有复合索引）/ 游标分页（删除索引后）。
+运行：python -m benchmarks.bench_message_pages --rows 1000000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._fixtures import insert_messages, seed_sessions, temp_database
+
+temp_database()
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.services.session_service import get_messages, get_messages_page  # noqa: E402
+
+
+async def seed(rows: int, sessions: int, target_messages: int) -> int:
+    """插入 sessions 个会话共 rows 条消息，长会话的消息均匀散布在其他会话的消息之间；返回长会话的 id"""
+    base = datetime(2024, 1, 1)
+    target, *others = await seed_sessions(sessions, base)
+    t0 = time.perf_counter()
+    await insert_messages(
+        {
+            "session_id": target if i % (rows // target_messages) == 0 else others[i % len(others)],
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i} " * 8,
+            "token_count": 30,
+            "created_at": base + timedelta(seconds=i),
+        }
+        for i in range(rows)
+    )
+    print(f"seeded {rows} rows in {time.perf_counter() - t0:.1f}s")
+    return target
+
+
+async def timeit(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+async def main(args):
+    await init_db()
+    sid = await seed(args.rows, args.sessions, args.target)
+    db = SessionLocal()
+
+    async def full():
+        db.expunge_all()
+        return await get_messages(db, sid)
+
+    async def first_page():
+        db.expunge_all()
+        return await get_messages_page(db, sid, args.limit)
+
+    async def deep_page():
+        db.expunge_all()
+        rows, _ = await get_messages_page(db, sid, args.limit)
+        for _ in range(10):
+            rows, _ = await get_messages_page(db, sid, args.limit, before=rows[0].id)
+        return rows
+
+    print(f"long session: {len(await full())} messages, page size {args.limit}")
+    cases = [("full history", full), ("first page", first_page), ("pages 1-11", deep_page)]
+    for name, fn in cases:
+        p50, worst = await timeit(fn, args.repeat)
+        print(f"indexed   {name:<14} p50={p50:8.2f}ms max={worst:8.2f}ms")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_messages_session_created"))
+    for name, fn in cases[1:2]:
+        p50, worst = await timeit(fn, max(1, args.repeat // 10))
+        print(f"no index  {name:<14} p50={p50:8.2f}ms max={worst:8.2f}ms")
+    await db.close()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="messages 表总行数")
+    parser.add_argument("--sessions", type=int, default=5000, help="会话数量")
+    parser.add_argument("--target", type=int, default=5000, help="被测长会话的消息数")
+    parser.add_argument("--limit", type=int, default=50, help="每页条数")
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""
+全文搜索基准：messages 表共 1M 行（随机中文句子，词频近似 Zipf 分布）时 /api/search 的查询延迟。
+对比：FTS5 trigram 索引 / 无索引的 LIKE 扫描；另测触发器维护索引对单条消息写入的额外开销。
+运行：python -m benchmarks.bench_search --rows 1000000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+from benchmarks._fixtures import seed, temp_database
+
+DB_PATH = temp_database()
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.models import Message  # noqa: E402
+from app.services import search_service  # noqa: E402
+from app.services.search_service import FTS_TABLE, search  # noqa: E402
+
+
+def make_vocabulary(rng: random.Random, size: int) -> list:
+    """size 个 2~4 字的随机汉字词"""
+    return ["".join(chr(rng.randint(0x4E00, 0x62FF)) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+async def seed_corpus(rows: int, sessions: int, vocab: list, rng: random.Random) -> None:
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+
+    def message(i: int) -> dict:
+        words = rng.choices(vocab, weights, k=rng.randint(8, 30))
+        return {"role": "user" if i % 2 == 0 else "assistant", "content": "，".join(words) + "。",
+                "token_count": len(words), "status": "complete"}
+
+    t0 = time.perf_counter()
+    await seed(sessions, rows // sessions, message, datetime(2024, 1, 1), interleave=True)
+    elapsed = time.perf_counter() - t0
+    print(f"seeded {rows} rows (indexed by triggers) in {elapsed:.1f}s, {rows / elapsed:,.0f} rows/s, "
+          f"db size {os.path.getsize(DB_PATH) / 2**20:.0f} MiB")
+
+
+async def timeit(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+async def single_inserts(n: int) -> float:
+    """逐条插入并提交 n 条消息，返回每条平均毫秒数"""
+    t0 = time.perf_counter()
+    for i in range(n):
+        async with SessionLocal() as db:
+            db.add(Message(session_id=1, role="user", content=f"新消息 {i} 关于基准测试的内容", status="complete"))
+            await db.commit()
+    return (time.perf_counter() - t0) * 1000 / n
+
+
+async def main(args):
+    rng = random.Random(42)
+    vocab = make_vocabulary(rng, args.vocab)
+    await init_db()
+    await seed_corpus(args.rows, args.sessions, vocab, rng)
+
+    # 常见词 / 中频词 / 罕见词（均为 ≥3 字走 FTS）/ 两个词 AND / 两字词（FTS 无法处理，退化为 LIKE）
+    three = [w for w in vocab if len(w) >= 3]
+    two = [w for w in vocab if len(w) == 2]
+    queries = [
+        ("common", three[0]),
+        ("mid", three[len(three) // 10]),
+        ("rare", three[-1]),
+        ("two terms", f"{three[1]} {three[2]}"),
+        ("2-char", two[len(two) // 10]),
+    ]
+
+    async def run(q):
+        async with SessionLocal() as db:
+            return await search(db, q)
+
+    for mode, fts in (("fts5", True), ("like", False)):
+        search_service._fts_ready = fts
+        for name, q in queries:
+            repeat = args.repeat if fts else max(1, args.repeat // 10)
+            p50, worst, r = await timeit(lambda: run(q), repeat)
+            print(f"{mode:<5} {name:<10} p50={p50:8.2f}ms max={worst:8.2f}ms "
+                  f"sessions={r['total_sessions']:<5} truncated={r['truncated']}")
+    search_service._fts_ready = True
+
+    with_index = await single_inserts(args.inserts)
+    async with engine.begin() as conn:
+        for suffix in ("ai", "ad", "au"):
+            await conn.execute(text(f"DROP TRIGGER {FTS_TABLE}_{suffix}"))
+    without_index = await single_inserts(args.inserts)
+    print(f"single insert+commit: {with_index:.3f}ms with FTS triggers, {without_index:.3f}ms without")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="messages 表总行数")
+    parser.add_argument("--sessions", type=int, default=20000, help="会话数量")
+    parser.add_argument("--vocab", type=int, default=5000, help="词表大小")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--inserts", type=int, default=500, help="单条写入开销测试的消息数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""
+单飞基准：重复请求占多数的突发负载下，每个请求平均触发的上游调用数。
+上游用本地假流替代（固定 token 间隔），直接驱动 llm_service.stream_chat，无需 API Key 与网络。
+运行：python -m benchmarks.bench_single_flight --requests 1000 --prompts 20（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.config import settings
+from app.services import llm_service
+
+
+def make_fake_upstream(tokens: int, interval: float, calls: list):
+    async def fake_upstream(messages, thinking_mode, client_key=""):
+        calls[0] += 1
+        for i in range(tokens):
+            yield {"type": "content", "data": f"t{i} "}
+            await asyncio.sleep(interval)
+        yield {"type": "done", "data": ""}
+
+    return fake_upstream
+
+
+async def one_request(prompt: str, delay: float, expected: int) -> None:
+    await asyncio.sleep(delay)
+    n = 0
+    async for chunk in llm_service.stream_chat([{"role": "user", "content": prompt}], False):
+        if chunk["type"] == "content":
+            n += 1
+    assert n == expected, f"got {n} chunks, expected {expected}"
+
+
+async def run(args, enabled: bool) -> None:
+    settings.SINGLE_FLIGHT_ENABLED = enabled
+    calls = [0]
+    llm_service._stream_upstream = make_fake_upstream(args.tokens, args.interval, calls)
+    rng = random.Random(42)
+    # 少量热门提示词占多数请求（Zipf 近似），请求在 spread 秒内随机到达
+    weights = [1 / (i + 1) for i in range(args.prompts)]
+    prompts = rng.choices([f"prompt {i}" for i in range(args.prompts)], weights=weights, k=args.requests)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one_request(p, rng.uniform(0, args.spread), args.tokens) for p in prompts))
+    elapsed = time.perf_counter() - t0
+    print(
+        f"single-flight {'on ' if enabled else 'off'} requests={args.requests} upstream_calls={calls[0]:<5} "
+        f"calls/request={calls[0] / args.requests:.3f} wall={elapsed:.2f}s"
+    )
+
+
+async def main(args):
+    await run(args, False)
+    await run(args, True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000, help="请求总数")
+    parser.add_argument("--prompts", type=int, default=20, help="不同提示词数量")
+    parser.add_argument("--spread", type=float, default=2.0, help="请求到达的时间窗口（秒）")
+    parser.add_argument("--tokens", type=int, default=100, help="每个回复的 token 数")
+    parser.add_argument("--interval", type=float, default=0.02, help="token 间隔（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+SSE 帧合并基准：M 个并发 /api/chat 流、每流 T 个单 token 增量（本地假上游），
+对比请求参数 coalesce 开启/关闭时客户端收到的帧数、帧率，以及服务端进程每流 CPU 时间。
+服务端运行在子进程中，CPU 取自 /proc（仅 Linux）。
+运行：python -m benchmarks.bench_sse_coalescing --streams 200 --tokens 1000（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks._fixtures import temp_database
+
+temp_database()
+
+import httpx  # noqa: E402
+
+
+def serve(args):
+    import uvicorn
+
+    from app.main import app
+    from app.routers import chat
+
+    async def fake_stream_chat(messages, thinking_mode, client_key=""):
+        for i in range(args.tokens):
+            yield {"type": "reasoning" if i < args.tokens // 4 else "content", "data": "字" if i % 2 else "a"}
+            await asyncio.sleep(args.interval)
+        yield {"type": "done", "data": ""}
+
+    chat.stream_chat = fake_stream_chat
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def one_stream(client: httpx.AsyncClient, coalesce: bool, stats: dict):
+    body = {"message": "hi", "coalesce": coalesce}
+    async with client.stream("POST", "/api/chat", json=body) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("data: "):
+                stats["frames"] += 1
+
+
+async def run(args, pid: int, coalesce: bool):
+    stats = {"frames": 0}
+    limits = httpx.Limits(max_connections=args.streams, max_keepalive_connections=args.streams)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=None) as client:
+        cpu0, wall0 = cpu_seconds(pid), time.perf_counter()
+        await asyncio.gather(*(one_stream(client, coalesce, stats) for _ in range(args.streams)))
+        cpu, wall = cpu_seconds(pid) - cpu0, time.perf_counter() - wall0
+    print(
+        f"coalesce={'on ' if coalesce else 'off'} frames={stats['frames']:>8} "
+        f"frames/sec={stats['frames'] / wall:9.0f} server cpu/stream={cpu / args.streams * 1000:7.2f}ms "
+        f"wall={wall:5.1f}s"
+    )
+
+
+async def main(args, pid: int):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as client:
+        for _ in range(200):
+            try:
+                await client.get("/api/health")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    await run(args, pid, False)
+    await run(args, pid, True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=0.005, help="上游 token 间隔（秒）")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        proc = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_sse_coalescing", "--serve", *sys.argv[1:]])
+        try:
+            asyncio.run(main(args, proc.pid))
+        finally:
+            proc.terminate()
+            proc.wait()
@@ -0,0 +1,127 @@
+"""
+启动基准：
+1. 导入耗时：新进程中 import app.main 的耗时（--repeat 次取中位数），以及延迟导入的 openai 本身的导入耗时；
+2. 数据库初始化：新库 / 已是最新版本的库，版本化迁移（migrate）与旧做法（每次启动 create_all + 逐表反射补列）的耗时；
+3. 冷启动：以 uvicorn 子进程启动后端（上游为本地 DeepSeek 替身），从启动进程到 /api/health 可访问、
+   到 /api/ready 返回 200 的时间（第一次为新库，之后为已有的库）。
+运行：python -m benchmarks.bench_startup（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks._fixtures import temp_database
+
+_tmp = os.path.dirname(temp_database())
+
+from app import models  # noqa: E402,F401
+from app.database import create_engine_for  # noqa: E402
+from app.migrations import migrate, reconcile_schema  # noqa: E402
+from app.services.search_service import ensure_search_index  # noqa: E402
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+
+
+def import_ms(module: str, repeat: int) -> float:
+    samples = [
+        float(subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)], text=True))
+        for _ in range(repeat)
+    ]
+    return statistics.median(samples)
+
+
+def legacy_init(conn) -> None:
+    """旧做法：每次启动 create_all，并逐表反射补齐可空列与索引"""
+    reconcile_schema(conn)
+    ensure_search_index(conn)
+
+
+def versioned_init(conn) -> None:
+    migrate(conn)
+    ensure_search_index(conn)
+
+
+async def init_ms(url: str, fn, repeat: int) -> float:
+    """每次用新引擎（新连接，没有缓存的库结构）执行一次初始化，取中位数"""
+    samples = []
+    for _ in range(repeat):
+        engine = create_engine_for(url)
+        t0 = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.run_sync(fn)
+        samples.append((time.perf_counter() - t0) * 1000)
+        await engine.dispose()
+    return statistics.median(samples)
+
+
+async def schema(repeat: int) -> None:
+    for name, fn in (("versioned migrate", versioned_init), ("legacy create_all", legacy_init)):
+        url = f"sqlite:///{os.path.join(_tmp, name.split()[0] + '.db')}"
+        fresh = await init_ms(url, fn, 1)
+        current = await init_ms(url, fn, repeat)
+        print(f"db init  {name:<18} new db {fresh:7.1f}ms   existing db {current:6.1f}ms")
+
+
+def cold_start(args) -> None:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(_tmp, 'cold.db')}",
+        DEEPSEEK_BASE_URL=f"http://127.0.0.1:{args.mock_port}",
+    )
+    mock = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_deepseek", "--port", str(args.mock_port)])
+    try:
+        _wait(f"http://127.0.0.1:{args.mock_port}/mock/stats", time.perf_counter())
+        for run in range(args.cold_starts):
+            t0 = time.perf_counter()
+            app_cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port)]
+            app = subprocess.Popen(app_cmd + ["--log-level", "warning"], env=env)
+            try:
+                listening = _wait(f"http://127.0.0.1:{args.app_port}/api/health", t0)
+                ready = _wait(f"http://127.0.0.1:{args.app_port}/api/ready", t0)
+                status = httpx.get(f"http://127.0.0.1:{args.app_port}/api/ready").json()
+            finally:
+                app.terminate()
+                app.wait()
+            db = "new" if run == 0 else "existing"
+            print(f"cold start #{run + 1} ({db} db)  listening {listening * 1000:6.0f}ms  "
+                  f"ready {ready * 1000:6.0f}ms  (lifespan {status['startup_seconds'] * 1000:.0f}ms, "
+                  f"warm-up done {status['ready_seconds'] * 1000:.0f}ms after lifespan start)")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+def _wait(url: str, t0: float) -> float:
+    """轮询直到返回 200，返回自 t0 起的秒数"""
+    while True:
+        try:
+            if httpx.get(url).status_code == 200:
+                return time.perf_counter() - t0
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() - t0 > 60:
+            raise RuntimeError(f"{url} not ready after 60s")
+        time.sleep(0.005)
+
+
+def main(args):
+    print(f"import app.main {import_ms('app.main', args.repeat):7.0f}ms   "
+          f"(openai, deferred to warm-up: {import_ms('openai', args.repeat):.0f}ms)")
+    asyncio.run(schema(args.repeat))
+    cold_start(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="导入与数据库初始化的重复次数")
+    parser.add_argument("--cold-starts", type=int, default=3, help="冷启动次数")
+    parser.add_argument("--app-port", type=int, default=18200)
+    parser.add_argument("--mock-port", type=int, default=18201)
+    main(parser.parse_args())
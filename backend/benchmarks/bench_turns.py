@@ -0,0 +1,88 @@
+"""
+对话轮次写入基准：每轮 = 轮次准备（会话/标题/用户消息）+ assistant 消息写入，统计 turns/sec。
+对比：旧路径（多次提交 + refresh）/ 单事务准备 / 单事务准备 + 组提交。
+运行：python -m benchmarks.bench_turns --turns 2000 --concurrency 64（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks._fixtures import temp_database
+
+temp_database()
+
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.services.group_commit import GroupCommitWriter  # noqa: E402
+from app.services.session_service import (  # noqa: E402
+    add_message,
+    cache_message,
+    create_session,
+    get_messages,
+    stage_message,
+    start_turn,
+    update_session_title_from_message,
+)
+
+
+async def legacy_setup(text: str) -> int:
+    async with SessionLocal() as db:
+        s = await create_session(db)
+        await db.refresh(s)
+        await get_messages(db, s.id)
+        await update_session_title_from_message(db, s.id, text)
+        m = await add_message(db, s.id, "user", text)
+        await db.refresh(m)
+        return s.id
+
+
+async def single_tx_setup(text: str) -> int:
+    async with SessionLocal() as db:
+        return (await start_turn(db, None, text))[0]
+
+
+async def save_assistant(session_id: int, content: str) -> None:
+    async with SessionLocal() as db:
+        await add_message(db, session_id, "assistant", content)
+
+
+async def run(mode: str, turns: int, concurrency: int, writer: GroupCommitWriter) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    setup = legacy_setup if mode == "legacy" else single_tx_setup
+
+    async def turn(i: int):
+        async with sem:
+            sid = await setup(f"question {i}")
+            reply = f"answer {i} " * 20
+            if mode == "group-commit":
+                m = await writer.submit(lambda db: stage_message(db, sid, "assistant", reply))
+                cache_message(m)
+            else:
+                await save_assistant(sid, reply)
+
+    if mode == "group-commit":
+        writer.start()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    elapsed = time.perf_counter() - t0
+    if mode == "group-commit":
+        await writer.stop()
+    return turns / elapsed
+
+
+async def main(args):
+    await init_db()
+    writer = GroupCommitWriter(args.interval_ms, 256)
+    for mode in ("legacy", "single-tx", "group-commit"):
+        rate = await run(mode, args.turns, args.concurrency, writer)
+        extra = f" (avg batch {writer.stats()['avg_batch']:.1f})" if mode == "group-commit" else ""
+        print(f"{mode:<14} {rate:8.1f} turns/sec{extra}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
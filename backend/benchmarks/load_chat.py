@@ -0,0 +1,334 @@
+"""
+/api/chat 负载基准：本地 DeepSeek 替身（benchmarks.mock_deepseek）+ 以 uvicorn 子进程运行的后端，
+N 个并发会话各发送若干轮对话，统计吞吐、首 token 延迟、token 间隔分位数、数据库写入速率与每个流的内存占用。
+结果写入 JSON（含 git 提交），--compare 与之前的结果对比，便于发现回归。
+运行：python -m benchmarks.load_chat --sessions 100 --turns 3（需在 backend 目录）
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks.mock_deepseek import add_arguments as add_mock_arguments
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# 对比时关注的指标：(路径, 越大越好)
+KEY_METRICS = (
+    ("requests_per_sec", True),
+    ("ttft_ms.p50", False),
+    ("ttft_ms.p95", False),
+    ("ttft_ms.p99", False),
+    ("inter_token_ms.p50", False),
+    ("inter_token_ms.p95", False),
+    ("inter_token_ms.p99", False),
+    ("db.write_statements_per_sec", None),
+    ("db.commits_per_sec", None),
+    ("memory.per_stream_kib", False),
+    ("prompt_cache_hit_ratio", True),
+)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def summarize(samples) -> dict:
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "p50": round(percentile(samples, 50), 3),
+        "p95": round(percentile(samples, 95), 3),
+        "p99": round(percentile(samples, 99), 3),
+        "max": round(max(samples), 3),
+    }
+
+
+def rss_kib(pid: int):
+    """Linux 下读取进程常驻内存（KiB），其他平台返回 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def scrape_counters(client: httpx.AsyncClient) -> dict:
+    text = (await client.get("/api/metrics")).text
+    counters = {}
+    for name in ("db_write_statements_total", "db_commits_total", "db_query_seconds_count"):
+        m = re.search(rf"^minichatgpt_{name} (\S+)$", text, re.MULTILINE)
+        counters[name] = float(m.group(1)) if m else 0.0
+    return counters
+
+
+async def wait_ready(url: str):
+    """轮询直到返回 200（后端用 /api/ready：预热完成后才开始压测）"""
+    async with httpx.AsyncClient() as client:
+        for _ in range(400):
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"{url} did not start")
+
+
+class Stats:
+    def __init__(self):
+        self.ttft = []
+        self.gaps = []
+        self.durations = []
+        self.ok = 0
+        self.errors = 0
+        self.tokens = 0
+        self.open_streams = 0
+        self.max_open_streams = 0
+
+
+async def one_turn(client: httpx.AsyncClient, session_id: int, text: str, args, stats: Stats) -> None:
+    t0 = time.perf_counter()
+    last = None
+    failed = False
+    done = False
+    body = {"message": text, "session_id": session_id, "thinking_mode": args.thinking, "coalesce": args.coalesce}
+    try:
+        async with client.stream("POST", "/api/chat", json=body) as r:
+            if r.status_code != 200:
+                await r.aread()
+                failed = True
+            else:
+                stats.open_streams += 1
+                stats.max_open_streams = max(stats.max_open_streams, stats.open_streams)
+                try:
+                    async for line in r.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        frame = json.loads(line[6:])
+                        if frame["type"] in ("reasoning", "content"):
+                            if frame["data"].startswith("[错误]"):
+                                failed = True
+                                continue
+                            now = time.perf_counter()
+                            if last is None:
+                                stats.ttft.append((now - t0) * 1000)
+                            else:
+                                stats.gaps.append((now - last) * 1000)
+                            last = now
+                            stats.tokens += 1
+                        elif frame["type"] == "done":
+                            done = True
+                finally:
+                    stats.open_streams -= 1
+    except httpx.HTTPError:
+        failed = True
+    stats.durations.append((time.perf_counter() - t0) * 1000)
+    if failed or not done:
+        stats.errors += 1
+    else:
+        stats.ok += 1
+
+
+async def user(client: httpx.AsyncClient, index: int, args, stats: Stats) -> None:
+    session_id = (await client.post("/api/sessions")).json()["id"]
+    for turn in range(args.turns):
+        text = f"用户 {index} 的第 {turn} 个问题"
+        await one_turn(client, session_id, text + "请详细说明。" * (args.question_chars // 6), args, stats)
+
+
+async def sample_rss(pid: int, peak: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        value = rss_kib(pid)
+        if value is not None:
+            peak[0] = max(peak[0], value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.05)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args, app_pid: int) -> dict:
+    base = f"http://127.0.0.1:{args.app_port}"
+    limits = httpx.Limits(max_connections=args.sessions + 10, max_keepalive_connections=args.sessions + 10)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=None) as client:
+        # 预热：建立连接、编译 SQL，避免计入首个请求的冷启动
+        await one_turn(client, (await client.post("/api/sessions")).json()["id"], "warmup", args, Stats())
+        idle_rss = rss_kib(app_pid)
+        before = await scrape_counters(client)
+
+        stats = Stats()
+        peak = [idle_rss or 0]
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(app_pid, peak, stop))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user(client, i, args, stats) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await sampler
+        after = await scrape_counters(client)
+
+    requests = stats.ok + stats.errors
+    delta = {k: after[k] - before[k] for k in after}
+    per_stream = None
+    if idle_rss is not None and stats.max_open_streams:
+        per_stream = round((peak[0] - idle_rss) / stats.max_open_streams, 1)
+    return {
+        "duration_sec": round(elapsed, 3),
+        "requests": requests,
+        "ok": stats.ok,
+        "errors": stats.errors,
+        "requests_per_sec": round(requests / elapsed, 2),
+        "tokens_per_sec": round(stats.tokens / elapsed, 1),
+        "max_open_streams": stats.max_open_streams,
+        "ttft_ms": summarize(stats.ttft),
+        "inter_token_ms": summarize(stats.gaps),
+        "request_ms": summarize(stats.durations),
+        "db": {
+            "write_statements": int(delta["db_write_statements_total"]),
+            "commits": int(delta["db_commits_total"]),
+            "queries": int(delta["db_query_seconds_count"]),
+            "write_statements_per_sec": round(delta["db_write_statements_total"] / elapsed, 1),
+            "commits_per_sec": round(delta["db_commits_total"] / elapsed, 1),
+            "write_statements_per_request": round(delta["db_write_statements_total"] / requests, 2) if requests else None,
+        },
+        "memory": {
+            "idle_rss_kib": idle_rss,
+            "peak_rss_kib": peak[0] or None,
+            "per_stream_kib": per_stream,
+        },
+    }
+
+
+def lookup(results: dict, path: str):
+    value = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(current: dict, previous_path: str) -> None:
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\ncompared with {previous.get('commit')} ({previous_path})")
+    for path, higher_is_better in KEY_METRICS:
+        new, old = lookup(current["results"], path), lookup(previous["results"], path)
+        if new is None or old is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if higher_is_better is not None and abs(change) >= 10:
+            better = (change > 0) == higher_is_better
+            flag = "  better" if better else "  REGRESSION"
+        print(f"  {path:<30} {old:>12} -> {new:>12}  {change:+7.1f}%{flag}")
+
+
+def print_summary(results: dict) -> None:
+    r = results
+    print(f"{r['requests']} requests ({r['errors']} errors) in {r['duration_sec']}s: "
+          f"{r['requests_per_sec']} req/s, {r['tokens_per_sec']} tokens/s, peak {r['max_open_streams']} streams")
+    for name in ("ttft_ms", "inter_token_ms", "request_ms"):
+        s = r[name]
+        if s["n"]:
+            print(f"  {name:<15} p50={s['p50']:9.2f} p95={s['p95']:9.2f} p99={s['p99']:9.2f} max={s['max']:9.2f}")
+    db = r["db"]
+    print(f"  db: {db['write_statements_per_sec']} writes/s, {db['commits_per_sec']} commits/s, "
+          f"{db['write_statements_per_request']} writes/request")
+    m = r["memory"]
+    if m["per_stream_kib"] is not None:
+        print(f"  memory: idle {m['idle_rss_kib']} KiB, peak {m['peak_rss_kib']} KiB, "
+              f"~{m['per_stream_kib']} KiB per open stream")
+    if r.get("prompt_cache_hit_ratio") is not None:
+        print(f"  upstream prompt cache hit ratio: {r['prompt_cache_hit_ratio']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的对话轮数")
+    parser.add_argument("--thinking", action="store_true", help="开启思考模式（配合 --reasoning-tokens）")
+    parser.add_argument("--coalesce", action="store_true", help="开启 SSE 合并（默认关闭，以便逐 token 计时）")
+    parser.add_argument("--question-chars", type=int, default=0, help="每个问题额外填充的字符数（用于放大上下文）")
+    parser.add_argument("--app-port", type=int, default=8766)
+    parser.add_argument("--mock-port", type=int, default=8790)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="后端的额外环境变量，可重复")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 benchmarks/results/load-<commit>-<time>.json")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    mock_options = add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    mock_cmd = [sys.executable, "-m", "benchmarks.mock_deepseek", "--port", str(args.mock_port)]
+    for dest in mock_options:
+        mock_cmd += ["--" + dest.replace("_", "-"), str(getattr(args, dest))]
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'load.db')}",
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{args.mock_port}",
+        "DEEPSEEK_API_KEY": "mock",
+        "METRICS_ENABLED": "true",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    app_cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port), "--log-level", "warning"]
+
+    mock = subprocess.Popen(mock_cmd)
+    app = subprocess.Popen(app_cmd, env=env)
+    try:
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.mock_port}/mock/stats"))
+        asyncio.run(wait_ready(f"http://127.0.0.1:{args.app_port}/api/ready"))
+        results = asyncio.run(run(args, app.pid))
+        upstream = httpx.get(f"http://127.0.0.1:{args.mock_port}/mock/stats").json()
+        if upstream.get("prompt_tokens"):
+            hit_ratio = upstream["prompt_cache_hit_tokens"] / upstream["prompt_tokens"]
+            results["prompt_cache_hit_ratio"] = round(hit_ratio, 4)
+    finally:
+        for proc in (app, mock):
+            proc.terminate()
+            proc.wait()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+        "upstream": upstream,
+    }
+    print_summary(results)
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{commit}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
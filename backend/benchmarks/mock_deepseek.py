@@ -0,0 +1,224 @@
+"""
+本地 DeepSeek 替身：OpenAI 兼容的 /chat/completions（流式与非流式），无需 API Key 与网络。
+可配置首 token 延迟、token 速率、思考过程长度、503 错误与 429（带 Retry-After）注入、流中断注入。
+模拟 DeepSeek 的上下文硬盘缓存：提示（按字符计 token）以固定单位的前缀块缓存，与之前请求相同的前缀计为
+prompt_cache_hit_tokens，未命中部分按 --prefill-ms-per-1k 增加首 token 延迟。
+运行：python -m benchmarks.mock_deepseek --port 8790 --ttft-ms 300 --tokens-per-sec 50（需在 backend 目录）
+然后设置 DEEPSEEK_BASE_URL=http://127.0.0.1:8790 启动后端。GET /mock/stats 返回已处理的请求计数。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("好的", "我们", "可以", "这个", "问题", "首先", "然后", "因为", "所以", "例如", "另外", "总之", "，", "。")
+
+
+def _sse(obj) -> bytes:
+    return f"data: {json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class PrefixCache:
+    """按 unit 个字符为一块缓存提示前缀：每块的键是从开头到该块末尾的累计哈希，命中长度为最长的已见前缀"""
+
+    def __init__(self, unit: int, max_blocks: int = 1_000_000):
+        self.unit = unit
+        self.max_blocks = max_blocks
+        self._blocks = set()
+
+    def match(self, prompt: str) -> int:
+        """返回命中的前缀字符数，并缓存本次提示的全部前缀块"""
+        if self.unit <= 0:
+            return 0
+        if len(self._blocks) > self.max_blocks:
+            self._blocks.clear()
+        h = hashlib.sha1()
+        hit = 0
+        matching = True
+        for end in range(self.unit, len(prompt) + 1, self.unit):
+            h.update(prompt[end - self.unit:end].encode("utf-8"))
+            key = h.digest()
+            if matching and key in self._blocks:
+                hit = end
+            else:
+                matching = False
+                self._blocks.add(key)
+        return hit
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="mock-deepseek")
+    rng = random.Random(args.seed)
+    prefix_cache = PrefixCache(args.prefix_cache_unit)
+    counters = {
+        "requests": 0,
+        "streams": 0,
+        "rate_limited": 0,
+        "errors": 0,
+        "broken_streams": 0,
+        "tokens": 0,
+        "prompt_tokens": 0,
+        "prompt_cache_hit_tokens": 0,
+        "in_flight": 0,
+        "max_in_flight": 0,
+    }
+
+    def token_delay() -> float:
+        if args.tokens_per_sec <= 0:
+            return 0.0
+        base = 1 / args.tokens_per_sec
+        return max(0.0, rng.uniform(base * (1 - args.jitter), base * (1 + args.jitter)))
+
+    def usage(prompt: int, hit: int, reasoning: int, content: int) -> dict:
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": reasoning + content,
+            "total_tokens": prompt + reasoning + content,
+            "prompt_cache_hit_tokens": hit,
+            "prompt_cache_miss_tokens": prompt - hit,
+            "completion_tokens_details": {"reasoning_tokens": reasoning},
+        }
+
+    @app.get("/mock/stats")
+    async def stats():
+        return counters
+
+    @app.get("/models")
+    @app.get("/v1/models")
+    async def models():
+        """后端启动预热时请求，用于预先建立连接"""
+        return {"object": "list", "data": [{"id": "deepseek-chat", "object": "model", "owned_by": "deepseek"}]}
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        if rng.random() < args.rate_limit_rate:
+            counters["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                status_code=429,
+                headers={"Retry-After": str(args.retry_after)},
+            )
+        if rng.random() < args.error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": {"message": "Service unavailable", "type": "server_error"}}, status_code=503)
+
+        model = body.get("model", "deepseek-chat")
+        thinking = (body.get("thinking") or {}).get("type") == "enabled" or model == "deepseek-reasoner"
+        reasoning_tokens = args.reasoning_tokens if thinking else 0
+        prompt = "".join(f"{m.get('role')}\n{m.get('content') or ''}\n" for m in body.get("messages", []))
+        prompt_tokens = len(prompt)
+        hit_tokens = prefix_cache.match(prompt)
+        counters["prompt_tokens"] += prompt_tokens
+        counters["prompt_cache_hit_tokens"] += hit_tokens
+        # 未命中缓存的部分需要预填充，首 token 延迟随之增加
+        ttft = (args.ttft_ms + (prompt_tokens - hit_tokens) * args.prefill_ms_per_1k / 1000) / 1000
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + args.content_tokens * token_delay())
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(rng.choices(WORDS, k=args.content_tokens))},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(prompt_tokens, hit_tokens, 0, args.content_tokens),
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        broken = rng.random() < args.break_rate
+
+        def chunk(delta: dict, finish_reason=None) -> bytes:
+            return _sse({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        async def stream():
+            counters["streams"] += 1
+            counters["in_flight"] += 1
+            counters["max_in_flight"] = max(counters["max_in_flight"], counters["in_flight"])
+            try:
+                await asyncio.sleep(ttft)
+                yield chunk({"role": "assistant", "content": ""})
+                total = reasoning_tokens + args.content_tokens
+                for i in range(total):
+                    if broken and i == total // 2:
+                        counters["broken_streams"] += 1
+                        return  # 不发 [DONE] 直接断开，模拟上游中途断流
+                    field = "reasoning_content" if i < reasoning_tokens else "content"
+                    yield chunk({field: rng.choice(WORDS)})
+                    counters["tokens"] += 1
+                    delay = token_delay()
+                    if delay:
+                        await asyncio.sleep(delay)
+                yield chunk({}, "stop")
+                if include_usage:
+                    yield _sse({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage(prompt_tokens, hit_tokens, reasoning_tokens, args.content_tokens),
+                    })
+                yield b"data: [DONE]\n\n"
+            finally:
+                counters["in_flight"] -= 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> list:
+    """替身行为相关的参数（load_chat 复用并透传）；返回参数的 dest 列表"""
+    actions = [
+        parser.add_argument("--ttft-ms", type=float, default=300, help="首 token 延迟（毫秒）"),
+        parser.add_argument(
+            "--prefill-ms-per-1k", type=float, default=0, help="每 1000 个未命中缓存的提示 token 增加的首 token 延迟（毫秒）"
+        ),
+        parser.add_argument("--prefix-cache-unit", type=int, default=64, help="前缀缓存的块大小（字符），0 表示不模拟缓存"),
+        parser.add_argument("--tokens-per-sec", type=float, default=50, help="每个流的 token 速率，0 表示不限速"),
+        parser.add_argument("--jitter", type=float, default=0.2, help="token 间隔的随机抖动比例"),
+        parser.add_argument("--reasoning-tokens", type=int, default=0, help="思考模式下的 reasoning token 数"),
+        parser.add_argument("--content-tokens", type=int, default=100, help="每个回复的 content token 数"),
+        parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的请求比例"),
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的请求比例"),
+        parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）"),
+        parser.add_argument("--break-rate", type=float, default=0.0, help="流式输出中途断开的比例"),
+        parser.add_argument("--seed", type=int, default=0),
+    ]
+    return [action.dest for action in actions]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    add_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
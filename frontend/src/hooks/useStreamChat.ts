@@ -48,6 +48,10 @@ export function useStreamChat({
             reasoning += chunk.data;
           } else if (chunk.type === 'content') {
             content += chunk.data;
+          } else if (chunk.type === 'reset') {
+            // 续传时重放缓冲已溢出，服务端随后发送完整快照
+            reasoning = '';
+            content = '';
           } else if (chunk.type === 'session_title' && onSessionTitle && sid) {
             onSessionTitle(sid, chunk.data);
           }
@@ -11,10 +11,11 @@ export interface Message {
   role: 'user' | 'assistant' | 'system';
   content: string;
   reasoning_content?: string;
+  status?: 'streaming' | 'complete' | 'aborted' | null;
   created_at: string;
 }
 
-export type StreamChunkType = 'reasoning' | 'content' | 'done' | 'session_title';
+export type StreamChunkType = 'reasoning' | 'content' | 'done' | 'session_title' | 'generation' | 'reset';
 
 export interface StreamChunk {
   type: StreamChunkType;